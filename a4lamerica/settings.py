@@ -251,6 +251,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'frontend.context_processors.cart',
             ],
         },
     },
@@ -284,6 +285,9 @@ MIGRATION_MODULES = {
     'frontend': None,
 }
 
+# 测试时为未托管的模型建表
+TEST_RUNNER = 'a4lamerica.test_runner.UnmanagedModelTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -358,6 +362,38 @@ GOOGLE_MAPS_CLIENT_API_KEY = os.getenv('GOOGLE_MAPS_CLIENT_API_KEY', '')
 # 商品哈希编码密钥（frontend 需要）
 ITEM_HASH_SECRET_KEY = os.getenv('ITEM_HASH_SECRET_KEY', 'default-secret-key')
 
+# 缓存配置
+# default: 进程内缓存（与之前的默认行为一致）
+# shared: 文件缓存，多个 web 进程与管理命令之间共享，重启后保留
+# item_index: 商品哈希索引的独立文件缓存，只有 256 个桶，远低于 MAX_ENTRIES，不会被淘汰
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', str(BASE_DIR / 'cache')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'item_index': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('ITEM_INDEX_CACHE_DIR', str(BASE_DIR / 'cache_item_index')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+# 预生成的网站地图文件目录（由 generate_sitemap 管理命令写入）
+SITEMAP_ROOT = os.getenv('SITEMAP_ROOT', str(BASE_DIR / 'sitemaps'))
+
+# 缩略图后台编码线程数（每个 web 进程）
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '2'))
+
 # CORS 配置
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
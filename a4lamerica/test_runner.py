@@ -0,0 +1,23 @@
+"""
+测试运行器
+frontend 的模型映射 nasmaha 的表（managed = False），测试数据库中默认不会建表；
+运行测试期间把这些模型临时改为 managed，让测试数据库为其建表
+"""
+
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+
+
+class UnmanagedModelTestRunner(DiscoverRunner):
+    """为未托管的模型创建测试表的测试运行器"""
+
+    def setup_test_environment(self, *args, **kwargs):
+        self.unmanaged_models = [model for model in apps.get_models() if not model._meta.managed]
+        for model in self.unmanaged_models:
+            model._meta.managed = True
+        super().setup_test_environment(*args, **kwargs)
+
+    def teardown_test_environment(self, *args, **kwargs):
+        super().teardown_test_environment(*args, **kwargs)
+        for model in self.unmanaged_models:
+            model._meta.managed = False
@@ -1,10 +1,12 @@
 import logging
 import requests
-import dns.resolver
 from django.conf import settings
 from django.core.cache import cache
 from datetime import datetime, timedelta
 
+from frontend.services import email_domains
+from frontend.services.http_client import get_session
+
 logger = logging.getLogger('accounts')
 
 
@@ -37,7 +39,7 @@ def verify_recaptcha(token: str, user_info: dict = None) -> bool:
     """
     try:
         # 向 Google 验证服务器发送请求
-        response = requests.post('https://www.google.com/recaptcha/api/siteverify', {
+        response = get_session('recaptcha').post('https://www.google.com/recaptcha/api/siteverify', {
             'secret': settings.RECAPTCHA_SECRET_KEY,
             'response': token
         })
@@ -89,38 +91,17 @@ def verify_recaptcha(token: str, user_info: dict = None) -> bool:
         return False
 
 def verify_email_domain(email: str) -> bool:
-    """验证邮箱域名是否有效"""
-    if '@' not in email or email.count('@') != 1:
-        logger.warning(f"Invalid email format: {email}")
-        return False
+    """验证邮箱域名是否有效
 
-    try:
-        # 获取域名部分
-        domain = email.split('@')[1]
-        
-        # 添加详细日志
-        logger.info(f"Verifying domain: {domain}")
-        
-        # 查询域名的 MX 记录
-        mx_records = dns.resolver.resolve(domain, 'MX')
-        
-        # 记录找到的 MX 记录
-        logger.info(f"Found MX records for {domain}: {[str(r.exchange) for r in mx_records]}")
-        
-        # 确保至少有一个 MX 记录
-        if not list(mx_records):
-            logger.warning(f"No MX records found for {domain}")
-            return False
-            
-        return True
-        
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.NoNameservers) as e:
-        # 只记录日志，不返回具体错误信息
-        logger.warning(f"Invalid email domain for {email}: {str(e)}")
-        return False
-    except Exception as e:
-        logger.error(f"DNS query failed for {email}: {str(e)}")
-        return False
+    常见邮箱服务商直接通过，其他域名的 MX 查询结果带缓存，DNS 超时不拒绝（见 frontend.services.email_domains）
+
+    Args:
+        email: 邮箱地址
+
+    Returns:
+        bool: 验证是否通过
+    """
+    return email_domains.is_valid_email_domain(email)
 
 def check_ip_registration_limit(ip_address: str) -> bool:
     """
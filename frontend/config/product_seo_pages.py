@@ -7980,32 +7980,23 @@ PRODUCT_SEO_PAGES = {
 
 def get_active_seo_pages():
     """
-    获取所有激活的SEO页面配置
+    获取所有激活的SEO页面配置（已校验，配置错误的页面不包含在内）
 
     Returns:
-        dict: 激活的SEO页面配置字典
+        dict: 激活的SEO页面配置字典（只读，请勿修改）
     """
-    return {key: config for key, config in PRODUCT_SEO_PAGES.items()
-            if config.get('active', True)}
+    from frontend.services.seo_registry import get_registry
+    return get_registry().active_pages
 
 def get_homepage_seo_pages():
     """
     获取需要在首页显示的SEO页面
 
     Returns:
-        list: 按优先级排序的首页SEO页面列表
+        list: 按优先级排序的首页SEO页面列表（只读，请勿修改）
     """
-    homepage_pages = []
-    for key, config in get_active_seo_pages().items():
-        if config.get('show_on_homepage', False):
-            homepage_pages.append({
-                'key': key,
-                'config': config
-            })
-
-    # 按优先级排序
-    homepage_pages.sort(key=lambda x: x['config'].get('homepage_priority', 999))
-    return homepage_pages
+    from frontend.services.seo_registry import get_registry
+    return get_registry().homepage_pages
 
 def get_seo_page_config(page_key):
     """
@@ -8017,12 +8008,13 @@ def get_seo_page_config(page_key):
     Returns:
         dict: SEO页面配置，如果不存在或未激活返回None
     """
-    active_pages = get_active_seo_pages()
-    return active_pages.get(page_key)
+    from frontend.services.seo_registry import get_registry
+    return get_registry().active_pages.get(page_key)
 
 def get_category_with_descendants(category):
     """
-    递归获取类别及其所有子孙类别的ID列表
+    获取类别及其所有子孙类别的ID列表
+    使用内存中的分类树，不再逐层递归查询数据库
 
     Args:
         category: Category对象
@@ -8030,13 +8022,8 @@ def get_category_with_descendants(category):
     Returns:
         list: 包含该类别及所有子孙类别的ID列表
     """
-    category_ids = [category.id]
-
-    # 递归获取所有子类别
-    for subcategory in category.subcategories.all():
-        category_ids.extend(get_category_with_descendants(subcategory))
-
-    return category_ids
+    from frontend.services.category_tree import get_category_tree
+    return get_category_tree().get_descendant_ids(category.id)
 
 
 def build_product_filters(config):
@@ -8080,27 +8067,18 @@ def build_product_filters(config):
 
     # 类别筛选（自动包含子类别）
     if 'category' in filter_config:
-        from frontend.models_proxy import Category
+        from frontend.services.category_tree import get_category_tree
         category_config = filter_config['category']
+        category_tree = get_category_tree()
         category_ids = []
 
-        # 通过类别名称筛选
+        # 通过类别名称筛选（包含每个匹配类别及其所有子孙类别）
         if 'names' in category_config:
-            # 获取所有匹配的父类别
-            parent_categories = Category.objects.filter(name__in=category_config['names'])
-
-            # 递归获取每个父类别及其所有子孙类别
-            for parent in parent_categories:
-                category_ids.extend(get_category_with_descendants(parent))
+            category_ids = category_tree.ids_for_names(category_config['names'])
 
         # 通过类别slug筛选
         elif 'slugs' in category_config:
-            # 获取所有匹配的父类别
-            parent_categories = Category.objects.filter(slug__in=category_config['slugs'])
-
-            # 递归获取每个父类别及其所有子孙类别
-            for parent in parent_categories:
-                category_ids.extend(get_category_with_descendants(parent))
+            category_ids = category_tree.ids_for_slugs(category_config['slugs'])
 
         # 使用ID列表进行筛选（包含父类别和所有子类别）
         if category_ids:
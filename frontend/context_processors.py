@@ -0,0 +1,16 @@
+"""
+Frontend 模板上下文处理器
+"""
+
+from .services.cart import get_cart_summary, get_customer_id
+
+
+def cart(request):
+    """页头购物车数量（读取按客户缓存的购物车汇总）"""
+    user = getattr(request, 'user', None)
+    if not user or not user.is_authenticated:
+        return {'cart_count': 0}
+    customer_id = get_customer_id(user)
+    if customer_id is None:
+        return {'cart_count': 0}
+    return {'cart_count': get_cart_summary(customer_id)['count']}
@@ -0,0 +1,97 @@
+"""
+管理命令：为缺少坐标的客户地址补充经纬度
+按地址ID顺序分批处理，先查地理编码缓存再调用 Geocoding API，结果写回 CustomerAddress
+
+用法：
+    python manage.py backfill_address_coordinates                    # 所有缺少坐标的地址
+    python manage.py backfill_address_coordinates --limit 500        # 最多处理500个
+    python manage.py backfill_address_coordinates --dry-run          # 只统计，不调用API
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from frontend.models_proxy import CustomerAddress
+from frontend.services import geocoding
+
+
+class Command(BaseCommand):
+    help = '为缺少经纬度的客户地址补充坐标'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='最多处理的地址数量（默认全部）',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批从数据库读取的地址数量（默认200）',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.05,
+            help='两次API调用之间的间隔秒数（默认0.05，命中缓存时不等待）',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计缺少坐标的地址数量',
+        )
+
+    def handle(self, *args, **options):
+        missing = CustomerAddress.objects.filter(
+            Q(latitude__isnull=True) | Q(longitude__isnull=True)
+        ).order_by('id')
+        total = missing.count()
+        if options['limit'] is not None:
+            total = min(total, options['limit'])
+
+        self.stdout.write(f'缺少坐标的地址: {total} 个')
+        if options['dry_run'] or total == 0:
+            return
+        if not getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+            raise CommandError('GOOGLE_MAPS_API_KEY 未配置')
+
+        validator = geocoding.CachedAddressValidator()
+        batch_size = max(1, options['batch_size'])
+        totals = {'updated': 0, 'failed': 0}
+        started = time.monotonic()
+        last_id = 0
+        processed = 0
+
+        while processed < total:
+            # 按ID游标分批读取（已补充坐标的地址会离开过滤条件，不能用 OFFSET）
+            batch = list(missing.filter(id__gt=last_id)[:min(batch_size, total - processed)])
+            if not batch:
+                break
+
+            for address in batch:
+                last_id = address.id
+                processed += 1
+                api_calls_before = validator.api_calls
+                location = geocoding.geocode_customer_address(address, validator=validator)
+                if location is None:
+                    totals['failed'] += 1
+                    self.stderr.write(f'  ✗ 地址 {address.id}: {geocoding.customer_address_string(address)}')
+                else:
+                    totals['updated'] += 1
+                if validator.api_calls > api_calls_before and options['delay'] > 0:
+                    time.sleep(options['delay'])
+
+            self.stdout.write(f'已处理 {processed}/{total}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'完成: 补充 {totals["updated"]} 个地址的坐标, 失败 {totals["failed"]} 个, '
+                f'API调用 {validator.api_calls} 次, 耗时 {elapsed:.2f} 秒'
+            )
+        )
@@ -1,54 +1,126 @@
-from django.core.management.base import BaseCommand
-from inventory.models import InventoryItem
-from frontend.utils import cache_item_hash, encode_item_id
+"""
+管理命令：预计算商品哈希索引
+分块读取商品ID，在进程池中并行计算HMAC，每块计算完即写入索引
+
+用法：
+    python manage.py cache_item_hashes                 # 索引所有商品（与现有索引合并）
+    python manage.py cache_item_hashes --force         # 全量重建并清理已删除商品
+    python manage.py cache_item_hashes --since 2025-01-01T00:00
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from frontend.management.utils import parse_since
+from frontend.models_proxy import InventoryItem
+from frontend.services import item_index
 
 
 class Command(BaseCommand):
-    help = '缓存所有已发布商品的哈希编码以提高性能'
+    help = '预计算商品哈希索引（URL哈希 → 商品ID），部署或清空缓存后用于预热'
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--force',
             action='store_true',
-            help='强制重新缓存所有商品哈希',
+            help='全量重建索引并清理已删除商品的索引项（默认与现有索引合并）',
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='只处理此时间之后创建或更新的商品（ISO格式，如 2025-01-01 或 2025-01-01T08:00）',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=item_index.CHUNK_SIZE,
+            help=f'每块商品数量（默认 {item_index.CHUNK_SIZE}）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='计算哈希的进程数，1 表示在当前进程内计算（默认为CPU核数）',
         )
 
     def handle(self, *args, **options):
-        self.stdout.write('开始缓存商品哈希编码...')
-        
-        # 获取所有已发布的商品，且状态为可销售状态
-        items = InventoryItem.objects.filter(
-            published=True,
-            current_state_id__in=[4, 5, 8]  # 只显示这三种状态的商品
-        )
-        total_items = items.count()
-        
-        self.stdout.write(f'找到 {total_items} 个已发布的商品')
-        
-        cached_count = 0
-        for i, item in enumerate(items, 1):
-            try:
-                # 缓存商品哈希
-                cache_item_hash(item)
-                cached_count += 1
-                
-                # 显示进度
-                if i % 100 == 0:
-                    self.stdout.write(f'已处理 {i}/{total_items} 个商品')
-                    
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'缓存商品 {item.id} 时出错: {e}')
-                )
-        
+        since = parse_since(options['since'])
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+        force = options['force']
+
+        if force and since:
+            raise CommandError('--force 与 --since 不能同时使用')
+
+        # 包含所有商品（含已售商品），与 decode_item_id 的查找范围一致
+        queryset = InventoryItem.objects.order_by('id')
+        if since:
+            queryset = queryset.filter(Q(created_at__gte=since) | Q(updated_at__gte=since))
+
+        total = queryset.count()
+        mode = '全量重建' if force else (f'增量（{since:%Y-%m-%d %H:%M}之后）' if since else '合并')
+        self.stdout.write(f'开始构建商品哈希索引: {total} 个商品, 模式={mode}, 进程数={workers}, 块大小={chunk_size}')
+
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS('没有需要索引的商品'))
+            return
+
+        hash_chunk = partial(item_index.build_hash_mapping, secret_key=settings.ITEM_HASH_SECRET_KEY)
+        started = time.monotonic()
+
+        def report(processed):
+            elapsed = time.monotonic() - started
+            rate = processed / elapsed if elapsed > 0 else 0
+            self.stdout.write(f'已处理 {processed}/{total} 个商品 ({rate:,.0f} 个/秒)')
+
+        chunks = self._iter_chunks(queryset.values_list('id', flat=True).iterator(chunk_size=chunk_size), chunk_size)
+        if workers == 1:
+            results = map(hash_chunk, chunks)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(hash_chunk, chunks)
+
+        try:
+            # 每块计算完立即写入索引：内存只保留当前块，中断后已写入的部分仍然有效
+            # --since 只处理了部分商品，不能推进桶的完整范围，否则会跳过中间未索引的商品
+            processed, max_id = item_index.write_chunks(
+                results, covered_from=None if since else 0, progress=report
+            )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        pruned = 0
+        if force:
+            # 重建期间旧索引项一直可用，全部写入后再清理已删除商品的索引项
+            pruned = item_index.prune_deleted()
+
+        elapsed = time.monotonic() - started
         self.stdout.write(
             self.style.SUCCESS(
-                f'成功缓存了 {cached_count}/{total_items} 个商品的哈希编码'
+                f'成功索引了 {processed} 个商品的哈希编码，耗时 {elapsed:.2f} 秒 '
+                f'({processed / max(elapsed, 1e-6):,.0f} 个/秒), '
+                f'清理 {pruned} 个已删除商品, 最大商品ID: {max_id}'
             )
         )
-        
-        # 显示一些示例哈希
-        self.stdout.write('\n示例哈希编码:')
-        for item in items[:5]:
-            hash_value = encode_item_id(item.id)
-            self.stdout.write(f'商品 {item.id} -> {hash_value}') 
\ No newline at end of file
+        if processed < total:
+            raise CommandError(f'{total - processed} 个商品未写入（等待索引写锁超时），请重新运行')
+
+    def _iter_chunks(self, id_iterator, chunk_size):
+        """将ID流切分为固定大小的块"""
+        chunk = []
+        for item_id in id_iterator:
+            chunk.append(item_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
@@ -5,10 +5,9 @@
 
 from django.core.management.base import BaseCommand
 from django.urls import reverse
-from frontend.config.product_seo_pages import (
-    get_active_seo_pages, get_homepage_seo_pages, build_product_filters
-)
-from frontend.models_proxy import InventoryItem
+from frontend.config.product_seo_pages import get_active_seo_pages, get_homepage_seo_pages
+from frontend.services.seo_registry import get_registry
+from frontend.services.seo_snapshot import ensure_snapshot, refresh_snapshot
 
 
 class Command(BaseCommand):
@@ -25,6 +24,11 @@ class Command(BaseCommand):
             action='store_true',
             help='Test URL generation for all pages',
         )
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='Refresh the inventory snapshot before checking',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(
@@ -40,6 +44,14 @@ class Command(BaseCommand):
                             for key, config in active_pages.items()]
             self.stdout.write('Checking all active SEO pages...\n')
 
+        snapshot = refresh_snapshot() if options['refresh'] else ensure_snapshot()
+        self.snapshot_pages = snapshot['pages']
+        self.stdout.write(f"Inventory snapshot generated at: {snapshot['generated_at']:%Y-%m-%d %H:%M:%S}\n")
+
+        # 配置校验失败的页面（不会被发布）
+        for page_key, errors in get_registry().errors.items():
+            self.stdout.write(self.style.ERROR(f"\n❌ {page_key}: invalid config - {'; '.join(errors)}"))
+
         # 检查每个页面的状态
         for page_data in pages_to_check:
             if 'key' in page_data:
@@ -66,8 +78,10 @@ class Command(BaseCommand):
 
         # 检查库存数量
         try:
-            filters = build_product_filters(page_config)
-            item_count = InventoryItem.objects.filter(filters).count()
+            stats = self.snapshot_pages.get(page_key)
+            if stats is None:
+                raise ValueError('page is not in the inventory snapshot (filters could not be compiled)')
+            item_count = stats['count']
             min_inventory = page_config.get('min_inventory', 1)
 
             if item_count >= min_inventory:
@@ -79,6 +93,7 @@ class Command(BaseCommand):
 
             self.stdout.write(f"   Inventory: {status_icon} {item_count} items ({status_text})")
             self.stdout.write(f"   Min Required: {min_inventory}")
+            self.stdout.write(f"   Last Changed: {stats['lastmod']:%Y-%m-%d %H:%M:%S}")
 
         except Exception as e:
             self.stdout.write(
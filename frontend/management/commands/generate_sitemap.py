@@ -1,15 +1,19 @@
 """
 生成和验证网站地图的管理命令
+直接在本进程内生成静态网站地图文件（settings.SITEMAP_ROOT），不再通过HTTP请求自身
+
+用法：
+    python manage.py generate_sitemap                 # 只重新生成有变化的文件
+    python manage.py generate_sitemap --force         # 重新生成所有文件
+    python manage.py generate_sitemap --validate      # 生成后验证XML格式
 """
+import gzip
+import time
 from django.core.management.base import BaseCommand
-from django.core.management import call_command
-from django.test import RequestFactory
-from django.contrib.sitemaps.views import sitemap
-from frontend.views import sitemaps
 from django.conf import settings
-import requests
 import xml.etree.ElementTree as ET
-from urllib.parse import urljoin
+
+from frontend.services import seo_snapshot, sitemap_builder
 
 
 class Command(BaseCommand):
@@ -25,7 +29,12 @@ class Command(BaseCommand):
             '--base-url',
             type=str,
             default=None,  # 默认从settings获取
-            help='基础URL用于验证（默认从settings.SITE_URL获取）',
+            help='网站地图中URL使用的基础URL（默认从settings.SITE_URL获取）',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='忽略已有文件，重新生成所有分片',
         )
 
     def handle(self, *args, **options):
@@ -39,41 +48,33 @@ class Command(BaseCommand):
         # 显示当前环境信息
         environment = "生产环境" if not settings.DEBUG else "开发环境"
         self.stdout.write(
-            self.style.SUCCESS(f'开始生成网站地图... ({environment}, 使用域名: {base_url})')
+            self.style.SUCCESS(f'开始生成网站地图... ({environment}, 使用域名: {base_url}, 目录: {settings.SITEMAP_ROOT})')
         )
-        
-        # 生成各个sitemap
-        sitemap_urls = [
-            f'{base_url}/sitemap.xml',
-            f'{base_url}/sitemap-static.xml',
-            f'{base_url}/sitemap-stores.xml',
-            f'{base_url}/sitemap-categories.xml',
-            f'{base_url}/sitemap-products.xml',
-            f'{base_url}/sitemap-warranty.xml',
-            f'{base_url}/sitemap-terms.xml',
-        ]
-        
-        for url in sitemap_urls:
-            try:
-                response = requests.get(url, timeout=30)
-                if response.status_code == 200:
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ {url} - 成功生成')
-                    )
-                    
-                    if validate:
-                        self.validate_sitemap_xml(response.text, url)
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f'✗ {url} - HTTP {response.status_code}')
-                    )
-            except requests.RequestException as e:
-                self.stdout.write(
-                    self.style.ERROR(f'✗ {url} - 请求失败: {e}')
-                )
-        
+
+        started = time.monotonic()
+        # 生成前确保库存快照可用且未过期
+        seo_snapshot.ensure_snapshot()
+        stats = sitemap_builder.build_sitemaps(base_url=base_url, force=options['force'])
+        elapsed = time.monotonic() - started
+
+        for filename in stats['written']:
+            self.stdout.write(self.style.SUCCESS(f'✓ {filename} - 已生成'))
+        for filename in stats['removed']:
+            self.stdout.write(self.style.WARNING(f'- {filename} - 已删除'))
+        self.stdout.write(f'未变化的文件: {len(stats["unchanged"])} 个')
+
+        if validate:
+            root = sitemap_builder.get_sitemap_root()
+            manifest = sitemap_builder.load_manifest() or {}
+            for filename in manifest.get('files', {}):
+                content = (root / filename).read_bytes()
+                if filename.endswith('.gz'):
+                    content = gzip.decompress(content)
+                self.stdout.write(f'{filename}:')
+                self.validate_sitemap_xml(content, filename)
+
         self.stdout.write(
-            self.style.SUCCESS('\n网站地图生成完成！')
+            self.style.SUCCESS(f'\n网站地图生成完成！共 {stats["urls"]} 个URL，耗时 {elapsed:.2f} 秒')
         )
 
     def validate_sitemap_xml(self, xml_content, url):
@@ -0,0 +1,134 @@
+"""
+管理命令：批量预生成缩略图
+扫描 ItemImage 和 ProductImage，在进程池中为模板使用的标准尺寸生成 WebP 缩略图，
+新上架商品的首批访客和爬虫不必等待按需生成
+
+用法：
+    python manage.py pregenerate_thumbnails                          # 公司已发布商品的图片
+    python manage.py pregenerate_thumbnails --since 2025-01-01       # 只处理此时间之后新增/更新的商品
+    python manage.py pregenerate_thumbnails --all --workers 8        # 所有图片
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from frontend.management.utils import parse_since
+from frontend.models_proxy import InventoryItem, ItemImage, ProductImage
+from frontend.services import thumbnails
+
+
+class Command(BaseCommand):
+    help = '批量预生成商品图片缩略图（模板使用的标准尺寸）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=str,
+            default=None,
+            help='只处理此时间之后新增或更新的商品的图片（ISO格式，如 2025-01-01 或 2025-01-01T08:00）',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='处理所有图片（默认只处理本公司已发布商品的图片）',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='进程数，1 表示在当前进程内处理（默认为CPU核数）',
+        )
+
+    def handle(self, *args, **options):
+        since = parse_since(options['since'])
+        workers = max(1, options['workers'])
+
+        image_paths = self._collect_image_paths(since, options['all'])
+        total = len(image_paths)
+        sizes = thumbnails.PRODUCT_IMAGE_SIZES
+        self.stdout.write(
+            f'开始预生成缩略图: {total} 张原图, 尺寸={", ".join(f"{w}x{h}" for w, h in sizes)}, 进程数={workers}'
+        )
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS('没有需要处理的图片'))
+            return
+
+        process_image = partial(thumbnails.pregenerate_image, sizes=sizes, media_root=str(settings.MEDIA_ROOT))
+        totals = {'generated': 0, 'skipped': 0, 'original_bytes': 0, 'variant_bytes': 0, 'errors': 0}
+        started = time.monotonic()
+
+        if workers == 1:
+            results = map(process_image, image_paths)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(process_image, image_paths, chunksize=8)
+
+        try:
+            for processed, result in enumerate(results, start=1):
+                for key in ('generated', 'skipped', 'original_bytes', 'variant_bytes'):
+                    totals[key] += result[key]
+                if result['error']:
+                    totals['errors'] += 1
+                    self.stderr.write(f'  ✗ {result["error"]}')
+
+                if processed % 100 == 0 or processed == total:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'已处理 {processed}/{total} 张原图, 生成 {totals["generated"]} 个缩略图 '
+                        f'({processed / max(elapsed, 1e-6):,.1f} 张/秒)'
+                    )
+        finally:
+            if executor:
+                executor.shutdown()
+
+        elapsed = time.monotonic() - started
+        saved = totals['original_bytes'] - totals['variant_bytes']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'完成: 生成 {totals["generated"]} 个缩略图, 跳过 {totals["skipped"]} 个已是最新, '
+                f'失败 {totals["errors"]} 张, 耗时 {elapsed:.2f} 秒 '
+                f'({totals["generated"] / max(elapsed, 1e-6):,.1f} 个缩略图/秒)\n'
+                f'缩略图共 {self._format_bytes(totals["variant_bytes"])}，'
+                f'相比直接下载原图节省 {self._format_bytes(saved)}'
+            )
+        )
+
+    def _collect_image_paths(self, since, include_all):
+        """收集需要处理的原图相对路径（去重）"""
+        items = InventoryItem.objects.all()
+        if not include_all:
+            items = items.filter(company_id=settings.COMPANY_ID, published=True)
+
+        if since:
+            changed_items = items.filter(Q(created_at__gte=since) | Q(updated_at__gte=since))
+            # 新增/更新的商品的所有图片，以及已有商品新上传的图片
+            item_images = ItemImage.objects.filter(
+                Q(item__in=changed_items.values('id'))
+                | Q(item__in=items.values('id'), created_at__gte=since)
+            )
+            product_images = ProductImage.objects.filter(product_model__in=changed_items.values('model_number_id'))
+        elif include_all:
+            item_images = ItemImage.objects.all()
+            product_images = ProductImage.objects.all()
+        else:
+            item_images = ItemImage.objects.filter(item__in=items.values('id'))
+            product_images = ProductImage.objects.filter(product_model__in=items.values('model_number_id'))
+
+        paths = set(item_images.values_list('image', flat=True))
+        paths.update(product_images.values_list('image', flat=True))
+        paths.discard('')
+        paths.discard(None)
+        return sorted(paths)
+
+    def _format_bytes(self, size):
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if abs(size) < 1024 or unit == 'GB':
+                return f'{size:,.1f} {unit}'
+            size /= 1024
@@ -0,0 +1,38 @@
+"""
+管理命令：刷新Google评论缓存
+同步调用 Places API 并写入共享缓存，用于部署后预热或定时刷新（页面请求只在后台刷新）
+
+用法：
+    python manage.py refresh_google_reviews                  # 默认语言评论（首页使用）
+    python manage.py refresh_google_reviews --multilingual   # 同时刷新多语言评论
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from frontend.services.google_reviews import GoogleReviewsService
+
+
+class Command(BaseCommand):
+    help = '刷新Google评论缓存'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--multilingual',
+            action='store_true',
+            help='同时刷新多语言（英语和西班牙语）评论',
+        )
+
+    def handle(self, *args, **options):
+        service = GoogleReviewsService()
+        modes = [False, True] if options['multilingual'] else [False]
+
+        failed = []
+        for show_multilingual in modes:
+            label = '多语言' if show_multilingual else '默认语言'
+            if service.refresh(show_multilingual=show_multilingual):
+                self.stdout.write(self.style.SUCCESS(f'已刷新{label}评论'))
+            else:
+                failed.append(label)
+
+        if failed:
+            raise CommandError(f'刷新失败: {", ".join(failed)}（详见日志）')
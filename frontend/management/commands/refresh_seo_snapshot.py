@@ -0,0 +1,48 @@
+"""
+管理命令：刷新SEO页面库存快照
+计算每个激活SEO页面的商品数量和最近变化时间，供网站地图、首页和SEO页面读取
+
+用法：
+    python manage.py refresh_seo_snapshot
+    python manage.py refresh_seo_snapshot --verbose    # 显示每个页面的数量
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from frontend.config.product_seo_pages import get_active_seo_pages
+from frontend.services.seo_snapshot import refresh_snapshot
+
+
+class Command(BaseCommand):
+    help = '刷新SEO页面库存快照（建议每10分钟由定时任务执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='显示每个页面的商品数量和最近变化时间',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        snapshot = refresh_snapshot()
+        elapsed = time.monotonic() - started
+
+        active_pages = get_active_seo_pages()
+        pages = snapshot['pages']
+        available = sum(
+            1 for key, stats in pages.items()
+            if stats['count'] >= active_pages[key].get('min_inventory', 1)
+        )
+
+        if options['verbose']:
+            for key, stats in sorted(pages.items()):
+                self.stdout.write(f"{key}: {stats['count']} 个商品, 最近变化 {stats['lastmod']:%Y-%m-%d %H:%M:%S}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'SEO库存快照已刷新: {len(pages)} 个页面, {available} 个满足最小库存, 耗时 {elapsed:.2f} 秒'
+            )
+        )
@@ -0,0 +1,73 @@
+"""
+管理命令：批量复查客户邮箱域名
+按域名去重后并发查询 MX 记录（常见服务商和已缓存的域名不查询 DNS），列出域名无效的客户；只读，不修改客户数据
+
+用法：
+    python manage.py verify_customer_email_domains                  # 所有有邮箱的客户
+    python manage.py verify_customer_email_domains --refresh        # 忽略缓存，重新查询 DNS
+    python manage.py verify_customer_email_domains --workers 32     # 并发查询数
+"""
+
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from frontend.models_proxy import Customer
+from frontend.services import email_domains
+
+
+class Command(BaseCommand):
+    help = '批量复查客户邮箱域名的 MX 记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='并发 DNS 查询数（默认16）',
+        )
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='忽略已缓存的结果重新查询（允许列表中的服务商除外）',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        customers_by_domain = defaultdict(list)
+        bad_format = []
+        emails = Customer.objects.exclude(email__isnull=True).exclude(email='').values_list('id', 'email')
+        for customer_id, email in emails.iterator():
+            domain = email_domains.email_domain(email)
+            if domain is None:
+                bad_format.append((customer_id, email))
+            else:
+                customers_by_domain[domain].append((customer_id, email))
+
+        self.stdout.write(f'客户邮箱域名: {len(customers_by_domain)} 个')
+        statuses = email_domains.check_domains(
+            customers_by_domain, max_workers=options['workers'], use_cache=not options['refresh']
+        )
+
+        counts = defaultdict(int)
+        for domain, status in statuses.items():
+            counts[status] += len(customers_by_domain[domain])
+
+        for customer_id, email in bad_format:
+            self.stderr.write(f'  ✗ 客户 {customer_id}: {email}（格式无效）')
+        for domain, status in sorted(statuses.items()):
+            if status == email_domains.INVALID:
+                for customer_id, email in customers_by_domain[domain]:
+                    self.stderr.write(f'  ✗ 客户 {customer_id}: {email}')
+        unknown = sorted(d for d, s in statuses.items() if s == email_domains.UNKNOWN)
+        if unknown:
+            self.stdout.write(self.style.WARNING(f'查询未完成的域名（可稍后重试）: {", ".join(unknown)}'))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'完成: 有效 {counts[email_domains.VALID]} 个, 无效 {counts[email_domains.INVALID] + len(bad_format)} 个, '
+                f'未知 {counts[email_domains.UNKNOWN]} 个, 耗时 {elapsed:.2f} 秒'
+            )
+        )
@@ -0,0 +1,34 @@
+"""
+管理命令共用的参数解析工具
+"""
+
+from datetime import datetime
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_since(value):
+    """
+    解析 --since 参数为带时区的时间
+
+    Args:
+        value (str): ISO 格式的日期或时间（如 2025-01-01 或 2025-01-01T08:00），可为空
+
+    Returns:
+        datetime: 带时区的时间，value 为空时返回 None
+    """
+    if not value:
+        return None
+
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            raise CommandError(f'无法解析时间: {value}')
+        parsed = datetime.combine(parsed_date, datetime.min.time())
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
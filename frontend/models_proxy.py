@@ -783,69 +783,35 @@ class Order(models.Model):
     def __str__(self):
         return f"Order {self.order_number}"
     
+    def get_financials(self):
+        """
+        订单金额合计（一条条件聚合查询，见 services/order_financials.py）
+        
+        Returns:
+            dict: {'paid_amount', 'balance', 'virtual_deposit_amount', 'virtual_withdrawal_amount'}
+        """
+        from .services.order_financials import get_order_financials
+        return get_order_financials(self)
+    
     def calculate_paid_amount(self):
         """
         计算客户对订单的实际支付金额
         
         计算逻辑：
-        1. 获取订单的所有DEPOSIT交易记录（实际存款）
-        2. 获取订单的所有VIRTUAL_DEPOSIT交易记录（虚拟存款）
-        3. 获取订单的所有WITHDRAWAL交易记录（实际取款）
-        4. 获取订单的所有VIRTUAL_WITHDRAWAL交易记录（虚拟取款）
-        5. 计算总支付金额=实际存款+虚拟存款+实际取款(负数)+虚拟取款(负数)
+        总支付金额=实际存款(DEPOSIT)+虚拟存款(VIRTUAL_DEPOSIT)+实际取款(WITHDRAWAL,负数)+虚拟取款(VIRTUAL_WITHDRAWAL,负数)
         
         Returns:
             Decimal: 实际支付金额
         """
-        from decimal import Decimal
-        
-        # 获取实际存款记录
-        deposits = TransactionRecord.objects.filter(
-            order=self,
-            transaction_type='DEPOSIT'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        # 获取虚拟存款记录
-        virtual_deposits = TransactionRecord.objects.filter(
-            order=self,
-            transaction_type='VIRTUAL_DEPOSIT'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        # 获取订单的所有WITHDRAWAL交易记录（实际取款）
-        withdrawals = TransactionRecord.objects.filter(
-            order=self,
-            transaction_type='WITHDRAWAL'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-
-        # 获取订单的所有VIRTUAL_WITHDRAWAL交易记录（虚拟取款）
-        virtual_withdrawals = TransactionRecord.objects.filter(
-            order=self,
-            transaction_type='VIRTUAL_WITHDRAWAL'
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
-        
-        # 计算总支付金额
-        total_paid = deposits + virtual_deposits + withdrawals + virtual_withdrawals
-        return total_paid
+        return self.get_financials()['paid_amount']
     
     def calculate_order_balance(self):
-        """计算订单余额
-        
-        计算逻辑：
-        1. 获取订单的所有交易记录
-        2. 按时间排序
-        3. 计算余额
+        """计算订单余额（所有交易记录金额之和）
         
         Returns:
             Decimal: 订单余额
         """
-        from decimal import Decimal
-        
-        transactions = TransactionRecord.objects.filter(
-            order=self
-        ).order_by('created_at')
-        
-        balance = sum(t.amount for t in transactions)
-        return balance
+        return self.get_financials()['balance']
     
     def calculate_pre_tax_total(self):
         """
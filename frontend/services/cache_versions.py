@@ -0,0 +1,45 @@
+"""
+Cache Version Service
+按命名空间维护缓存版本号，版本号变化即令该命名空间下的所有缓存失效
+
+版本号保存在共享缓存中，多个 web 进程和管理命令看到的是同一个版本。
+"""
+
+from django.core.cache import caches
+
+VERSION_CACHE_ALIAS = 'shared'
+VERSION_KEY_PREFIX = 'cache_version:'
+
+# 命名空间
+INVENTORY = 'inventory'
+CATEGORY = 'category'
+LOCATION = 'location'
+ITEM_STATE = 'item_state'
+LOAD_MANIFEST = 'load_manifest'
+
+
+def _get_cache():
+    return caches[VERSION_CACHE_ALIAS]
+
+
+def get_version(namespace):
+    """获取命名空间当前版本号（不存在时初始化为1）"""
+    key = f'{VERSION_KEY_PREFIX}{namespace}'
+    return _get_cache().get_or_set(key, 1, timeout=None)
+
+
+def bump_version(namespace):
+    """使命名空间下的缓存失效"""
+    key = f'{VERSION_KEY_PREFIX}{namespace}'
+    cache = _get_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # 键不存在（首次使用或缓存被清空）
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+def versioned_key(namespace, key):
+    """生成带版本号的缓存键"""
+    return f'{namespace}:v{get_version(namespace)}:{key}'
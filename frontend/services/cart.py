@@ -0,0 +1,192 @@
+"""
+Shopping Cart Service
+购物车页面数据组装和按客户缓存的购物车汇总
+
+- 购物车商品一条查询取出（第一张商品/型号图片通过子查询注解），受欢迎程度一条分组查询，
+  按门店分组、小计和销售税在一次遍历中完成，查询数量不随商品数量增长
+- 汇总（商品数量、各门店小计和销售税）保存在共享缓存中，键中带每个客户的购物车版本号；
+  购物车变化提交后由信号更换版本号（见 signals.py），在此之前已读出的旧汇总只会写入旧版本的键，不会再被读到
+- 页头购物车数量和移除商品后的金额直接读取汇总，登录用户的客户ID也有缓存，页头不再每页查询客户
+"""
+
+import uuid
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db.models import Count, OuterRef, Subquery, Sum
+
+from . import cache_versions
+from .product_listing import card_image_url
+
+SUMMARY_CACHE_ALIAS = 'shared'
+SUMMARY_TIMEOUT = 86400
+CUSTOMER_ID_TIMEOUT = 86400
+NO_CUSTOMER_TIMEOUT = 300  # 没有客户档案的用户（员工等），短时间后重新查询
+
+
+def _get_cache():
+    return caches[SUMMARY_CACHE_ALIAS]
+
+
+def _cart_version(customer_id):
+    """
+    客户的购物车版本号
+    使用随机值而不是递增整数：版本键被清除后新生成的版本不会与旧汇总的键重合
+    """
+    cache = _get_cache()
+    key = f'cart_version:{customer_id}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _summary_key(customer_id):
+    # 门店税率变化（门店版本号递增）时汇总随之失效
+    return cache_versions.versioned_key(
+        cache_versions.LOCATION, f'cart_summary:{customer_id}:{_cart_version(customer_id)}'
+    )
+
+
+def get_customer_id(user):
+    """
+    登录用户的客户ID（带缓存）
+
+    Args:
+        user: 已登录的用户
+
+    Returns:
+        int: 客户ID，用户没有客户档案时返回 None
+    """
+    from ..models_proxy import Customer
+
+    cache = _get_cache()
+    key = f'customer_id:user:{user.pk}'
+    customer_id = cache.get(key)
+    if customer_id is None:
+        customer_id = Customer.objects.filter(user_id=user.pk).values_list('id', flat=True).first() or 0
+        cache.set(key, customer_id, CUSTOMER_ID_TIMEOUT if customer_id else NO_CUSTOMER_TIMEOUT)
+    return customer_id or None
+
+
+def _location_totals(total_price, sales_tax_rate, count):
+    return {
+        'total_price': total_price,
+        'sales_tax': total_price * (sales_tax_rate or 0),
+        'count': count,
+    }
+
+
+def get_cart_summary(customer_id):
+    """
+    获取客户的购物车汇总（带缓存）
+
+    Args:
+        customer_id (int): 客户ID
+
+    Returns:
+        dict: {'count': int, 'locations': {location_id: {'total_price', 'sales_tax', 'count'}}}
+    """
+    from ..models_proxy import ShoppingCart
+
+    cache = _get_cache()
+    # 先取键（版本号）再查询：查询期间购物车变化时，结果只会写入已作废的键
+    key = _summary_key(customer_id)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    rows = ShoppingCart.objects.filter(customer_id=customer_id).values(
+        'item__location_id', 'item__location__sales_tax_rate'
+    ).annotate(total_price=Sum('price_at_add'), count=Count('id')).order_by()
+
+    locations = {}
+    for row in rows:
+        location_id = row['item__location_id']
+        if location_id is None:
+            continue
+        locations[location_id] = _location_totals(
+            row['total_price'], row['item__location__sales_tax_rate'], row['count']
+        )
+    summary = {'count': sum(row['count'] for row in rows), 'locations': locations}
+    cache.set(key, summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_cart_summary(customer_id):
+    """购物车变化提交后更换版本号，使汇总缓存失效"""
+    _get_cache().set(f'cart_version:{customer_id}', uuid.uuid4().hex, timeout=None)
+
+
+def build_cart(customer_id):
+    """
+    组装购物车页面数据
+
+    Args:
+        customer_id (int): 客户ID
+
+    Returns:
+        dict: {location: {'items': [购物车项, ...], 'total_price': Decimal, 'sales_tax': Decimal}}
+            每个购物车项带 popularity_count（被多少个不同客户加入购物车），
+            商品带 card_image_url（商品图片优先，其次型号图片）
+    """
+    from ..models_proxy import ItemImage, ProductImage, ShoppingCart
+
+    summary_key = _summary_key(customer_id)
+    first_item_image = ItemImage.objects.filter(
+        item_id=OuterRef('item_id')
+    ).order_by('display_order', 'created_at').values('image')[:1]
+    first_model_image = ProductImage.objects.filter(
+        product_model_id=OuterRef('item__model_number_id')
+    ).order_by('id').values('image')[:1]
+
+    cart_items = list(
+        ShoppingCart.objects.filter(customer_id=customer_id).select_related(
+            'item',
+            'item__model_number',
+            'item__model_number__brand',
+            'item__location',
+            'item__location__address'
+        ).annotate(
+            item_image=Subquery(first_item_image),
+            model_image=Subquery(first_model_image)
+        ).order_by('created_at', 'id')
+    )
+    if not cart_items:
+        return {}
+
+    # 一条分组查询获取每个商品被多少个不同客户加入购物车
+    popularity_counts = dict(
+        ShoppingCart.objects.filter(
+            item_id__in={cart_item.item_id for cart_item in cart_items}
+        ).values('item_id').annotate(
+            customers=Count('customer_id', distinct=True)
+        ).order_by().values_list('item_id', 'customers')
+    )
+
+    location_items = {}
+    for cart_item in cart_items:
+        location = cart_item.item.location
+        if not location:
+            continue
+        cart_item.item.card_image_url = card_image_url(cart_item.item_image, cart_item.model_image)
+        cart_item.popularity_count = popularity_counts.get(cart_item.item_id, 0)
+
+        group = location_items.setdefault(location, {'items': [], 'total_price': Decimal('0')})
+        group['items'].append(cart_item)
+        group['total_price'] += cart_item.price_at_add
+
+    summary_locations = {}
+    for location, group in location_items.items():
+        totals = _location_totals(group['total_price'], location.sales_tax_rate, len(group['items']))
+        group['sales_tax'] = totals['sales_tax']
+        summary_locations[location.id] = totals
+
+    # 顺便刷新汇总缓存
+    _get_cache().set(
+        summary_key,
+        {'count': len(cart_items), 'locations': summary_locations},
+        SUMMARY_TIMEOUT
+    )
+    return location_items
@@ -0,0 +1,154 @@
+"""
+Category Tree Service
+一次查询加载全部分类，在内存中构建祖先/子孙闭包和 slug/名称 → ID 映射
+
+分类数据由 nasmaha 维护且很少变化：
+- 进程内保存一份已构建好的树，按版本号判断是否需要重建
+- 原始分类行保存在共享缓存中，其他进程重建时无需再查数据库
+- 本项目内的分类修改通过信号更新版本号，nasmaha 中的修改在 TREE_TIMEOUT 后生效
+"""
+
+import time
+from django.core.cache import caches
+
+from . import cache_versions
+
+TREE_CACHE_ALIAS = 'shared'
+TREE_TIMEOUT = 3600  # 1小时
+
+_local_tree = None
+_local_version = None
+_local_loaded_at = 0.0
+
+
+class CategoryTree:
+    """分类树（只读）"""
+
+    def __init__(self, rows):
+        """
+        Args:
+            rows (list): [(id, name, slug, parent_category_id), ...]
+        """
+        self.names = {}
+        self.slugs = {}
+        self.parents = {}
+        self.children = {}
+        self.ids_by_name = {}
+        self.id_by_slug = {}
+
+        for category_id, name, slug, parent_id in rows:
+            self.names[category_id] = name
+            self.slugs[category_id] = slug
+            self.parents[category_id] = parent_id
+            self.children.setdefault(category_id, [])
+            self.ids_by_name.setdefault(name, []).append(category_id)
+            if slug:
+                self.id_by_slug[slug] = category_id
+
+        for category_id, parent_id in self.parents.items():
+            if parent_id is not None and parent_id in self.children:
+                self.children[parent_id].append(category_id)
+        for child_ids in self.children.values():
+            child_ids.sort()
+
+        self.descendants = {category_id: self._collect_descendants(category_id) for category_id in self.parents}
+        self.ancestors = {category_id: self._collect_ancestors(category_id) for category_id in self.parents}
+
+    def _collect_descendants(self, category_id):
+        """前序遍历收集分类自身及所有子孙分类ID（防止数据中出现环）"""
+        result = []
+        seen = set()
+        stack = [category_id]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            result.append(current)
+            stack.extend(reversed(self.children.get(current, [])))
+        return tuple(result)
+
+    def _collect_ancestors(self, category_id):
+        """从父分类到根分类的ID列表"""
+        result = []
+        seen = {category_id}
+        parent_id = self.parents.get(category_id)
+        while parent_id is not None and parent_id not in seen and parent_id in self.parents:
+            result.append(parent_id)
+            seen.add(parent_id)
+            parent_id = self.parents.get(parent_id)
+        return tuple(result)
+
+    def get_descendant_ids(self, category_id):
+        """分类自身及所有子孙分类的ID（未知分类只返回自身）"""
+        return list(self.descendants.get(category_id, (category_id,)))
+
+    def get_ancestor_ids(self, category_id):
+        """分类的所有祖先分类ID（由近到远）"""
+        return list(self.ancestors.get(category_id, ()))
+
+    def get_child_ids(self, category_id):
+        """直接子分类ID"""
+        return list(self.children.get(category_id, []))
+
+    def ids_for_names(self, names, include_descendants=True):
+        """按名称查找分类ID（同名分类全部包含）"""
+        category_ids = []
+        for name in names:
+            for category_id in self.ids_by_name.get(name, []):
+                category_ids.extend(self.get_descendant_ids(category_id) if include_descendants else [category_id])
+        return _unique(category_ids)
+
+    def ids_for_slugs(self, slugs, include_descendants=True):
+        """按slug查找分类ID"""
+        category_ids = []
+        for slug in slugs:
+            category_id = self.id_by_slug.get(slug)
+            if category_id is not None:
+                category_ids.extend(self.get_descendant_ids(category_id) if include_descendants else [category_id])
+        return _unique(category_ids)
+
+
+def _unique(values):
+    """去重并保持顺序"""
+    return list(dict.fromkeys(values))
+
+
+def _load_rows():
+    from ..models_proxy import Category
+    return list(Category.objects.order_by('id').values_list('id', 'name', 'slug', 'parent_category_id'))
+
+
+def get_category_tree():
+    """
+    获取当前版本的分类树
+
+    Returns:
+        CategoryTree: 分类树
+    """
+    global _local_tree, _local_version, _local_loaded_at
+
+    version = cache_versions.get_version(cache_versions.CATEGORY)
+    if (
+        _local_tree is not None
+        and _local_version == version
+        and time.monotonic() - _local_loaded_at < TREE_TIMEOUT
+    ):
+        return _local_tree
+
+    shared_cache = caches[TREE_CACHE_ALIAS]
+    rows_key = cache_versions.versioned_key(cache_versions.CATEGORY, 'category_rows')
+    rows = shared_cache.get(rows_key)
+    if rows is None:
+        rows = _load_rows()
+        shared_cache.set(rows_key, rows, TREE_TIMEOUT)
+
+    _local_tree = CategoryTree(rows)
+    _local_version = version
+    _local_loaded_at = time.monotonic()
+    return _local_tree
+
+
+def invalidate_category_tree():
+    """使所有进程的分类树失效"""
+    cache_versions.bump_version(cache_versions.CATEGORY)
@@ -0,0 +1,196 @@
+"""
+Checkout Service
+购物车下单：锁定商品、校验状态转换、创建订单并把商品置为 HOLD
+
+- 商品行用 SELECT ... FOR UPDATE NOWAIT 锁定（只锁商品表），同一商品的并发下单只有一个能成功，
+  另一个立即得到 CheckoutConflict，而不是等待锁超时或重复 HOLD；只有 NOWAIT 取锁失败（MySQL 3572）
+  视为冲突，其他数据库错误（不支持 NOWAIT、死锁、连接断开等）照常抛出
+- 状态转换规则来自进程内查找表（item_states），逐个商品在内存中校验
+- 商品更新、状态历史写入都是批量操作，查询数量不随商品数量增长
+- 批量更新不会触发 InventoryItem 的 post_save 信号，库存缓存版本号在事务提交后手动递增
+"""
+
+import logging
+from decimal import Decimal, InvalidOperation
+
+from django.db import OperationalError, transaction
+from django.utils import timezone
+
+from . import cache_versions, item_states
+
+logger = logging.getLogger(__name__)
+
+MYSQL_LOCK_NOWAIT = 3572  # ER_LOCK_NOWAIT：NOWAIT 时行已被其他事务锁定
+
+
+class CheckoutError(Exception):
+    """无法下单，消息可直接展示给客户"""
+
+
+class CheckoutConflict(CheckoutError):
+    """商品正被其他订单锁定（并发下单），客户可稍后重试"""
+
+
+def _is_lock_conflict(error):
+    """数据库错误是否为 NOWAIT 取锁失败"""
+    return isinstance(error, OperationalError) and bool(error.args) and error.args[0] == MYSQL_LOCK_NOWAIT
+
+
+def _parse_items(items_data):
+    """
+    解析请求中的商品和成交价
+
+    Returns:
+        dict: {inventory_item_id: unit_price}，保持请求中的顺序
+    """
+    prices = {}
+    for item_data in items_data:
+        try:
+            item_id = int(item_data['inventory_item_id'])
+            prices[item_id] = Decimal(str(item_data['unit_price']))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise CheckoutError('Invalid inventory item data')
+    if len(prices) != len(items_data):
+        raise CheckoutError('Duplicate inventory items')
+    return prices
+
+
+def _hold_transitions():
+    """
+    HOLD 状态及所有可转换到 HOLD 的规则
+
+    Returns:
+        tuple: (ItemState, {from_state_id: StateTransition})
+    """
+    hold_state = item_states.get_state(item_states.HOLD)
+    if hold_state is None:
+        raise CheckoutError('HOLD state not found in system')
+
+    return hold_state, item_states.transitions_to(hold_state.id)
+
+
+def lock_items(item_queryset, item_ids):
+    """
+    锁定要下单的商品
+
+    Args:
+        item_queryset (QuerySet): 可售商品范围（公司已发布商品）
+        item_ids (iterable): 商品ID
+
+    Returns:
+        list: 按ID排序、已加锁的商品
+
+    Raises:
+        CheckoutConflict: 有商品正被其他事务锁定
+        CheckoutError: 有商品不存在或不可售
+        DatabaseError: 其他数据库错误（不转换为冲突）
+    """
+    item_ids = sorted(item_ids)
+    try:
+        items = list(
+            item_queryset.filter(id__in=item_ids)
+            .select_for_update(nowait=True, of=('self',))
+            .order_by('id')
+        )
+    except OperationalError as e:
+        if not _is_lock_conflict(e):
+            raise
+        logger.info(f"Checkout lock conflict for items {item_ids}")
+        raise CheckoutConflict(
+            'Some items in your cart are being ordered by another customer right now. Please try again.'
+        )
+
+    if len(items) != len(item_ids):
+        raise CheckoutError('Some inventory items not found')
+    return items
+
+
+def place_order(user, customer, location, item_queryset, items_data, shipping_address=None, shipping_miles=0):
+    """
+    创建订单并将商品置为 HOLD（需在事务中调用）
+
+    Args:
+        user (User): 下单用户
+        customer (Customer): 客户
+        location (Location): 下单门店
+        item_queryset (QuerySet): 可售商品范围
+        items_data (list): [{'inventory_item_id': int, 'unit_price': 数字或字符串}, ...]
+        shipping_address (CustomerAddress): 配送地址
+        shipping_miles (float): 配送距离（英里），无法计算时为 None
+
+    Returns:
+        Order: 新建的订单
+
+    Raises:
+        CheckoutConflict: 商品正被其他订单锁定
+        CheckoutError: 参数、商品或状态转换不合法
+    """
+    from ..models_proxy import InventoryItem, InventoryStateHistory, Order, OrderStatusHistory, ShoppingCart
+
+    prices = _parse_items(items_data)
+    hold_state, transitions = _hold_transitions()
+    items = lock_items(item_queryset, prices)
+
+    # 步骤0：在内存中校验所有商品的状态转换
+    for item in items:
+        if item.current_state_id == hold_state.id:
+            raise CheckoutConflict(f'Item {item.control_number} is already on hold')
+        if item.current_state_id not in transitions:
+            raise CheckoutError(f'Item {item.control_number} cannot be put on hold')
+
+    # 步骤1：创建订单
+    staff = getattr(user, 'staff', None)
+    order = Order.objects.create(
+        order_number=None,
+        company_id=location.company_id,
+        customer=customer,
+        location_id=location.id,
+        created_by=user,
+        order_status='PENDING',
+        payment_status='NOT_PAID',
+        total_amount=0,
+        tax_amount=0,
+        shipping_amount=0,
+        taxable_amount=0,
+        non_taxable_amount=0,
+        shipping_address=shipping_address.get_full_address() if shipping_address else None,
+        shipping_miles=shipping_miles,
+        receiver_name=user.get_full_name(),
+        receiver_phone=customer.phone,
+        receiver_email=user.email,
+        notes=None
+    )
+    OrderStatusHistory.objects.create(
+        order=order,
+        from_status=None,
+        to_status='PENDING',
+        changed_by=staff,
+        notes='Staff create order from dashboard' if staff else 'Customer create order from shopping cart'
+    )
+
+    # 步骤2：批量写入状态历史，再批量把商品关联到订单并置为 HOLD
+    InventoryStateHistory.objects.bulk_create([
+        InventoryStateHistory(
+            inventory_item=item,
+            state_transition=transitions[item.current_state_id],
+            changed_by=staff,
+            notes='Customer created Order'
+        )
+        for item in items
+    ])
+
+    now = timezone.now()
+    for item in items:
+        item.order = order
+        item.unit_price = prices[item.id]
+        item.current_state = hold_state
+        item.updated_at = now
+    updated = InventoryItem.objects.bulk_update(items, ['order', 'unit_price', 'current_state', 'updated_at'])
+    if updated != len(items):
+        raise CheckoutError('Failed to create order items')
+
+    # 删除这些商品的购物车记录
+    ShoppingCart.objects.filter(customer=customer, item_id__in=prices).delete()
+
+    transaction.on_commit(lambda: cache_versions.bump_version(cache_versions.INVENTORY))
+    return order
@@ -0,0 +1,153 @@
+"""
+Distance Service
+客户地址到公司各门店的距离（英里），购物车和下单共用
+
+- 一个地址到所有门店的距离一次算出（haversine；门店只有几个，逐个计算即可，不依赖 NumPy），
+  按地址ID保存在共享缓存中，购物车距离和订单的 shipping_miles 都从这里读取
+- 缓存中记录计算时的地址坐标，读取时坐标不一致即重新计算；本项目内地址保存/删除时
+  由信号清除（见 signals.py），门店地址变化通过门店缓存版本号失效
+"""
+
+import math
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import cache_versions
+
+DISTANCE_CACHE_ALIAS = 'shared'
+DISTANCE_TIMEOUT = 86400 * 7
+EARTH_RADIUS_MILES = 3958.7613
+
+_local = {'version': None, 'coordinates': None}
+_local_lock = threading.Lock()
+
+
+def _get_cache():
+    return caches[DISTANCE_CACHE_ALIAS]
+
+
+def _distance_key(address_id):
+    return cache_versions.versioned_key(cache_versions.LOCATION, f'address_distances:{address_id}')
+
+
+def _location_coordinates():
+    """
+    公司所有有坐标的门店/仓库（按门店缓存版本号在进程内缓存）
+
+    Returns:
+        tuple: (门店ID列表, 纬度列表, 经度列表)
+    """
+    from ..models_proxy import Location
+
+    version = cache_versions.get_version(cache_versions.LOCATION)
+    if _local['coordinates'] is not None and _local['version'] == version:
+        return _local['coordinates']
+
+    with _local_lock:
+        rows = Location.objects.filter(
+            company_id=settings.COMPANY_ID,
+            address__latitude__isnull=False,
+            address__longitude__isnull=False
+        ).values_list('id', 'address__latitude', 'address__longitude').order_by('id')
+        location_ids, latitudes, longitudes = [], [], []
+        for location_id, latitude, longitude in rows:
+            location_ids.append(location_id)
+            latitudes.append(float(latitude))
+            longitudes.append(float(longitude))
+        coordinates = (location_ids, latitudes, longitudes)
+        _local.update(version=version, coordinates=coordinates)
+    return coordinates
+
+
+def haversine_miles(latitude, longitude, latitudes, longitudes):
+    """
+    一个点到多个点的大圆距离
+
+    Args:
+        latitude (float): 起点纬度
+        longitude (float): 起点经度
+        latitudes (list): 终点纬度
+        longitudes (list): 终点经度
+
+    Returns:
+        list: 距离（英里），顺序与终点一致
+    """
+    lat1 = math.radians(latitude)
+    cos_lat1 = math.cos(lat1)
+    distances = []
+    for other_latitude, other_longitude in zip(latitudes, longitudes):
+        lat2 = math.radians(other_latitude)
+        dlat = lat2 - lat1
+        dlng = math.radians(other_longitude - longitude)
+        a = math.sin(dlat / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin(dlng / 2) ** 2
+        distances.append(2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(min(a, 1.0))))
+    return distances
+
+
+def _address_point(address):
+    if address.latitude is None or address.longitude is None:
+        return None
+    return float(address.latitude), float(address.longitude)
+
+
+def get_address_distances(address):
+    """
+    地址到公司所有门店的距离（带缓存）
+
+    Args:
+        address (CustomerAddress): 客户地址
+
+    Returns:
+        dict: {location_id: 距离（英里，保留一位小数）}，地址没有坐标时为空
+    """
+    point = _address_point(address)
+    if point is None:
+        return {}
+
+    cache = _get_cache()
+    key = _distance_key(address.id)
+    cached = cache.get(key)
+    if cached is not None and cached['point'] == point:
+        return cached['distances']
+
+    location_ids, latitudes, longitudes = _location_coordinates()
+    miles = haversine_miles(point[0], point[1], latitudes, longitudes)
+    distances = {location_id: round(distance, 1) for location_id, distance in zip(location_ids, miles)}
+    cache.set(key, {'point': point, 'distances': distances}, DISTANCE_TIMEOUT)
+    return distances
+
+
+def get_distance(address, location_id):
+    """地址到一个门店的距离（英里），无法计算时返回 None"""
+    return get_address_distances(address).get(location_id)
+
+
+def get_cart_distances(customer_id, address):
+    """
+    购物车中每个商品所在门店到地址的距离
+
+    Args:
+        customer_id (int): 客户ID
+        address (CustomerAddress): 客户地址
+
+    Returns:
+        dict: {购物车项ID: 距离（英里）}，门店没有坐标的商品不出现
+    """
+    from ..models_proxy import ShoppingCart
+
+    distances = get_address_distances(address)
+    if not distances:
+        return {}
+    cart_locations = ShoppingCart.objects.filter(customer_id=customer_id).values_list('id', 'item__location_id')
+    return {
+        cart_item_id: distances[location_id]
+        for cart_item_id, location_id in cart_locations
+        if location_id in distances
+    }
+
+
+def invalidate_address_distances(address_id):
+    """地址变化或删除时清除距离缓存"""
+    _get_cache().delete(_distance_key(address_id))
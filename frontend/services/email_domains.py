@@ -0,0 +1,170 @@
+"""
+Email Domain Verification Service
+邮箱域名的 MX 记录校验
+
+- 常见邮箱服务商（gmail.com、yahoo.com 等）在允许列表中，不查询 DNS；可通过 EMAIL_DOMAIN_ALLOWLIST 设置追加
+- MX 查询结果保存在共享缓存中：有效域名 VALID_TTL，无效域名（NXDOMAIN、空 MX）INVALID_TTL；
+  没有 MX 记录的域名按隐式 MX 规则（RFC 5321）通过 A/AAAA 记录收信，视为有效
+- 解析器总超时 DNS_LIFETIME 秒；超时或 DNS 服务器故障视为"未知"，不缓存，也不拒绝用户
+- check_domains() 用线程池并发查询，供批量复查已有客户邮箱使用
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.exception
+import dns.resolver
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+EMAIL_DOMAIN_CACHE_ALIAS = 'shared'
+VALID_TTL = 7 * 86400
+INVALID_TTL = 86400
+DNS_TIMEOUT = 1.0  # 单个 DNS 服务器的超时
+DNS_LIFETIME = 2.0  # 一次查询的总超时（包括重试其他服务器）
+
+VALID = 'valid'
+INVALID = 'invalid'
+UNKNOWN = 'unknown'
+
+COMMON_PROVIDERS = frozenset({
+    'gmail.com', 'googlemail.com',
+    'yahoo.com', 'ymail.com', 'rocketmail.com', 'yahoo.com.mx',
+    'outlook.com', 'hotmail.com', 'live.com', 'msn.com', 'hotmail.es', 'outlook.es',
+    'icloud.com', 'me.com', 'mac.com',
+    'aol.com', 'comcast.net', 'att.net', 'sbcglobal.net', 'bellsouth.net', 'verizon.net',
+    'charter.net', 'cox.net', 'earthlink.net',
+    'proton.me', 'protonmail.com', 'gmx.com', 'mail.com', 'zoho.com',
+})
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def _get_resolver():
+    """进程内共享的 DNS 解析器（带超时）"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                resolver = dns.resolver.Resolver()
+                resolver.timeout = DNS_TIMEOUT
+                resolver.lifetime = DNS_LIFETIME
+                _resolver = resolver
+    return _resolver
+
+
+def email_domain(email):
+    """
+    邮箱地址的域名部分
+
+    Args:
+        email (str): 邮箱地址
+
+    Returns:
+        str: 小写域名，格式无效时返回 None
+    """
+    if not email or email.count('@') != 1:
+        return None
+    domain = email.split('@')[1].strip().lower().rstrip('.')
+    return domain or None
+
+
+def _allowlist():
+    return COMMON_PROVIDERS | {d.lower() for d in getattr(settings, 'EMAIL_DOMAIN_ALLOWLIST', ())}
+
+
+def _lookup_mx(domain):
+    """查询 MX 记录，返回 VALID / INVALID / UNKNOWN"""
+    try:
+        answer = _get_resolver().resolve(domain, 'MX')
+    except dns.resolver.NXDOMAIN as e:
+        logger.warning(f"Email domain does not exist: {domain}: {e}")
+        return INVALID
+    except dns.resolver.NoAnswer:
+        # 域名存在但没有 MX 记录：邮件投递到域名本身的 A/AAAA 地址（隐式 MX）
+        logger.info(f"No MX records for {domain}, using implicit MX")
+        return VALID
+    except (dns.exception.Timeout, dns.resolver.NoNameservers) as e:
+        logger.warning(f"MX lookup for {domain} did not complete: {e}")
+        return UNKNOWN
+    except dns.exception.DNSException as e:
+        logger.error(f"MX lookup for {domain} failed: {e}")
+        return UNKNOWN
+
+    # 空 MX（"0 ."）表示该域名不接收邮件
+    exchanges = [str(r.exchange) for r in answer if str(r.exchange) not in ('', '.')]
+    if not exchanges:
+        logger.warning(f"Null MX for {domain}")
+        return INVALID
+    logger.info(f"Found MX records for {domain}: {exchanges}")
+    return VALID
+
+
+def check_domain(domain, use_cache=True):
+    """
+    检查域名是否能接收邮件
+
+    Args:
+        domain (str): 小写域名
+        use_cache (bool): False 时忽略已缓存的结果重新查询（结果仍写入缓存）
+
+    Returns:
+        str: VALID、INVALID 或 UNKNOWN（查询超时等，结果未缓存）
+    """
+    if domain in _allowlist():
+        return VALID
+
+    cache = caches[EMAIL_DOMAIN_CACHE_ALIAS]
+    key = f'email_domain:{domain}'
+    if use_cache:
+        status = cache.get(key)
+        if status is not None:
+            return status
+
+    status = _lookup_mx(domain)
+    if status == VALID:
+        cache.set(key, status, VALID_TTL)
+    elif status == INVALID:
+        cache.set(key, status, INVALID_TTL)
+    return status
+
+
+def check_domains(domains, max_workers=16, use_cache=True):
+    """
+    并发检查多个域名（批量复查用）
+
+    Args:
+        domains (iterable): 域名，重复的只查询一次
+        max_workers (int): 并发查询数
+        use_cache (bool): 见 check_domain
+
+    Returns:
+        dict: {域名: VALID / INVALID / UNKNOWN}
+    """
+    domains = list(dict.fromkeys(domains))
+    if not domains:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(domains)))) as executor:
+        statuses = executor.map(lambda domain: check_domain(domain, use_cache=use_cache), domains)
+        return dict(zip(domains, statuses))
+
+
+def is_valid_email_domain(email):
+    """
+    邮箱域名是否有效（accounts.utils.verify_email_domain 使用）
+
+    Args:
+        email (str): 邮箱地址
+
+    Returns:
+        bool: 格式无效或域名确定不能接收邮件时返回 False；DNS 查询未完成时返回 True，不因 DNS 故障拒绝用户
+    """
+    domain = email_domain(email)
+    if domain is None:
+        logger.warning(f"Invalid email format: {email}")
+        return False
+    return check_domain(domain) != INVALID
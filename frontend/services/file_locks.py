@@ -0,0 +1,52 @@
+"""
+File Locks
+进程间互斥锁（flock）：同一台服务器上的所有 web 进程共用缓存目录，锁文件放在缓存目录下
+
+缓存的 add() 在 FileBasedCache 上不是原子操作，多个进程可能同时拿到"锁"；
+需要严格互斥的地方（索引桶的读-改-写、快照刷新）使用这里的文件锁
+"""
+
+import fcntl
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+def cache_lock_dir(alias):
+    """缓存别名对应的锁目录（缓存的 LOCATION）"""
+    return settings.CACHES[alias]['LOCATION']
+
+
+@contextmanager
+def file_lock(lock_dir, name, timeout=0):
+    """
+    进程间互斥锁（持有进程退出时自动释放）
+
+    Args:
+        lock_dir (str): 锁文件所在目录
+        name (str): 锁名称
+        timeout (float): 等待锁的最长秒数，0 表示不等待
+
+    Yields:
+        bool: 是否获得了锁
+    """
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, f'{name}.lock'), 'a') as lock_file:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    acquired = False
+                    break
+                time.sleep(0.01)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
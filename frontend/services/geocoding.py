@@ -0,0 +1,107 @@
+"""
+Geocoding Service
+地址地理编码和地址验证结果的持久缓存
+
+- 按规范化的地址字符串（小写、去掉多余空格和标点）缓存 Geocoding API 的验证结果，
+  保存在共享（文件）缓存中，进程重启后仍有效；只缓存成功的结果，网络错误和配额错误不缓存
+- 客户地址的坐标查找顺序：地址上已保存的坐标 → 缓存 → API，新结果写回 CustomerAddress
+- 缓存时间不超过 Google Maps Platform 条款允许的 30 天
+"""
+
+import hashlib
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+
+from scripts.address_validator import AddressValidator, normalize_address
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_CACHE_ALIAS = 'shared'
+GEOCODE_TIMEOUT = 30 * 86400
+
+
+def customer_address_string(address):
+    """CustomerAddress 用于地理编码的地址字符串"""
+    return f"{address.street_address}, {address.city}, {address.state} {address.zip_code}"
+
+
+def _cache_key(address):
+    digest = hashlib.sha1(normalize_address(address).encode('utf-8')).hexdigest()
+    return f'geocode:{digest}'
+
+
+class CachedAddressValidator(AddressValidator):
+    """
+    带持久缓存的 AddressValidator
+
+    validate_address（以及基于它的 validate_address_legacy）先查缓存，成功的 API 结果写入缓存
+    """
+
+    def __init__(self, api_key=None, session=None):
+        super().__init__(api_key or settings.GOOGLE_MAPS_API_KEY, session=session)
+        self.cache = caches[GEOCODE_CACHE_ALIAS]
+        self.api_calls = 0  # 未命中缓存、实际调用API的次数
+
+    def validate_address(self, address):
+        key = _cache_key(address)
+        cached = self.cache.get(key)
+        if cached is not None:
+            # 缓存按规范化地址共享，结果中的原始地址使用本次输入
+            return dict(cached, address=address)
+
+        self.api_calls += 1
+        result = super().validate_address(address)
+        if result.get('valid'):
+            self.cache.set(key, result, GEOCODE_TIMEOUT)
+        return result
+
+
+def geocode(address, validator=None):
+    """
+    地址字符串的坐标（缓存 → API）
+
+    Args:
+        address (str): 地址字符串
+        validator (CachedAddressValidator): 可选，批量处理时复用
+
+    Returns:
+        dict: {'lat': float, 'lng': float}，无法地理编码时返回 None
+    """
+    if not normalize_address(address):
+        return None
+    if not getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+        logger.warning("Google Maps API key not configured")
+        return None
+
+    result = (validator or CachedAddressValidator()).validate_address(address)
+    if not result.get('valid'):
+        logger.info(f"Geocoding failed for address: {result.get('error')}")
+        return None
+    return result['location']
+
+
+def geocode_customer_address(address, validator=None):
+    """
+    客户地址的坐标：已保存的坐标 → 缓存 → API，新结果写回地址
+
+    Args:
+        address (CustomerAddress): 客户地址
+        validator (CachedAddressValidator): 可选，批量处理时复用
+
+    Returns:
+        dict: {'lat': float, 'lng': float}，无法地理编码时返回 None
+    """
+    if address.latitude is not None and address.longitude is not None:
+        return {'lat': float(address.latitude), 'lng': float(address.longitude)}
+
+    location = geocode(customer_address_string(address), validator=validator)
+    if location is None:
+        return None
+
+    address.latitude = Decimal(str(round(location['lat'], 6)))
+    address.longitude = Decimal(str(round(location['lng'], 6)))
+    address.save(update_fields=['latitude', 'longitude'])
+    return location
@@ -1,16 +1,36 @@
 """
 Google My Business Reviews Service
 获取并处理Google评论数据
+
+- Places API 的原始结果（每种语言模式一份）保存在共享缓存中，带软过期和硬过期时间：
+  软过期（REVIEWS_SOFT_TTL）后仍返回旧数据，同时由一个后台线程刷新；硬过期（REVIEWS_HARD_TTL）后才丢弃
+- 刷新由共享缓存中的锁保证同一时间只有一个进程调用 Google，刷新失败时保留旧数据，锁过期后再重试
+- 不同的数量、评分过滤都从同一份原始数据计算，不再分别缓存和请求
+- 页面请求从不等待 Google：缓存为空时触发后台刷新并返回 None（可用 refresh_google_reviews 命令预热）
+- API 地址可通过 GOOGLE_PLACES_DETAILS_URL 配置，测试时可指向本地模拟服务
 """
 
 import requests
 import logging
+import threading
+import time
 from datetime import datetime
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import caches
+
+from .http_client import get_session
 
 logger = logging.getLogger(__name__)
 
+REVIEWS_CACHE_ALIAS = 'shared'
+REVIEWS_SOFT_TTL = 604800  # 7天后后台刷新（7 * 24 * 3600 = 604800秒）
+REVIEWS_HARD_TTL = 30 * 86400  # 30天后丢弃
+REFRESH_LOCK_TIMEOUT = 300  # 刷新锁，失败后至少间隔这么久才重试
+DEFAULT_DETAILS_URL = 'https://maps.googleapis.com/maps/api/place/details/json'
+
+_refreshing = set()  # 本进程内正在刷新的缓存键
+_refreshing_lock = threading.Lock()
+
 
 class GoogleReviewsService:
     """Google My Business评论服务"""
@@ -18,11 +38,13 @@ class GoogleReviewsService:
     def __init__(self):
         self.api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', None)
         self.place_id = getattr(settings, 'GOOGLE_PLACE_ID', None)
-        self.cache_timeout = 604800  # 7天缓存（7 * 24 * 3600 = 604800秒）
+        self.details_url = getattr(settings, 'GOOGLE_PLACES_DETAILS_URL', DEFAULT_DETAILS_URL)
+        self.cache = caches[REVIEWS_CACHE_ALIAS]
+        self.session = get_session('google_places')
 
     def get_reviews(self, max_reviews=6, min_rating=None, show_multilingual=False):
         """
-        获取Google评论
+        获取Google评论（只读缓存，不等待 Google）
 
         Args:
             max_reviews (int): 最大评论数量
@@ -30,17 +52,37 @@ class GoogleReviewsService:
             show_multilingual (bool): 是否获取多语言评论
 
         Returns:
-            dict: 包含评论数据和评分信息
+            dict: 包含评论数据和评分信息，还没有缓存数据时返回 None
         """
         if not self.api_key or not self.place_id:
             logger.warning("Google Places API key or Place ID not configured")
             return None
 
-        # 检查缓存
-        cache_key = f'google_reviews_{self.place_id}_{max_reviews}_{min_rating}_{show_multilingual}'
-        cached_reviews = cache.get(cache_key)
-        if cached_reviews:
-            return cached_reviews
+        entry = self.cache.get(self._raw_cache_key(show_multilingual))
+        if entry is None or time.time() - entry['fetched_at'] >= REVIEWS_SOFT_TTL:
+            self._refresh_in_background(show_multilingual)
+        if entry is None:
+            return None
+
+        try:
+            return self._build_reviews_data(entry['result'], max_reviews, min_rating)
+        except Exception as e:
+            logger.error(f"Unexpected error when processing Google reviews: {e}")
+            return None
+
+    def refresh(self, show_multilingual=False):
+        """
+        从 Google 获取原始评论数据并写入缓存（同步）
+
+        Args:
+            show_multilingual (bool): 是否获取多语言评论
+
+        Returns:
+            bool: 是否成功
+        """
+        if not self.api_key or not self.place_id:
+            logger.warning("Google Places API key or Place ID not configured")
+            return False
 
         try:
             if show_multilingual:
@@ -49,36 +91,63 @@ class GoogleReviewsService:
             else:
                 # 获取默认语言评论
                 api_data = self._get_default_reviews()
-
-            if api_data is None:
-                return None
-
-            result = api_data['result']
-            all_reviews = self._process_reviews(result.get('reviews', []))
-            filtered_reviews = self._filter_reviews(all_reviews, min_rating, max_reviews)
-
-            reviews_data = {
-                'reviews': filtered_reviews,
-                'rating': result.get('rating', 0),
-                'total_ratings': result.get('user_ratings_total', 0),
-                'business_name': result.get('name', 'Appliances 4 Less Doraville'),
-                'filtered_count': len(filtered_reviews),
-                'total_fetched': len(all_reviews),
-                'min_rating_filter': min_rating
-            }
-
-            # 缓存结果
-            cache.set(cache_key, reviews_data, self.cache_timeout)
-
-            logger.info(f"Successfully fetched {len(reviews_data['reviews'])} Google reviews")
-            return reviews_data
-
         except requests.RequestException as e:
             logger.error(f"Network error when fetching Google reviews: {e}")
-            return None
+            return False
         except Exception as e:
             logger.error(f"Unexpected error when fetching Google reviews: {e}")
-            return None
+            return False
+
+        if api_data is None:
+            return False
+
+        result = api_data['result']
+        self.cache.set(
+            self._raw_cache_key(show_multilingual),
+            {'fetched_at': time.time(), 'result': result},
+            REVIEWS_HARD_TTL
+        )
+        logger.info(f"Successfully fetched {len(result.get('reviews', []))} Google reviews")
+        return True
+
+    def _raw_cache_key(self, show_multilingual):
+        return f'google_reviews_raw:{self.place_id}:{"multilingual" if show_multilingual else "default"}'
+
+    def _refresh_in_background(self, show_multilingual):
+        """在后台线程刷新，共享缓存中的锁保证所有进程中只有一个刷新者"""
+        raw_key = self._raw_cache_key(show_multilingual)
+        with _refreshing_lock:
+            if raw_key in _refreshing:
+                return
+            if not self.cache.add(f'{raw_key}:refresh_lock', True, REFRESH_LOCK_TIMEOUT):
+                return
+            _refreshing.add(raw_key)
+
+        def run():
+            try:
+                if self.refresh(show_multilingual):
+                    # 成功后释放锁；失败时保留到过期，避免频繁重试
+                    self.cache.delete(f'{raw_key}:refresh_lock')
+            finally:
+                with _refreshing_lock:
+                    _refreshing.discard(raw_key)
+
+        threading.Thread(target=run, name='google-reviews-refresh', daemon=True).start()
+
+    def _build_reviews_data(self, result, max_reviews, min_rating):
+        """从原始数据计算某个过滤条件下的评论数据"""
+        all_reviews = self._process_reviews(result.get('reviews', []))
+        filtered_reviews = self._filter_reviews(all_reviews, min_rating, max_reviews)
+
+        return {
+            'reviews': filtered_reviews,
+            'rating': result.get('rating', 0),
+            'total_ratings': result.get('user_ratings_total', 0),
+            'business_name': result.get('name', 'Appliances 4 Less Doraville'),
+            'filtered_count': len(filtered_reviews),
+            'total_fetched': len(all_reviews),
+            'min_rating_filter': min_rating
+        }
 
     def _process_reviews(self, raw_reviews):
         """
@@ -147,14 +216,14 @@ class GoogleReviewsService:
 
     def _get_default_reviews(self):
         """获取默认语言评论"""
-        url = "https://maps.googleapis.com/maps/api/place/details/json"
+        url = self.details_url
         params = {
             'place_id': self.place_id,
             'fields': 'reviews,rating,user_ratings_total,name',
             'key': self.api_key
         }
 
-        response = requests.get(url, params=params, timeout=10)
+        response = self.session.get(url, params=params)
         data = response.json()
 
         if data['status'] == 'OK' and 'result' in data:
@@ -172,7 +241,7 @@ class GoogleReviewsService:
         languages = [None, 'es']  # None=默认语言(通常是英语), 'es'=西班牙语
 
         for language in languages:
-            url = "https://maps.googleapis.com/maps/api/place/details/json"
+            url = self.details_url
             params = {
                 'place_id': self.place_id,
                 'fields': 'reviews,rating,user_ratings_total,name',
@@ -184,7 +253,7 @@ class GoogleReviewsService:
                 params['language'] = language
 
             try:
-                response = requests.get(url, params=params, timeout=10)
+                response = self.session.get(url, params=params)
                 data = response.json()
 
                 if data['status'] == 'OK' and 'result' in data:
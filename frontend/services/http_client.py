@@ -0,0 +1,229 @@
+"""
+Outbound HTTP Client
+所有第三方 HTTP 调用（reCAPTCHA、Google Places/Geocoding 等）共用的连接池客户端
+
+- 每个外部服务一个 requests.Session（keep-alive 连接池），TLS 握手不再每次请求重复
+- 按服务配置连接/读取超时、重试和退避（只对幂等方法重试读取和 5xx，POST 只重试连接失败）
+- 熔断：连续失败达到阈值后在 reset_timeout 内直接拒绝（CircuitOpenError），之后放行一次试探请求
+- 记录每个服务的调用次数、错误数、熔断拒绝数和耗时（进程内，见 get_metrics()）
+
+不依赖 Django，scripts/ 下的独立脚本也可以使用
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+SLOW_CALL_SECONDS = 2.0
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+@dataclass(frozen=True)
+class ServiceConfig:
+    """外部服务的连接配置"""
+    connect_timeout: float = 3.05
+    read_timeout: float = 10
+    retries: int = 2
+    backoff_factor: float = 0.3
+    failure_threshold: int = 5  # 连续失败多少次后熔断
+    reset_timeout: float = 30  # 熔断持续秒数
+    pool_maxsize: int = 10
+
+
+SERVICE_CONFIGS = {
+    'recaptcha': ServiceConfig(read_timeout=5, retries=1),
+    'google_places': ServiceConfig(),
+    'google_geocoding': ServiceConfig(),
+    # googlemaps 客户端自带重试，连接池层不再重试
+    'google_maps': ServiceConfig(retries=0),
+}
+DEFAULT_CONFIG = ServiceConfig()
+
+
+class CircuitOpenError(requests.RequestException):
+    """服务处于熔断状态，请求未发出"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（closed → open → half-open）"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return 'open'
+            return 'half-open'
+
+    def allow(self):
+        """是否放行本次请求（half-open 时只放行一个试探请求）"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class ServiceMetrics:
+    """单个服务的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def record(self, elapsed, error=None):
+        with self._lock:
+            self.calls += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            if error is not None:
+                self.errors += 1
+                self.last_error = error
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'avg_seconds': self.total_seconds / self.calls if self.calls else 0.0,
+                'max_seconds': self.max_seconds,
+                'last_error': self.last_error,
+            }
+
+
+class ServiceSession(requests.Session):
+    """
+    带默认超时、重试、熔断和统计的 Session
+
+    可直接传给第三方客户端（如 googlemaps.Client 的 requests_session），
+    它们发出的请求同样受超时、熔断和统计约束
+    """
+
+    def __init__(self, service, config):
+        super().__init__()
+        self.service = service
+        self.config = config
+        self.breaker = CircuitBreaker(config.failure_threshold, config.reset_timeout)
+        self.metrics = ServiceMetrics()
+
+        retry = Retry(
+            total=config.retries,
+            connect=config.retries,
+            read=config.retries,
+            status=config.retries,
+            backoff_factor=config.backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            raise_on_status=False,
+            respect_retry_after_header=False,  # 不让第三方的 Retry-After 占住 web worker
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.pool_maxsize, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (self.config.connect_timeout, self.config.read_timeout)
+
+        if not self.breaker.allow():
+            self.metrics.record_rejected()
+            raise CircuitOpenError(f'{self.service} circuit is open, request not sent')
+
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException as e:
+            elapsed = time.monotonic() - started
+            self.breaker.record_failure()
+            self.metrics.record(elapsed, error=type(e).__name__)
+            logger.warning(f"{self.service} {method} failed after {elapsed:.2f}s: {e}")
+            raise
+
+        elapsed = time.monotonic() - started
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            self.metrics.record(elapsed, error=f'HTTP {response.status_code}')
+        else:
+            self.breaker.record_success()
+            self.metrics.record(elapsed)
+        if elapsed >= SLOW_CALL_SECONDS:
+            logger.warning(f"Slow {self.service} call: {method} took {elapsed:.2f}s")
+        return response
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(service):
+    """
+    获取外部服务的共享 Session（每个进程每个服务一个）
+
+    Args:
+        service (str): 服务名称，见 SERVICE_CONFIGS；未配置的服务使用默认配置
+
+    Returns:
+        ServiceSession
+    """
+    session = _sessions.get(service)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(service)
+            if session is None:
+                session = _sessions[service] = ServiceSession(service, SERVICE_CONFIGS.get(service, DEFAULT_CONFIG))
+    return session
+
+
+def get_metrics():
+    """
+    各服务的调用统计（本进程）
+
+    Returns:
+        dict: {service: {'calls', 'errors', 'rejected', 'avg_seconds', 'max_seconds', 'last_error', 'circuit'}}
+    """
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {
+        service: dict(session.metrics.snapshot(), circuit=session.breaker.state)
+        for service, session in sessions.items()
+    }
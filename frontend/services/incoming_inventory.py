@@ -0,0 +1,99 @@
+"""
+Incoming Inventory Service
+即将到货的库存：状态为 CONVERTING 的批次（LoadManifest）中仍在运输途中的商品
+
+- 所有批次的商品一条 JOIN 查询取出（批次、门店、型号图片一并获取），一次遍历按批次和分类分组
+- 首页"有即将到货的库存"标志是一条 EXISTS 查询，结果保存在共享缓存中；
+  批次或库存在本项目内变化时版本号递增（见 signals.py），nasmaha 中的改动在 INCOMING_TIMEOUT 后生效
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import OuterRef, Subquery
+
+from . import cache_versions, item_states
+from .product_listing import card_image_url
+
+INCOMING_CACHE_ALIAS = 'shared'
+INCOMING_TIMEOUT = 600
+
+
+def incoming_items():
+    """
+    即将到货的商品查询集（与 nasmaha 的过滤逻辑一致）
+
+    Returns:
+        QuerySet: 公司 CONVERTING 批次中处于运输途中状态的商品
+    """
+    from ..models_proxy import InventoryItem, LoadManifest
+
+    return InventoryItem.objects.filter(
+        load_number__status=LoadManifest.Status.CONVERTING,
+        load_number__company_id=settings.COMPANY_ID,
+        current_state_id__in=item_states.state_ids(item_states.INCOMING)
+    )
+
+
+def get_incoming_loads():
+    """
+    按批次和分类分组的即将到货商品
+
+    Returns:
+        list: [{'manifest': LoadManifest, 'location': Location, 'category_items': {Category: [商品, ...]},
+            'total_items': int}, ...]，按门店名称、采购日期倒序排列，没有商品的批次不出现；
+            商品带 card_image_url（型号的第一张图片）
+    """
+    from ..models_proxy import ProductImage
+
+    first_model_image = ProductImage.objects.filter(
+        product_model_id=OuterRef('model_number_id')
+    ).order_by('id').values('image')[:1]
+
+    items = incoming_items().select_related(
+        'load_number',
+        'load_number__location',
+        'load_number__location__address',
+        'model_number__brand',
+        'model_number__category',
+        'location'
+    ).annotate(
+        model_image=Subquery(first_model_image)
+    ).order_by(
+        'load_number__location__name', '-load_number__purchase_date', '-load_number__created_at',
+        'load_number_id', 'id'
+    )
+
+    loads = {}
+    for item in items:
+        item.card_image_url = card_image_url(None, item.model_image)
+        manifest = item.load_number
+        load = loads.get(manifest.id)
+        if load is None:
+            load = loads[manifest.id] = {
+                'manifest': manifest,
+                'location': manifest.location,
+                'category_items': {},
+                'total_items': 0,
+            }
+        load['category_items'].setdefault(item.model_number.category, []).append(item)
+        load['total_items'] += 1
+    return list(loads.values())
+
+
+def has_incoming_inventory():
+    """
+    是否有即将到货的商品（带缓存）
+
+    Returns:
+        bool
+    """
+    cache = caches[INCOMING_CACHE_ALIAS]
+    key = (
+        f'has_incoming_inventory:m{cache_versions.get_version(cache_versions.LOAD_MANIFEST)}'
+        f':i{cache_versions.get_version(cache_versions.INVENTORY)}'
+    )
+    result = cache.get(key)
+    if result is None:
+        result = incoming_items().exists()
+        cache.set(key, result, INCOMING_TIMEOUT)
+    return result
@@ -0,0 +1,98 @@
+"""
+Inventory Count Service
+用一条条件聚合查询计算多组库存数量，替代逐个 COUNT(*) 查询
+"""
+
+import hashlib
+import logging
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import cache_versions, item_states
+
+logger = logging.getLogger(__name__)
+
+HOMEPAGE_COUNTS_TIMEOUT = 300  # 5分钟，兜底 nasmaha 中的库存变化（本项目内的变化通过版本号立即失效）
+
+
+def count_by_filters(queryset, named_filters):
+    """
+    在一条查询中计算多个筛选条件各自匹配的数量
+
+    Args:
+        queryset (QuerySet): 基础查询集
+        named_filters (dict): {名称: Q对象}
+
+    Returns:
+        dict: {名称: 数量}
+    """
+    if not named_filters:
+        return {}
+
+    names = list(named_filters.keys())
+    aggregates = {
+        f'count_{index}': Count('id', filter=named_filters[name])
+        for index, name in enumerate(names)
+    }
+    result = queryset.aggregate(**aggregates)
+    return {name: result[f'count_{index}'] or 0 for index, name in enumerate(names)}
+
+
+def get_homepage_counts(queryset, seo_pages, category_slugs):
+    """
+    计算首页SEO页面和特色分类的商品数量（带缓存）
+    SEO页面数量读取库存快照，特色分类数量用一条聚合查询计算
+
+    Args:
+        queryset (QuerySet): 公司范围内已发布商品的查询集
+        seo_pages (list): get_homepage_seo_pages() 的返回值
+        category_slugs (list): 特色分类slug列表
+
+    Returns:
+        dict: {
+            'seo_pages': {page_key: count},
+            'categories': {slug: {'category': Category, 'count': count}},  # 不存在的分类不包含在内
+        }
+    """
+    from .seo_snapshot import get_pages_stats
+    from ..models_proxy import Category
+
+    # 页面和分类组合可能很长，用摘要作为缓存键
+    signature = ','.join([page['key'] for page in seo_pages] + list(category_slugs))
+    cache_key = cache_versions.versioned_key(
+        cache_versions.INVENTORY,
+        'homepage_counts:' + hashlib.md5(signature.encode('utf-8')).hexdigest()
+    )
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    named_filters = {}
+    categories = {
+        category.slug: category
+        for category in Category.objects.filter(slug__in=category_slugs)
+    }
+    for slug in category_slugs:
+        category = categories.get(slug)
+        if category is None:
+            logger.warning(f"Featured category not found: {slug}")
+            continue
+        # 当前分类及其直接子分类的可售商品
+        named_filters[slug] = (
+            (Q(model_number__category=category) | Q(model_number__category__parent_category_id=category.id))
+            & Q(published=True, current_state_id__in=item_states.state_ids(item_states.SELLABLE))
+        )
+
+    counts = count_by_filters(queryset, named_filters)
+
+    # 不在快照中的页面（配置出错）不包含在内
+    page_stats = get_pages_stats([page['key'] for page in seo_pages])
+    result = {
+        'seo_pages': {key: stats['count'] for key, stats in page_stats.items()},
+        'categories': {},
+    }
+    for slug, count in counts.items():
+        result['categories'][slug] = {'category': categories[slug], 'count': count}
+
+    cache.set(cache_key, result, HOMEPAGE_COUNTS_TIMEOUT)
+    return result
@@ -0,0 +1,309 @@
+"""
+Item Hash Index Service
+维护 URL 哈希 → 商品ID 的索引，替代 decode_item_id 的全表扫描
+
+索引按哈希前两位分成 256 个桶，存放在独立的 item_index 缓存中（条目固定，不会被淘汰）。
+每个桶是 {'complete_to': ID, 'entries': {hash: item_id}}：ID 不大于 complete_to 的商品如果属于该桶，
+一定在 entries 中。查找只需读取一个桶，再按主键取一次商品。
+
+新商品由 nasmaha 创建，本项目收不到其信号，因此未命中时为 ID 大于该桶 complete_to 的商品计算哈希；
+桶丢失时 complete_to 视为 0，会重新计算所有商品。完整范围和索引项保存在同一个缓存条目中，不会出现
+"范围记录还在、索引项已丢失"的情况。
+
+nasmaha 的事务不一定按 ID 顺序提交（补齐时可能先看到 1002、后提交 1001），因此 complete_to 只推进到
+创建时间早于 SETTLE_SECONDS 的商品：最近创建的商品仍写入索引，但未命中时会被重新扫描，晚提交的商品
+也能找到。
+
+所有对桶的读-改-写都持有进程间文件锁，信号和补齐不会互相覆盖。
+"""
+
+import logging
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils import timezone
+
+from ..utils import get_item_hash_for_id, sanitize_hash_for_cache_key
+from .file_locks import cache_lock_dir, file_lock
+
+logger = logging.getLogger(__name__)
+
+INDEX_CACHE_ALIAS = 'item_index'
+BUCKET_KEY_PREFIX = 'item_hash_index:v2:bucket:'
+BUCKET_KEYS = [f'{BUCKET_KEY_PREFIX}{prefix:02x}' for prefix in range(256)]
+CHUNK_SIZE = 2000
+LOCK_TIMEOUT = 10  # 等待锁的最长秒数
+SETTLE_SECONDS = 600  # 创建超过该时间的商品，ID 更小的商品都已提交（完整范围只推进到这些商品）
+
+
+def _get_cache():
+    return caches[INDEX_CACHE_ALIAS]
+
+
+def _bucket_key(item_hash):
+    """哈希所在桶的缓存键（取哈希前两位）"""
+    return f'{BUCKET_KEY_PREFIX}{item_hash[:2]}'
+
+
+def _empty_bucket():
+    return {'complete_to': 0, 'entries': {}}
+
+
+def _file_lock(name, timeout=LOCK_TIMEOUT):
+    """索引的进程间文件锁（锁文件在 item_index 缓存目录下）"""
+    return file_lock(cache_lock_dir(INDEX_CACHE_ALIAS), name, timeout)
+
+
+def _update_buckets(keys, update):
+    """
+    持有写锁读取、修改并写回桶
+
+    Args:
+        keys (iterable): 桶的缓存键
+        update (callable): update(buckets)，就地修改 {key: bucket}
+
+    Returns:
+        bool: 是否写入（等待锁超时返回 False，索引保持原状）
+    """
+    keys = list(keys)
+    with _file_lock('write') as acquired:
+        if not acquired:
+            logger.warning("Item hash index write lock timed out, update skipped")
+            return False
+        cache = _get_cache()
+        existing = cache.get_many(keys)
+        buckets = {key: existing.get(key) or _empty_bucket() for key in keys}
+        update(buckets)
+        cache.set_many(buckets, timeout=None)
+    return True
+
+
+def build_hash_mapping(item_ids, secret_key=None):
+    """
+    为一批商品ID计算哈希
+    不访问数据库，可直接在进程池中执行
+
+    Args:
+        item_ids (iterable): 商品ID
+        secret_key (str): 哈希密钥，默认读取 settings
+
+    Returns:
+        dict: {hash: item_id}
+    """
+    return {get_item_hash_for_id(item_id, secret_key): item_id for item_id in item_ids}
+
+
+def write_hash_mapping(mapping):
+    """
+    将 {hash: item_id} 合并到索引桶（不改变桶的完整范围）
+
+    Args:
+        mapping (dict): 哈希到商品ID的映射
+
+    Returns:
+        int: 写入的映射数量，写锁超时返回 0
+    """
+    if not mapping:
+        return 0
+
+    grouped = {}
+    for item_hash, item_id in mapping.items():
+        grouped.setdefault(_bucket_key(item_hash), {})[item_hash] = item_id
+
+    def merge(buckets):
+        for key, entries in grouped.items():
+            buckets[key]['entries'].update(entries)
+
+    return len(mapping) if _update_buckets(grouped, merge) else 0
+
+
+def mark_complete(covered_from, covered_to):
+    """
+    记录 (covered_from, covered_to] 范围内的商品已全部写入索引
+    只推进已完整覆盖到 covered_from 的桶（缺失的桶视为 0）
+
+    Args:
+        covered_from (int): 本次扫描的起点（不含）
+        covered_to (int): 本次扫描到的最大商品ID
+
+    Returns:
+        bool: 是否写入
+    """
+    def advance(buckets):
+        for bucket in buckets.values():
+            if covered_from <= bucket['complete_to'] < covered_to:
+                bucket['complete_to'] = covered_to
+
+    return _update_buckets(BUCKET_KEYS, advance)
+
+
+def settled_max_id(covered_from, covered_to):
+    """
+    (covered_from, covered_to] 范围内创建超过 SETTLE_SECONDS 的最大商品ID
+    ID 不大于它的商品都已提交，完整范围推进到这里不会漏掉晚提交的商品
+
+    Returns:
+        int: 商品ID，范围内没有这样的商品时返回 None
+    """
+    from ..models_proxy import InventoryItem
+
+    cutoff = timezone.now() - timedelta(seconds=SETTLE_SECONDS)
+    return InventoryItem.objects.filter(
+        id__gt=covered_from, id__lte=covered_to, created_at__lt=cutoff
+    ).aggregate(max_id=Max('id'))['max_id']
+
+
+def iter_id_chunks(after_id=0, chunk_size=CHUNK_SIZE):
+    """
+    按ID顺序分块读取 ID 大于 after_id 的所有商品（含已售商品，与 decode_item_id 的查找范围一致）
+
+    Yields:
+        list: 商品ID
+    """
+    from ..models_proxy import InventoryItem
+
+    queryset = InventoryItem.objects.filter(id__gt=after_id).order_by('id')
+    chunk = []
+    for item_id in queryset.values_list('id', flat=True).iterator(chunk_size=chunk_size):
+        chunk.append(item_id)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_chunks(mappings, covered_from=None, progress=None):
+    """
+    逐块写入哈希映射；covered_from 不为空时，全部写入成功后推进桶的完整范围（只推进到 settled_max_id）
+
+    Args:
+        mappings (iterable): 按ID顺序的 {hash: item_id} 块（来自 iter_id_chunks 的 ID）
+        covered_from (int): 这些块覆盖了 ID 大于该值的所有商品；部分扫描（如 --since）传 None
+        progress (callable): 可选，每块写入后调用 progress(已写入数量)
+
+    Returns:
+        tuple: (写入的映射数量, 最大商品ID)
+    """
+    written = 0
+    highest = None
+    complete = True
+    for mapping in mappings:
+        if not mapping:
+            continue
+        count = write_hash_mapping(mapping)
+        complete = complete and count == len(mapping)
+        written += count
+        chunk_max = max(mapping.values())
+        highest = chunk_max if highest is None else max(highest, chunk_max)
+        if progress:
+            progress(written)
+
+    if covered_from is not None and complete and highest is not None:
+        settled = settled_max_id(covered_from, highest)
+        if settled is not None:
+            mark_complete(covered_from, settled)
+    return written, highest
+
+
+def index_items(item_ids):
+    """
+    将指定商品加入索引（商品创建时调用）
+
+    Args:
+        item_ids (iterable): 商品ID
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    write_hash_mapping(build_hash_mapping(item_ids))
+
+
+def remove_item(item_id):
+    """从索引中移除商品（商品删除时调用）"""
+    item_hash = get_item_hash_for_id(item_id)
+
+    def remove(buckets):
+        for bucket in buckets.values():
+            bucket['entries'].pop(item_hash, None)
+
+    _update_buckets([_bucket_key(item_hash)], remove)
+
+
+def prune_deleted():
+    """
+    清理已删除商品的索引项（逐桶检查，内存只保留一个桶）
+
+    Returns:
+        int: 清理的索引项数量
+    """
+    from ..models_proxy import InventoryItem
+
+    pruned = 0
+    for key in BUCKET_KEYS:
+        bucket = _get_cache().get(key)
+        if not bucket or not bucket['entries']:
+            continue
+        existing = set(
+            InventoryItem.objects.filter(id__in=bucket['entries'].values()).values_list('id', flat=True)
+        )
+        stale = [item_hash for item_hash, item_id in bucket['entries'].items() if item_id not in existing]
+        if not stale:
+            continue
+
+        def remove(buckets, stale=stale):
+            for item_hash in stale:
+                buckets[key]['entries'].pop(item_hash, None)
+
+        if _update_buckets([key], remove):
+            pruned += len(stale)
+    return pruned
+
+
+def catch_up(after_id):
+    """
+    补齐索引：为 ID 大于 after_id 的商品计算哈希并写入
+
+    Args:
+        after_id (int): 起点（不含），通常是未命中的桶的 complete_to
+
+    Returns:
+        int: 本次新索引的商品数量
+    """
+    indexed, highest = write_chunks(
+        (build_hash_mapping(chunk) for chunk in iter_id_chunks(after_id)), covered_from=after_id
+    )
+    if indexed:
+        logger.info(f"Item hash index caught up: {indexed} items after id {after_id}, max_id={highest}")
+    return indexed
+
+
+def get_bucket(item_hash):
+    """哈希所在的桶，不存在时返回空桶（complete_to=0）"""
+    return _get_cache().get(_bucket_key(item_hash)) or _empty_bucket()
+
+
+def lookup_item_id(item_hash):
+    """
+    根据哈希查找商品ID
+
+    Args:
+        item_hash (str): 已通过 is_valid_hash 校验的哈希
+
+    Returns:
+        int: 商品ID，找不到返回 None
+    """
+    item_hash = sanitize_hash_for_cache_key(item_hash)
+    item_id = get_bucket(item_hash)['entries'].get(item_hash)
+    if item_id is not None:
+        return item_id
+
+    # 未命中：可能是 nasmaha 新建的商品或桶已丢失。同一时间只有一个请求补齐，其他请求等待后重新读取
+    with _file_lock('catch_up') as acquired:
+        bucket = get_bucket(item_hash)
+        item_id = bucket['entries'].get(item_hash)
+        if item_id is None and acquired:
+            catch_up(bucket['complete_to'])
+            item_id = get_bucket(item_hash)['entries'].get(item_hash)
+    return item_id
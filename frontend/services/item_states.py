@@ -0,0 +1,112 @@
+"""
+Item State Reference Data
+商品状态（ItemState）和状态转换规则（StateTransition）的进程内查找表
+
+- 所有状态和转换规则一次读取，按名称/ID 查状态、按 (from, to) 查转换规则都是字典查找
+- 保存在共享缓存中，各进程再保留一份本地副本；本项目内的改动使版本号递增（见 signals.py），
+  nasmaha 中的改动在 REFERENCE_TIMEOUT 后生效
+- 前台使用的状态分组（可售、运输途中）只在这里定义
+"""
+
+import threading
+import time
+
+from django.core.cache import caches
+
+from . import cache_versions
+
+REFERENCE_CACHE_ALIAS = 'shared'
+REFERENCE_TIMEOUT = 3600
+
+HOLD = 'HOLD'
+
+# 状态分组（状态ID与 nasmaha 一致）
+SELLABLE = 'sellable'  # WAITING FOR TESTING (4), TEST (5), FOR SALE (8)
+INCOMING = 'incoming'  # 运输途中，与 nasmaha 的到货追踪状态一致 (1, 2, 3)
+STATE_GROUPS = {
+    SELLABLE: (4, 5, 8),
+    INCOMING: (1, 2, 3),
+}
+
+_local = {'version': None, 'loaded_at': 0.0, 'tables': None}
+_local_lock = threading.Lock()
+
+
+class StateTables:
+    """状态和转换规则查找表"""
+
+    def __init__(self, states, transitions):
+        self.states_by_id = {state.id: state for state in states}
+        self.states_by_name = {state.name: state for state in states}
+        self.transitions = {}
+        self.transitions_to = {}  # to_state_id → {from_state_id: 转换规则}
+        for transition in transitions:
+            self.transitions[(transition.from_state_id, transition.to_state_id)] = transition
+            self.transitions_to.setdefault(transition.to_state_id, {})[transition.from_state_id] = transition
+
+
+def _load_tables():
+    from ..models_proxy import ItemState, StateTransition
+    return StateTables(list(ItemState.objects.all()), list(StateTransition.objects.all()))
+
+
+def get_tables():
+    """
+    获取当前的查找表（版本号变化或超过 REFERENCE_TIMEOUT 时重新加载）
+
+    Returns:
+        StateTables: 查找表，在请求间共享，调用方不应修改
+    """
+    version = cache_versions.get_version(cache_versions.ITEM_STATE)
+    if (
+        _local['tables'] is not None
+        and _local['version'] == version
+        and time.monotonic() - _local['loaded_at'] < REFERENCE_TIMEOUT
+    ):
+        return _local['tables']
+
+    with _local_lock:
+        shared_cache = caches[REFERENCE_CACHE_ALIAS]
+        key = f'item_state_tables:v{version}'
+        tables = shared_cache.get(key)
+        if tables is None:
+            tables = _load_tables()
+            shared_cache.set(key, tables, REFERENCE_TIMEOUT)
+
+        _local.update(version=version, loaded_at=time.monotonic(), tables=tables)
+    return tables
+
+
+def state_ids(group):
+    """状态分组的状态ID，如 state_ids(SELLABLE)"""
+    return STATE_GROUPS[group]
+
+
+def get_state(name):
+    """按名称获取状态，不存在时返回 None"""
+    return get_tables().states_by_name.get(name)
+
+
+def get_state_by_id(state_id):
+    """按ID获取状态，不存在时返回 None"""
+    return get_tables().states_by_id.get(state_id)
+
+
+def get_transition(from_state_id, to_state_id):
+    """获取状态转换规则，不允许该转换时返回 None"""
+    return get_tables().transitions.get((from_state_id, to_state_id))
+
+
+def transitions_to(to_state_id):
+    """
+    可转换到指定状态的所有规则
+
+    Returns:
+        dict: {from_state_id: StateTransition}，调用方不应修改
+    """
+    return get_tables().transitions_to.get(to_state_id, {})
+
+
+def invalidate_item_states():
+    """使所有进程的查找表失效"""
+    cache_versions.bump_version(cache_versions.ITEM_STATE)
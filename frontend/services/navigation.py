@@ -0,0 +1,86 @@
+"""
+Navigation Context Service
+所有前台页面共用的导航数据：顶级分类（含子分类）和公司门店列表
+
+- 按分类和门店的缓存版本构建一次，保存在共享缓存中，各进程再保留一份本地副本，
+  页面渲染导航不再产生数据库查询
+- 本项目内的分类、门店、地址和营业时间变化会使版本号递增（见 signals.py）；
+  nasmaha 中的改动在 NAVIGATION_TIMEOUT 后生效
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import cache_versions
+
+NAVIGATION_CACHE_ALIAS = 'shared'
+NAVIGATION_TIMEOUT = 3600
+
+_local = {'versions': None, 'loaded_at': 0.0, 'context': None}
+_local_lock = threading.Lock()
+
+
+def _load_categories():
+    """顶级分类，预加载子分类（模板中的 category.subcategories.all）"""
+    from ..models_proxy import Category
+    return list(
+        Category.objects.filter(parent_category_id__isnull=True).prefetch_related('subcategories')
+    )
+
+
+def _load_stores():
+    """公司营业中的门店，预加载地址和营业时间"""
+    from ..models_proxy import Location
+    return list(
+        Location.objects.filter(
+            company_id=settings.COMPANY_ID,
+            is_active=True,
+            location_type='STORE'
+        ).select_related('address', 'company').prefetch_related('business_hours')
+    )
+
+
+def _build_context():
+    return {
+        'categories': _load_categories(),
+        'stores': _load_stores(),
+    }
+
+
+def get_navigation_context():
+    """
+    获取导航数据
+
+    Returns:
+        dict: {'categories': [Category, ...], 'stores': [Location, ...]}
+            返回的列表在请求间共享，调用方不应修改
+    """
+    versions = (
+        cache_versions.get_version(cache_versions.CATEGORY),
+        cache_versions.get_version(cache_versions.LOCATION),
+    )
+    if (
+        _local['context'] is not None
+        and _local['versions'] == versions
+        and time.monotonic() - _local['loaded_at'] < NAVIGATION_TIMEOUT
+    ):
+        return _local['context']
+
+    with _local_lock:
+        shared_cache = caches[NAVIGATION_CACHE_ALIAS]
+        key = f'navigation_context:c{versions[0]}:l{versions[1]}'
+        context = shared_cache.get(key)
+        if context is None:
+            context = _build_context()
+            shared_cache.set(key, context, NAVIGATION_TIMEOUT)
+
+        _local.update(versions=versions, loaded_at=time.monotonic(), context=context)
+    return context
+
+
+def invalidate_navigation():
+    """使所有进程的门店导航数据失效（分类变化由分类版本号处理）"""
+    cache_versions.bump_version(cache_versions.LOCATION)
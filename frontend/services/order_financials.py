@@ -0,0 +1,80 @@
+"""
+Order Financials Service
+订单的已付金额、余额和虚拟转账合计
+
+- 单个订单：一条条件聚合查询（SUM ... FILTER / CASE WHEN）同时算出所有合计
+- 订单列表：annotate_financials() 在订单查询集上注解同样的合计，整个列表一条查询
+- 金额口径与 Order.calculate_paid_amount / calculate_order_balance 一致：
+  已付金额 = 实际/虚拟存款 + 实际/虚拟取款（取款为负数），余额 = 所有交易记录之和
+"""
+
+from decimal import Decimal
+
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+PAID_TRANSACTION_TYPES = ('DEPOSIT', 'VIRTUAL_DEPOSIT', 'WITHDRAWAL', 'VIRTUAL_WITHDRAWAL')
+
+FINANCIAL_FIELDS = ('paid_amount', 'balance', 'virtual_deposit_amount', 'virtual_withdrawal_amount')
+
+_MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _financial_expressions(prefix=''):
+    """
+    各合计的条件聚合表达式
+
+    Args:
+        prefix (str): 交易记录字段前缀（在订单查询集上为 'transactionrecord__'）
+
+    Returns:
+        dict: {字段名: 聚合表达式}，字段见 FINANCIAL_FIELDS
+    """
+    amount = f'{prefix}amount'
+    transaction_type = f'{prefix}transaction_type'
+
+    def total(condition=None):
+        return Coalesce(Sum(amount, filter=condition), Value(Decimal('0.00')), output_field=_MONEY_FIELD)
+
+    return {
+        'paid_amount': total(Q(**{f'{transaction_type}__in': PAID_TRANSACTION_TYPES})),
+        'balance': total(),
+        'virtual_deposit_amount': total(Q(**{transaction_type: 'VIRTUAL_DEPOSIT'})),
+        'virtual_withdrawal_amount': total(Q(**{transaction_type: 'VIRTUAL_WITHDRAWAL'})),
+    }
+
+
+def get_order_financials(order):
+    """
+    获取单个订单的金额合计
+
+    订单已通过 annotate_financials() 注解时直接使用注解值，不再查询
+
+    Args:
+        order (Order): 订单
+
+    Returns:
+        dict: {'paid_amount', 'balance', 'virtual_deposit_amount', 'virtual_withdrawal_amount'}，均为 Decimal
+    """
+    from ..models_proxy import TransactionRecord
+
+    if all(field in order.__dict__ for field in FINANCIAL_FIELDS):
+        return {field: order.__dict__[field] for field in FINANCIAL_FIELDS}
+
+    return TransactionRecord.objects.filter(order_id=order.pk).aggregate(**_financial_expressions())
+
+
+def annotate_financials(queryset):
+    """
+    为订单查询集注解金额合计（字段见 FINANCIAL_FIELDS），整个列表一条查询
+
+    通过 JOIN 交易记录再按订单分组实现，不要与其他一对多关联的注解或过滤组合使用，
+    否则金额会被重复累加
+
+    Args:
+        queryset (QuerySet): Order 查询集
+
+    Returns:
+        QuerySet: 注解后的查询集
+    """
+    return queryset.annotate(**_financial_expressions('transactionrecord__'))
@@ -0,0 +1,315 @@
+"""
+Product Listing Service
+商品列表（商店、分类、收藏、搜索结果）共用的单查询卡片数据
+
+- 第一张商品图片、第一张型号图片和收藏数通过子查询注解获取，不再按 images__isnull
+  拆成两个查询再在 Python 中拼接，也不会因 JOIN 图片表产生重复行
+- 节省金额和百分比在 SQL 中计算
+- 结果按固定顺序返回（新商品在前），分组展示时用窗口函数在数据库中截取每组前 N 个
+- 游标分页：按 (created_at, id) 或 (retail_price, id) 做 keyset 分页，每页只读取 PAGE_SIZE + 1 行，
+  翻到多深都不需要 OFFSET；游标经过签名，包含排序方式和上一页最后一个商品的排序值
+"""
+
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core import signing
+from django.db.models import (
+    Case, Count, DecimalField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When, Window
+)
+from django.db.models.functions import Cast, Coalesce, RowNumber
+from django.utils.dateparse import parse_datetime
+
+LISTING_ORDERING = ('-created_at', '-id')
+
+PAGE_SIZE = 24
+DEFAULT_SORT = 'newest'
+RELEVANCE_SORT = 'relevance'  # 搜索结果按相关度排序，游标为结果列表中的位置
+SORT_ORDERINGS = {
+    'newest': LISTING_ORDERING,
+    'price_asc': ('retail_price', 'id'),
+    'price_desc': ('-retail_price', '-id'),
+}
+CURSOR_SALT = 'frontend.product_listing.cursor'
+
+_MONEY_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+
+def card_image_url(item_image, model_image):
+    """卡片图片URL：商品图片优先，其次型号图片，都没有返回 None"""
+    from ..models_proxy import ItemImage
+    image = item_image or model_image
+    return ItemImage._meta.get_field('image').storage.url(image) if image else None
+
+
+def annotate_listing(queryset):
+    """
+    为商品查询集加上列表卡片所需的关联对象和注解
+
+    注解字段：
+        item_image: 第一张商品图片（相对路径，按 display_order、created_at）
+        model_image: 型号的第一张图片（相对路径）
+        favorite_count: 被收藏次数
+        savings / savings_percentage: 相对 MSRP 的节省金额和百分比（无 MSRP 时为 0）
+
+    Args:
+        queryset (QuerySet): InventoryItem 查询集
+
+    Returns:
+        QuerySet: 注解后的查询集（未排序）
+    """
+    from ..models_proxy import CustomerFavorite, ItemImage, ProductImage
+
+    first_item_image = ItemImage.objects.filter(
+        item_id=OuterRef('pk')
+    ).order_by('display_order', 'created_at').values('image')[:1]
+    first_model_image = ProductImage.objects.filter(
+        product_model_id=OuterRef('model_number_id')
+    ).order_by('id').values('image')[:1]
+    favorite_count = CustomerFavorite.objects.filter(
+        item_id=OuterRef('pk')
+    ).order_by().values('item_id').annotate(total=Count('id')).values('total')
+
+    has_msrp = Q(model_number__msrp__gt=0)
+    return queryset.select_related(
+        'model_number',
+        'model_number__brand',
+        'model_number__category',
+        'location'
+    ).annotate(
+        item_image=Subquery(first_item_image),
+        model_image=Subquery(first_model_image),
+        favorite_count=Coalesce(Subquery(favorite_count, output_field=IntegerField()), Value(0)),
+        savings=Case(
+            When(has_msrp, then=F('model_number__msrp') - F('retail_price')),
+            default=Value(0),
+            output_field=_MONEY_FIELD,
+        ),
+        savings_percentage=Case(
+            When(
+                has_msrp,
+                then=Cast(F('model_number__msrp') - F('retail_price'), FloatField()) * 100 / F('model_number__msrp')
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def listing_queryset(queryset, ordering=LISTING_ORDERING):
+    """annotate_listing() 并按列表顺序排序"""
+    return annotate_listing(queryset).order_by(*ordering)
+
+
+def build_cards(items):
+    """
+    执行查询并补充图片URL
+
+    Args:
+        items (iterable): annotate_listing() 的查询集
+
+    Returns:
+        list: 商品列表，每个商品带 card_image_url（商品图片优先，其次型号图片，都没有为 None）
+    """
+    cards = list(items)
+    for item in cards:
+        item.card_image_url = card_image_url(item.item_image, item.model_image)
+    return cards
+
+
+def get_listing(queryset, ordering=LISTING_ORDERING):
+    """单条查询获取排好序的商品卡片，见 annotate_listing()"""
+    return build_cards(listing_queryset(queryset, ordering))
+
+
+def get_listing_by_ids(queryset, item_ids):
+    """
+    按给定ID顺序获取商品卡片（搜索结果）
+
+    Returns:
+        list: 商品列表（ID已不存在时跳过）
+    """
+    position = {item_id: index for index, item_id in enumerate(item_ids)}
+    items = build_cards(annotate_listing(queryset.filter(id__in=item_ids)))
+    return sorted(items, key=lambda item: position[item.id])
+
+
+def get_grouped_listing(queryset, group_by, group_ids, per_group=None, ordering=LISTING_ORDERING):
+    """
+    按分组获取商品卡片
+
+    Args:
+        queryset (QuerySet): InventoryItem 查询集
+        group_by (Expression): 分组表达式（如分类ID），只保留值在 group_ids 中的商品
+        group_ids (list): 分组ID，决定返回的分组顺序
+        per_group (int): 每组最多返回的商品数，None 表示不限；限制时在数据库中用 ROW_NUMBER() 截取
+        ordering (tuple): 组内排序
+
+    Returns:
+        tuple: ({group_id: [商品, ...]}, {group_id: 商品总数})，没有商品的分组不出现
+    """
+    grouped = annotate_listing(queryset).annotate(listing_group=group_by).filter(listing_group__in=group_ids)
+
+    if per_group is None:
+        items = build_cards(grouped.order_by(*ordering))
+        counts = None
+    else:
+        items = build_cards(
+            grouped.annotate(
+                listing_rank=Window(RowNumber(), partition_by=F('listing_group'), order_by=list(ordering))
+            ).filter(listing_rank__lte=per_group).order_by(*ordering)
+        )
+        counts = dict(
+            queryset.annotate(listing_group=group_by).filter(
+                listing_group__in=group_ids
+            ).order_by().values_list('listing_group').annotate(total=Count('id'))
+        )
+
+    groups = {}
+    for item in items:
+        groups.setdefault(item.listing_group, []).append(item)
+    if counts is None:
+        counts = {group_id: len(group) for group_id, group in groups.items()}
+    ordered = {group_id: groups[group_id] for group_id in group_ids if group_id in groups}
+    return ordered, counts
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析、签名错误或与排序方式不匹配"""
+
+
+def normalize_sort(sort):
+    """未知的排序方式按默认排序处理"""
+    return sort if sort in SORT_ORDERINGS else DEFAULT_SORT
+
+
+def _sort_field(sort):
+    return SORT_ORDERINGS[sort][0].lstrip('-')
+
+
+def encode_cursor(sort, value, item_id=None):
+    """
+    生成下一页游标
+
+    Args:
+        sort (str): 排序方式（SORT_ORDERINGS 的键或 RELEVANCE_SORT）
+        value: 上一页最后一个商品的排序值（相关度排序时为下一页的起始位置）
+        item_id (int): 上一页最后一个商品的ID
+
+    Returns:
+        str: 签名后的游标
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    return signing.dumps([sort, value, item_id], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, sort):
+    """
+    解析游标
+
+    Returns:
+        tuple: (排序值, 商品ID)
+
+    Raises:
+        InvalidCursor: 游标无效或排序方式不匹配
+    """
+    try:
+        cursor_sort, value, item_id = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if cursor_sort != sort:
+        raise InvalidCursor('Cursor does not match sort order')
+
+    try:
+        if sort == RELEVANCE_SORT:
+            return max(int(value), 0), None
+        if _sort_field(sort) == 'created_at':
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError(value)
+        else:
+            value = Decimal(value)
+        return value, int(item_id)
+    except (TypeError, ValueError, InvalidOperation):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after_cursor(sort, value, item_id):
+    """排序位于游标之后的商品：(排序值, id) 严格大于（降序时小于）游标"""
+    ordering = SORT_ORDERINGS[sort]
+    field = _sort_field(sort)
+    lookup = 'lt' if ordering[0].startswith('-') else 'gt'
+    return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': item_id})
+
+
+def _page(items, sort, page_size):
+    """多取一行判断是否还有下一页"""
+    has_more = len(items) > page_size
+    items = items[:page_size]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, getattr(last, _sort_field(sort)), last.id)
+    return {'items': items, 'next_cursor': next_cursor, 'sort': sort}
+
+
+def paginate_listing(queryset, sort=DEFAULT_SORT, cursor=None, page_size=PAGE_SIZE):
+    """
+    游标分页获取商品卡片
+
+    Args:
+        queryset (QuerySet): InventoryItem 查询集
+        sort (str): 排序方式，见 SORT_ORDERINGS
+        cursor (str): 上一页返回的 next_cursor，None 表示第一页
+        page_size (int): 每页数量
+
+    Returns:
+        dict: {'items': [商品, ...], 'next_cursor': str 或 None, 'sort': str}
+
+    Raises:
+        InvalidCursor: 游标无效
+    """
+    sort = normalize_sort(sort)
+    queryset = annotate_listing(queryset)
+    if cursor:
+        queryset = queryset.filter(_after_cursor(sort, *decode_cursor(cursor, sort)))
+    items = build_cards(queryset.order_by(*SORT_ORDERINGS[sort])[:page_size + 1])
+    return _page(items, sort, page_size)
+
+
+def paginate_groups(queryset, group_by, group_ids, sort=DEFAULT_SORT, page_size=PAGE_SIZE):
+    """
+    每个分组的第一页（一条窗口查询取出所有分组的第一页）
+
+    Returns:
+        tuple: ({group_id: 分页结果}, {group_id: 商品总数})，分页结果结构同 paginate_listing()
+    """
+    sort = normalize_sort(sort)
+    groups, counts = get_grouped_listing(
+        queryset, group_by, group_ids, per_group=page_size + 1, ordering=SORT_ORDERINGS[sort]
+    )
+    pages = {group_id: _page(items, sort, page_size) for group_id, items in groups.items()}
+    return pages, counts
+
+
+def paginate_ids(queryset, item_ids, cursor=None, page_size=PAGE_SIZE):
+    """
+    按给定ID顺序分页（搜索结果），只加载当前页的商品
+
+    Returns:
+        dict: 结构同 paginate_listing()
+
+    Raises:
+        InvalidCursor: 游标无效
+    """
+    start = decode_cursor(cursor, RELEVANCE_SORT)[0] if cursor else 0
+    end = start + page_size
+    next_cursor = encode_cursor(RELEVANCE_SORT, end) if end < len(item_ids) else None
+    return {
+        'items': get_listing_by_ids(queryset, item_ids[start:end]),
+        'next_cursor': next_cursor,
+        'sort': RELEVANCE_SORT,
+    }
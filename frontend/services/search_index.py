@@ -0,0 +1,304 @@
+"""
+Search Index Service
+已发布商品的进程内倒排索引，供搜索结果页和搜索建议使用
+
+- 品牌、分类、描述按单词切分；型号去掉符号后索引所有后缀，保留原来"型号包含"的匹配方式
+- 查询词之间为 AND，每个词按前缀匹配（词表有序，二分查找）
+- 按字段加权计算相关度：型号 > 品牌 > 分类 > 描述，完整匹配高于前缀匹配
+- 增量更新：按 updated_at 水位线只读取变化的商品；本项目内的库存变化（版本号）立即触发增量更新，
+  nasmaha 中的删除、品牌/分类改名等在 FULL_REBUILD_INTERVAL 后的全量重建中生效
+- 定期全量重建在后台线程中构建新索引，完成后替换；重建期间请求继续使用旧索引
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from . import cache_versions
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = 60  # 秒，两次增量检查的最小间隔
+FULL_REBUILD_INTERVAL = 3600
+MIN_SUFFIX_LENGTH = 2
+
+# 字段权重：(完整匹配, 前缀匹配)
+FIELD_WEIGHTS = {
+    'model': (10.0, 6.0),
+    'brand': (5.0, 4.0),
+    'category': (4.0, 3.0),
+    'description': (1.5, 1.0),
+}
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """小写并按非字母数字切分"""
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def normalize_model_number(model_number):
+    """型号去掉空格、横线等符号"""
+    return ''.join(tokenize(model_number))
+
+
+def _document_terms(row):
+    """
+    商品的索引词及其字段权重
+
+    Returns:
+        dict: {term: (完整匹配权重, 前缀匹配权重)}，同一词出现在多个字段时取最高权重
+    """
+    terms = {}
+
+    def add(term, weights):
+        current = terms.get(term)
+        if current is None or weights[0] > current[0]:
+            terms[term] = weights
+
+    model = normalize_model_number(row['model_code'])
+    for start in range(len(model) - MIN_SUFFIX_LENGTH + 1):
+        add(model[start:], FIELD_WEIGHTS['model'] if start == 0 else FIELD_WEIGHTS['description'])
+    for token in tokenize(row['model_code']):
+        add(token, FIELD_WEIGHTS['model'])
+    for token in tokenize(row['brand_name']):
+        add(token, FIELD_WEIGHTS['brand'])
+    for token in tokenize(row['category_name']):
+        add(token, FIELD_WEIGHTS['category'])
+    for token in tokenize(row['model_description']):
+        add(token, FIELD_WEIGHTS['description'])
+    return terms
+
+
+class SearchIndex:
+    """倒排索引：词 → {商品ID: (完整匹配权重, 前缀匹配权重)}"""
+
+    def __init__(self):
+        self.postings = {}
+        self.documents = {}  # 商品ID → (索引词集合, 状态ID)
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    def add(self, row):
+        """加入或更新一个商品"""
+        item_id = row['id']
+        self.remove(item_id)
+        terms = _document_terms(row)
+        for term, weights in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                self._vocabulary_dirty = True
+            posting[item_id] = weights
+        self.documents[item_id] = (frozenset(terms), row['current_state_id'])
+
+    def remove(self, item_id):
+        document = self.documents.pop(item_id, None)
+        if document is None:
+            return
+        for term in document[0]:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(item_id, None)
+            if not posting:
+                del self.postings[term]
+                self._vocabulary_dirty = True
+
+    def _prefix_terms(self, prefix):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def search(self, query, state_ids=None, limit=None):
+        """
+        搜索商品
+
+        Args:
+            query (str): 查询字符串
+            state_ids (iterable): 只返回这些状态的商品，None 表示不限
+            limit (int): 最多返回数量
+
+        Returns:
+            list: 按相关度排序的商品ID
+        """
+        query_terms = tokenize(query)
+        # 整个查询去掉符号后也按型号匹配（如 "LH29-S8565"）
+        joined = normalize_model_number(query)
+        if len(query_terms) > 1 and len(joined) >= MIN_SUFFIX_LENGTH:
+            query_variants = [query_terms, [joined]]
+        else:
+            query_variants = [query_terms]
+
+        scores = {}
+        for terms in query_variants:
+            for item_id, score in self._match_all(terms).items():
+                if score > scores.get(item_id, 0):
+                    scores[item_id] = score
+
+        if state_ids is not None:
+            state_ids = set(state_ids)
+            scores = {item_id: score for item_id, score in scores.items()
+                      if self.documents[item_id][1] in state_ids}
+
+        # 相关度相同时新商品在前
+        ranked = sorted(scores, key=lambda item_id: (-scores[item_id], -item_id))
+        return ranked[:limit] if limit else ranked
+
+    def _match_all(self, terms):
+        """所有词都要匹配（AND），返回 {商品ID: 分数}"""
+        if not terms:
+            return {}
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for candidate in self._prefix_terms(term):
+                exact = candidate == term
+                for item_id, weights in self.postings[candidate].items():
+                    score = weights[0] if exact else weights[1]
+                    if score > term_scores.get(item_id, 0):
+                        term_scores[item_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {item_id: scores[item_id] + score
+                          for item_id, score in term_scores.items() if item_id in scores}
+            if not scores:
+                return {}
+        return scores
+
+
+_index = None
+_index_lock = threading.RLock()
+_state = {'version': None, 'watermark': None, 'built_at': 0.0, 'checked_at': 0.0}
+_rebuild_thread = None
+
+
+def _fetch_rows(updated_after=None):
+    """读取商品的索引字段（增量时包含已下架的商品，用于从索引中移除）"""
+    from ..models_proxy import InventoryItem
+
+    queryset = InventoryItem.objects.all()
+    if updated_after is None:
+        queryset = queryset.filter(location__company_id=settings.COMPANY_ID, published=True)
+    else:
+        queryset = queryset.filter(updated_at__gte=updated_after)
+    return queryset.values(
+        'id', 'current_state_id', 'updated_at', 'published',
+        location_company_id=F('location__company_id'),
+        model_code=F('model_number__model_number'),
+        brand_name=F('model_number__brand__name'),
+        category_name=F('model_number__category__name'),
+        model_description=F('model_number__description'),
+    ).order_by().iterator(chunk_size=2000)
+
+
+def _is_searchable(row):
+    return row['published'] and row['location_company_id'] == settings.COMPANY_ID
+
+
+def _full_rebuild():
+    index = SearchIndex()
+    watermark = None
+    for row in _fetch_rows():
+        index.add(row)
+        if row['updated_at'] and (watermark is None or row['updated_at'] > watermark):
+            watermark = row['updated_at']
+    logger.info(f"Search index built: {len(index.documents)} items")
+    return index, watermark
+
+
+def _incremental_update(index, watermark):
+    changed = 0
+    for row in _fetch_rows(updated_after=watermark):
+        if _is_searchable(row):
+            index.add(row)
+        else:
+            index.remove(row['id'])
+        if row['updated_at'] and (watermark is None or row['updated_at'] > watermark):
+            watermark = row['updated_at']
+        changed += 1
+    if changed:
+        logger.info(f"Search index updated: {changed} changed items")
+    return watermark
+
+
+def _background_rebuild():
+    """后台线程：构建新索引后替换当前索引"""
+    global _index
+    try:
+        index, watermark = _full_rebuild()
+        with _index_lock:
+            _index = index
+            _state['watermark'] = watermark
+            _state['built_at'] = time.monotonic()
+            # 构建期间的变化由下一次请求的增量更新补上
+            _state['checked_at'] = 0.0
+    except Exception as e:
+        logger.error(f"Search index rebuild failed: {e}")
+        with _index_lock:
+            # 失败后等下一个重建周期再试，旧索引继续增量更新
+            _state['built_at'] = time.monotonic()
+    finally:
+        connection.close()
+
+
+def _start_background_rebuild():
+    """启动后台全量重建（每个进程同一时间只有一个），调用方持有 _index_lock"""
+    global _rebuild_thread
+    if _rebuild_thread is not None and _rebuild_thread.is_alive():
+        return
+    _rebuild_thread = threading.Thread(target=_background_rebuild, name='search-index-rebuild', daemon=True)
+    _rebuild_thread.start()
+
+
+def get_search_index():
+    """
+    获取当前的搜索索引，必要时全量重建或增量更新
+
+    Returns:
+        SearchIndex: 搜索索引
+    """
+    global _index
+    now = time.monotonic()
+    version = cache_versions.get_version(cache_versions.INVENTORY)
+    if (
+        _index is not None
+        and _state['version'] == version
+        and now - _state['checked_at'] < REFRESH_INTERVAL
+    ):
+        return _index
+
+    with _index_lock:
+        if _index is None:
+            # 进程内还没有索引，只能同步构建
+            _index, _state['watermark'] = _full_rebuild()
+            _state['built_at'] = now
+        else:
+            if now - _state['built_at'] >= FULL_REBUILD_INTERVAL:
+                _start_background_rebuild()
+            if _state['version'] != version or now - _state['checked_at'] >= REFRESH_INTERVAL:
+                _state['watermark'] = _incremental_update(_index, _state['watermark'])
+        _state['version'] = version
+        _state['checked_at'] = now
+    return _index
+
+
+def search_item_ids(query, state_ids=None, limit=None):
+    """搜索商品ID，见 SearchIndex.search()"""
+    index = get_search_index()
+    # 与增量更新互斥，避免遍历倒排表时被修改
+    with _index_lock:
+        return index.search(query, state_ids=state_ids, limit=limit)
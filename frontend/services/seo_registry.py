@@ -0,0 +1,129 @@
+"""
+SEO Page Registry
+PRODUCT_SEO_PAGES 的预编译注册表
+
+- 配置校验、激活页面字典、按优先级排序的首页列表在首次使用时构建一次
+- 每个页面的 Q 筛选条件只编译一次；分类树版本变化（分类增删改）时整体重新编译
+- 请求中解析 SEO 页面只需一次字典查找
+"""
+
+import logging
+from django.db.models import Q
+
+from ..config.product_seo_pages import PRODUCT_SEO_PAGES, build_product_filters
+from .category_tree import get_category_tree
+
+logger = logging.getLogger(__name__)
+
+FILTER_SECTIONS = ('basic', 'category', 'brand', 'product_model', 'inventory')
+REQUIRED_FIELDS = ('title', 'filters')
+
+_registry = None
+_compiled_filters = None
+_compiled_for_tree = None
+
+
+class SEOPageRegistry:
+    """已校验的SEO页面配置（只读）"""
+
+    def __init__(self, pages):
+        """
+        Args:
+            pages (dict): {page_key: config}
+        """
+        self.errors = {}
+        self.active_pages = {}
+
+        for key, config in pages.items():
+            errors = validate_page_config(config)
+            if errors:
+                self.errors[key] = errors
+                logger.error(f"Invalid SEO page config {key}: {'; '.join(errors)}")
+                continue
+            if config.get('active', True):
+                self.active_pages[key] = config
+
+        homepage_keys = [key for key, config in self.active_pages.items() if config.get('show_on_homepage', False)]
+        homepage_keys.sort(key=lambda key: self.active_pages[key].get('homepage_priority', 999))
+        self.homepage_pages = [{'key': key, 'config': self.active_pages[key]} for key in homepage_keys]
+
+
+def validate_page_config(config):
+    """
+    校验单个SEO页面配置
+
+    Args:
+        config (dict): SEO页面配置
+
+    Returns:
+        list: 错误信息列表，为空表示配置有效
+    """
+    if not isinstance(config, dict) or not config:
+        return ['empty config']
+
+    errors = [f'missing {field}' for field in REQUIRED_FIELDS if not config.get(field)]
+
+    filter_config = config.get('filters')
+    if filter_config is not None and not isinstance(filter_config, dict):
+        return errors + ['filters must be a dict']
+
+    for section, values in (filter_config or {}).items():
+        if section not in FILTER_SECTIONS:
+            errors.append(f'unknown filter section {section}')
+        elif not isinstance(values, dict) or not values:
+            errors.append(f'empty filter section {section}')
+
+    category_config = (filter_config or {}).get('category')
+    if isinstance(category_config, dict) and not (category_config.get('names') or category_config.get('slugs')):
+        errors.append('category filter needs names or slugs')
+
+    return errors
+
+
+def get_registry():
+    """获取SEO页面注册表（进程内只构建一次）"""
+    global _registry
+    if _registry is None:
+        _registry = SEOPageRegistry(PRODUCT_SEO_PAGES)
+    return _registry
+
+
+def _compile_filters(registry, category_tree):
+    """为所有激活页面编译 Q 对象"""
+    compiled = {}
+    for key, config in registry.active_pages.items():
+        category_config = config['filters'].get('category')
+        if category_config:
+            if 'names' in category_config:
+                category_ids = category_tree.ids_for_names(category_config['names'])
+            else:
+                category_ids = category_tree.ids_for_slugs(category_config['slugs'])
+            if not category_ids:
+                # 分类不存在时不能退化为不限分类，否则页面会列出全部商品
+                logger.warning(f"SEO page {key}: no matching categories for {category_config}")
+                compiled[key] = Q(pk__in=[])
+                continue
+        try:
+            compiled[key] = build_product_filters(config)
+        except Exception as e:
+            logger.error(f"Failed to build product filters for SEO page {key}: {e}")
+    return compiled
+
+
+def get_page_filters(page_key):
+    """
+    获取SEO页面预编译的筛选条件
+
+    Args:
+        page_key (str): SEO页面键名
+
+    Returns:
+        Q: 筛选条件，页面不存在、未激活或配置错误时返回 None
+    """
+    global _compiled_filters, _compiled_for_tree
+
+    category_tree = get_category_tree()
+    if _compiled_filters is None or _compiled_for_tree is not category_tree:
+        _compiled_filters = _compile_filters(get_registry(), category_tree)
+        _compiled_for_tree = category_tree
+    return _compiled_filters.get(page_key)
@@ -0,0 +1,198 @@
+"""
+SEO Inventory Snapshot Service
+SEO页面库存数量快照：每个页面的商品数量和最近变化时间
+
+快照由 refresh_seo_snapshot 管理命令定期刷新（见 scripts/server_crontab.txt），
+网站地图、首页和 min_inventory 判断只读取快照，爬虫访问不再触发数百条 COUNT 查询。
+快照过期太久或缺失时，请求不在前台刷新：启动后台线程刷新（进程间文件锁保证只有一个进程刷新），
+当前请求继续使用旧快照；快照缺失（部署或清空缓存后）时只为当前请求需要的页面单独计算，不等待。
+"""
+
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .file_locks import cache_lock_dir, file_lock
+from .seo_registry import get_page_filters, get_registry
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_ALIAS = 'shared'
+SNAPSHOT_KEY = 'seo_inventory_snapshot:v1'
+REFRESH_LOCK_NAME = 'seo_inventory_snapshot'
+SNAPSHOT_MAX_AGE = 3600  # 定时任务每10分钟刷新，超过1小时视为任务失效，由后台线程兜底刷新
+REFRESH_RETRY_SECONDS = 60  # 同一进程两次尝试后台刷新的最短间隔
+PAGES_PER_QUERY = 50  # 每条聚合查询包含的页面数，避免单条SQL过大
+
+_refresh_state = {'thread': None, 'started_at': None}
+_refresh_lock = threading.Lock()
+
+
+def _get_cache():
+    return caches[SNAPSHOT_CACHE_ALIAS]
+
+
+def _base_queryset():
+    """与页面视图一致：公司门店内已发布的商品"""
+    from ..models_proxy import InventoryItem
+    return InventoryItem.objects.filter(location__company_id=settings.COMPANY_ID, published=True)
+
+
+def _summarize_pages(page_keys):
+    """
+    分批聚合计算每个页面的商品数量和最新更新时间
+
+    Returns:
+        dict: {page_key: (count, latest_updated_at)}
+    """
+    queryset = _base_queryset()
+    summaries = {}
+    for start in range(0, len(page_keys), PAGES_PER_QUERY):
+        batch = page_keys[start:start + PAGES_PER_QUERY]
+        aggregates = {}
+        for index, key in enumerate(batch):
+            filters = get_page_filters(key)
+            aggregates[f'count_{index}'] = Count('id', filter=filters)
+            aggregates[f'updated_{index}'] = Max('updated_at', filter=filters)
+        result = queryset.aggregate(**aggregates)
+        for index, key in enumerate(batch):
+            summaries[key] = (result[f'count_{index}'] or 0, result[f'updated_{index}'])
+    return summaries
+
+
+def refresh_snapshot():
+    """
+    重新计算所有激活SEO页面的快照
+
+    页面的 lastmod 只在数量或最新更新时间变化时推进，
+    商品售出离开页面时没有可用的更新时间，以刷新时间为准。
+
+    Returns:
+        dict: {'generated_at': datetime, 'pages': {page_key: {'count', 'lastmod', 'latest_updated_at'}}}
+    """
+    now = timezone.now()
+    previous = (_get_cache().get(SNAPSHOT_KEY) or {}).get('pages', {})
+
+    # 配置错误（筛选条件无法编译）的页面不进入快照，视为不可用
+    page_keys = [key for key in get_registry().active_pages if get_page_filters(key) is not None]
+    summaries = _summarize_pages(page_keys)
+
+    pages = {}
+    for key, (count, latest_updated_at) in summaries.items():
+        old = previous.get(key)
+        if old and old['count'] == count and old['latest_updated_at'] == latest_updated_at:
+            lastmod = old['lastmod']
+        elif old and latest_updated_at and latest_updated_at > old['lastmod']:
+            lastmod = latest_updated_at
+        elif old:
+            lastmod = now
+        else:
+            lastmod = latest_updated_at or now
+        pages[key] = {'count': count, 'lastmod': lastmod, 'latest_updated_at': latest_updated_at}
+
+    snapshot = {'generated_at': now, 'pages': pages}
+    _get_cache().set(SNAPSHOT_KEY, snapshot, timeout=None)
+    logger.info(f"SEO inventory snapshot refreshed: {len(pages)} pages")
+    return snapshot
+
+
+def _is_stale(snapshot):
+    return snapshot is None or (timezone.now() - snapshot['generated_at']).total_seconds() > SNAPSHOT_MAX_AGE
+
+
+def _background_refresh():
+    """后台线程：拿到进程间锁后刷新；其他进程正在刷新或已刷新过则跳过"""
+    try:
+        with file_lock(cache_lock_dir(SNAPSHOT_CACHE_ALIAS), REFRESH_LOCK_NAME) as acquired:
+            if acquired and _is_stale(_get_cache().get(SNAPSHOT_KEY)):
+                refresh_snapshot()
+    except Exception as e:
+        logger.error(f"SEO inventory snapshot refresh failed: {e}")
+    finally:
+        connection.close()
+
+
+def _start_background_refresh():
+    """启动后台刷新（每个进程同一时间只有一个，失败后间隔 REFRESH_RETRY_SECONDS 再试）"""
+    now = time.monotonic()
+    with _refresh_lock:
+        thread = _refresh_state['thread']
+        if thread is not None and thread.is_alive():
+            return
+        started_at = _refresh_state['started_at']
+        if started_at is not None and now - started_at < REFRESH_RETRY_SECONDS:
+            return
+        thread = threading.Thread(target=_background_refresh, name='seo-snapshot-refresh', daemon=True)
+        _refresh_state.update(thread=thread, started_at=now)
+        thread.start()
+
+
+def get_snapshot():
+    """
+    读取快照，不阻塞请求；快照过期或缺失时在后台刷新
+
+    Returns:
+        dict: 快照，结构同 refresh_snapshot()；过期时返回旧快照，缺失时返回 None
+    """
+    snapshot = _get_cache().get(SNAPSHOT_KEY)
+    if _is_stale(snapshot):
+        _start_background_refresh()
+    return snapshot
+
+
+def ensure_snapshot():
+    """
+    获取最新快照，过期或缺失时在当前进程同步刷新（管理命令使用，不要在请求中调用）
+
+    Returns:
+        dict: 快照，结构同 refresh_snapshot()
+    """
+    snapshot = _get_cache().get(SNAPSHOT_KEY)
+    if _is_stale(snapshot):
+        snapshot = refresh_snapshot()
+    return snapshot
+
+
+def get_pages_stats(page_keys):
+    """
+    获取多个SEO页面的快照数据
+    快照不可用时只为这些页面计算一次聚合查询（不写入快照）
+
+    Args:
+        page_keys (iterable): 页面key
+
+    Returns:
+        dict: {page_key: {'count', 'lastmod', 'latest_updated_at'}}，不在快照中（未激活或配置出错）的页面不包含在内
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return {key: snapshot['pages'][key] for key in page_keys if key in snapshot['pages']}
+
+    active_pages = get_registry().active_pages
+    keys = [key for key in page_keys if key in active_pages and get_page_filters(key) is not None]
+    now = timezone.now()
+    return {
+        key: {'count': count, 'lastmod': latest_updated_at or now, 'latest_updated_at': latest_updated_at}
+        for key, (count, latest_updated_at) in _summarize_pages(keys).items()
+    }
+
+
+def get_page_stats(page_key):
+    """
+    获取单个SEO页面的快照数据
+
+    Returns:
+        dict: {'count', 'lastmod', 'latest_updated_at'}，页面不在快照中返回 None
+    """
+    return get_pages_stats([page_key]).get(page_key)
+
+
+def get_page_count(page_key):
+    """SEO页面的商品数量，页面不在快照中返回 0"""
+    stats = get_page_stats(page_key)
+    return stats['count'] if stats else 0
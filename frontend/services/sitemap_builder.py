@@ -0,0 +1,325 @@
+"""
+Sitemap Builder Service
+将网站地图预生成为静态文件，请求时直接读取文件
+
+- 商品按ID区间分片（每片最多 50,000 个URL），写入 sitemap-products-N.xml.gz
+- 其他分区写入 sitemap-<section>.xml，sitemap.xml 为索引
+- 商品流式分块读取；分片内商品ID和更新时间未变化时跳过该分片（不再计算哈希和生成XML）
+- manifest.json 记录每个文件的 ETag、最后修改时间和签名，供视图返回缓存头
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..utils import get_item_hash_for_id
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+INDEX_NAME = 'sitemap.xml'
+MAX_URLS_PER_SHARD = 50000
+PRODUCT_SECTION = 'products'
+PRODUCT_CHANGEFREQ = 'daily'
+PRODUCT_PRIORITY = '0.7'
+ITERATOR_CHUNK_SIZE = 2000
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+INDEX_OPEN = '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+
+class _Site:
+    """Sitemap.get_urls() 所需的最小站点对象（本项目未启用 django.contrib.sites）"""
+
+    def __init__(self, domain):
+        self.domain = domain
+        self.name = domain
+
+
+def get_sitemap_root():
+    return Path(settings.SITEMAP_ROOT)
+
+
+def section_filename(section):
+    return f'sitemap-{section}.xml'
+
+
+def shard_filename(shard):
+    return f'sitemap-products-{shard}.xml.gz'
+
+
+def load_manifest():
+    """
+    读取清单文件
+
+    Returns:
+        dict: {'built_at': str, 'files': {filename: {'etag', 'lastmod', 'urls', 'signature'}}}，未生成时返回 None
+    """
+    try:
+        with open(get_sitemap_root() / MANIFEST_NAME, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to read sitemap manifest: {e}")
+        return None
+
+
+def get_file_info(filename):
+    """
+    获取已生成文件的信息
+
+    Returns:
+        dict: {'path': Path, 'etag': str, 'last_modified': datetime}，文件不存在返回 None
+    """
+    manifest = load_manifest()
+    entry = (manifest or {}).get('files', {}).get(filename)
+    if not entry:
+        return None
+    path = get_sitemap_root() / filename
+    if not path.exists():
+        return None
+    return {
+        'path': path,
+        'etag': entry['etag'],
+        'last_modified': datetime.fromisoformat(entry['lastmod']),
+    }
+
+
+def _format_lastmod(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value.isoformat(timespec='seconds')
+    return value.isoformat()
+
+
+def _url_entry(location, lastmod=None, changefreq=None, priority=None):
+    parts = [f'<url><loc>{escape(location)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod}</lastmod>')
+    if changefreq:
+        parts.append(f'<changefreq>{changefreq}</changefreq>')
+    if priority:
+        parts.append(f'<priority>{priority}</priority>')
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+def _write_atomic(path, data):
+    """先写临时文件再替换，避免请求读到写了一半的文件"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class SitemapBuilder:
+    """
+    网站地图生成器
+
+    Args:
+        sections (dict): {section: Sitemap类}，即 views.sitemaps
+        base_url (str): 站点根URL，默认 settings.SITE_URL
+        force (bool): 忽略签名，重新生成所有文件
+    """
+
+    def __init__(self, sections, base_url=None, force=False):
+        base_url = (base_url or getattr(settings, 'SITE_URL', 'http://localhost:8000')).rstrip('/')
+        parsed = urlsplit(base_url)
+        self.base_url = base_url
+        self.protocol = parsed.scheme or 'https'
+        self.domain = parsed.netloc
+        self.sections = sections
+        self.force = force
+        self.root = get_sitemap_root()
+        self.now = timezone.now()
+
+        previous = None if force else load_manifest()
+        # 域名变化时所有文件都需要重新生成
+        if previous and previous.get('base_url') != base_url:
+            previous = None
+        self.previous_files = (previous or {}).get('files', {})
+        self.files = {}
+        self.stats = {'written': [], 'unchanged': [], 'removed': [], 'urls': 0}
+
+    def build(self):
+        """
+        生成所有网站地图文件
+
+        Returns:
+            dict: {'written': [...], 'unchanged': [...], 'removed': [...], 'urls': int}
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        for section, sitemap_class in self.sections.items():
+            if section == PRODUCT_SECTION:
+                self._build_product_shards()
+            else:
+                self._build_section(section, sitemap_class)
+
+        self._build_index()
+        self._remove_stale_files()
+        self._write_manifest()
+        return self.stats
+
+    def _record(self, filename, content, signature, url_count, lastmod=None):
+        """写入内容有变化的文件，并记录清单信息"""
+        etag = hashlib.md5(content).hexdigest()
+        previous = self.previous_files.get(filename)
+        if previous and previous['etag'] == etag and (self.root / filename).exists():
+            # 内容相同：保留原修改时间，只更新签名
+            self.files[filename] = dict(previous, signature=signature)
+            self.stats['unchanged'].append(filename)
+            return
+
+        _write_atomic(self.root / filename, content)
+        self.files[filename] = {
+            'etag': etag,
+            'lastmod': (lastmod or self.now).isoformat(),
+            'urls': url_count,
+            'signature': signature,
+        }
+        self.stats['written'].append(filename)
+
+    def _keep_unchanged(self, filename, signature):
+        """签名未变化且文件存在时沿用上次的结果"""
+        previous = self.previous_files.get(filename)
+        if previous and previous.get('signature') == signature and (self.root / filename).exists():
+            self.files[filename] = previous
+            self.stats['unchanged'].append(filename)
+            self.stats['urls'] += previous['urls']
+            return True
+        return False
+
+    def _build_section(self, section, sitemap_class):
+        """用现有 Sitemap 类生成普通分区（数据量小，每次重新计算，内容不变则不重写）"""
+        try:
+            urls = sitemap_class().get_urls(site=_Site(self.domain), protocol=self.protocol)
+        except Exception as e:
+            # 单个分区失败时保留上次生成的文件
+            logger.error(f"Failed to build sitemap section {section}: {e}")
+            filename = section_filename(section)
+            if filename in self.previous_files and (self.root / filename).exists():
+                self.files[filename] = self.previous_files[filename]
+            return
+
+        body = [XML_HEADER, URLSET_OPEN]
+        for url in urls:
+            body.append(_url_entry(
+                url['location'],
+                _format_lastmod(url['lastmod']),
+                url['changefreq'],
+                url['priority'] or None,
+            ))
+        body.append('</urlset>\n')
+        content = ''.join(body).encode('utf-8')
+        self.stats['urls'] += len(urls)
+        self._record(section_filename(section), content, None, len(urls))
+
+    def _iter_product_shards(self):
+        """按ID区间流式产出 (分片号, [(id, updated_at), ...])"""
+        from ..models_proxy import InventoryItem
+
+        rows = InventoryItem.objects.filter(
+            company_id=settings.COMPANY_ID,
+            published=True
+        ).order_by('id').values_list('id', 'updated_at').iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+        current_shard = None
+        shard_rows = []
+        for item_id, updated_at in rows:
+            shard = item_id // MAX_URLS_PER_SHARD
+            if shard != current_shard and shard_rows:
+                yield current_shard, shard_rows
+                shard_rows = []
+            current_shard = shard
+            shard_rows.append((item_id, updated_at))
+        if shard_rows:
+            yield current_shard, shard_rows
+
+    def _build_product_shards(self):
+        """
+        生成商品分片
+        分片按固定ID区间划分，商品增删只影响所在分片，其他分片签名不变即跳过
+        """
+        secret_key = settings.ITEM_HASH_SECRET_KEY
+        for shard, rows in self._iter_product_shards():
+            filename = shard_filename(shard)
+            digest = hashlib.md5()
+            for item_id, updated_at in rows:
+                digest.update(f'{item_id}:{updated_at.isoformat() if updated_at else ""};'.encode('utf-8'))
+            signature = digest.hexdigest()
+
+            if self._keep_unchanged(filename, signature):
+                continue
+
+            body = [XML_HEADER, URLSET_OPEN]
+            for item_id, updated_at in rows:
+                item_hash = get_item_hash_for_id(item_id, secret_key)
+                body.append(_url_entry(
+                    f'{self.base_url}/item/{item_hash}/',
+                    _format_lastmod(updated_at),
+                    PRODUCT_CHANGEFREQ,
+                    PRODUCT_PRIORITY,
+                ))
+            body.append('</urlset>\n')
+            # mtime=0 使相同内容得到相同的压缩结果（ETag稳定）
+            content = gzip.compress(''.join(body).encode('utf-8'), mtime=0)
+            lastmod = max((updated_at for _, updated_at in rows if updated_at), default=None)
+            self.stats['urls'] += len(rows)
+            self._record(filename, content, signature, len(rows), lastmod)
+
+    def _build_index(self):
+        """生成索引，列出所有分区和商品分片"""
+        body = [XML_HEADER, INDEX_OPEN]
+        for filename in sorted(self.files, key=_index_sort_key):
+            body.append(
+                f'<sitemap><loc>{escape(self.base_url + "/" + filename)}</loc>'
+                f'<lastmod>{self.files[filename]["lastmod"]}</lastmod></sitemap>\n'
+            )
+        body.append('</sitemapindex>\n')
+        self._record(INDEX_NAME, ''.join(body).encode('utf-8'), None, len(self.files))
+
+    def _remove_stale_files(self):
+        """删除不再存在的分片（例如整个ID区间的商品都已下架）"""
+        for filename in self.previous_files:
+            if filename not in self.files:
+                try:
+                    (self.root / filename).unlink()
+                except FileNotFoundError:
+                    pass
+                self.stats['removed'].append(filename)
+
+    def _write_manifest(self):
+        manifest = {
+            'built_at': self.now.isoformat(),
+            'base_url': self.base_url,
+            'files': self.files,
+        }
+        _write_atomic(self.root / MANIFEST_NAME, json.dumps(manifest, indent=2).encode('utf-8'))
+
+
+def _index_sort_key(filename):
+    """普通分区在前，商品分片按分片号排序"""
+    if filename.startswith('sitemap-products-'):
+        return (1, int(filename[len('sitemap-products-'):].split('.')[0]))
+    return (0, filename)
+
+
+def build_sitemaps(base_url=None, force=False):
+    """生成所有网站地图文件，见 SitemapBuilder.build()"""
+    from ..views import sitemaps
+    return SitemapBuilder(sitemaps, base_url=base_url, force=force).build()
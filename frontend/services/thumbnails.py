@@ -0,0 +1,293 @@
+"""
+Thumbnail Service
+缩略图生成：变体命名、解码缩放编码、单飞锁和有界的后台编码线程池
+
+- 变体文件名由原图相对路径、大小和修改时间计算摘要，不同目录下的同名文件不再冲突；
+  原图被替换后摘要随之变化，已存在的变体文件一定是最新的
+- 同一变体的并发请求只编码一次：进程内共享同一个 Future，进程间用锁文件互斥
+- 编码在有界线程池中进行（Pillow 缩放和编码时释放 GIL），请求最多等待 WAIT_SECONDS，
+  超时则先返回占位图，编码完成后的请求直接命中缓存文件
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MAX_THUMBNAIL_SIZE = 1200
+CACHE_SUBDIR = 'cache'
+WEBP_QUALITY = 85
+WEBP_METHOD = 4  # 请求中编码：压缩率接近 method=6，速度快数倍
+WAIT_SECONDS = 0.3
+MAX_PENDING = 32
+LOCK_STALE_SECONDS = 60
+PLACEHOLDER_COLOR = (243, 244, 246)
+
+# 模板中使用的标准尺寸
+PRODUCT_IMAGE_SIZES = [(800, 1067), (600, 800), (300, 400), (200, 200), (64, 64)]
+LOCATION_IMAGE_SIZES = [(64, 64), (48, 48), (32, 32), (30, 30)]
+
+_executor = None
+_executor_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def resolve_original(image_path, media_root=None):
+    """
+    原图的绝对路径（限制在 MEDIA_ROOT 内）
+
+    Raises:
+        ValueError: 路径超出 MEDIA_ROOT
+    """
+    media_root = os.path.realpath(media_root or settings.MEDIA_ROOT)
+    original_path = os.path.realpath(os.path.join(media_root, image_path))
+    if os.path.commonpath([media_root, original_path]) != media_root:
+        raise ValueError(f"Image path outside MEDIA_ROOT: {image_path}")
+    return original_path
+
+
+def variant_digest(image_path, stat_result):
+    """原图路径、大小和修改时间的摘要，作为所有尺寸变体的文件名"""
+    fingerprint = f'{os.path.normpath(image_path)}:{stat_result.st_size}:{stat_result.st_mtime_ns}'
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:32]
+
+
+def variant_path(digest, width, height, media_root=None):
+    """变体文件路径：cache/{w}x{h}/{摘要前两位}/{摘要}.webp"""
+    return os.path.join(
+        media_root or settings.MEDIA_ROOT, CACHE_SUBDIR, f'{width}x{height}', digest[:2], f'{digest}.webp'
+    )
+
+
+def open_original(original_path):
+    """打开原图并修正EXIF方向，转换为WebP可用的RGB模式"""
+    with Image.open(original_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        else:
+            img.load()
+    return img
+
+
+def _cover_size(source_width, source_height, width, height):
+    """保持宽高比、覆盖目标区域的缩放尺寸"""
+    img_ratio = source_width / source_height
+    if img_ratio > width / height:
+        # 图片更宽，按高度缩放
+        return max(int(height * img_ratio), width), height
+    # 图片更高，按宽度缩放
+    return width, max(int(width / img_ratio), height)
+
+
+def _crop_center(img, width, height):
+    """尺寸不完全匹配时居中裁剪"""
+    if img.width == width and img.height == height:
+        return img
+    left = (img.width - width) // 2
+    top = (img.height - height) // 2
+    return img.crop((left, top, left + width, top + height))
+
+
+def render_variants(img, sizes):
+    """
+    从已解码的原图生成多个尺寸
+
+    按从大到小的顺序逐级缩小：每个尺寸从已生成的、仍足够大的中间图缩放，
+    不必每次都从原图缩放。
+
+    Args:
+        img (Image): open_original() 的返回值
+        sizes (iterable): [(width, height), ...]
+
+    Returns:
+        dict: {(width, height): Image}
+    """
+    results = {}
+    intermediates = [img]
+    for width, height in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+        target = _cover_size(img.width, img.height, width, height)
+        # 选择最小的、仍不小于目标尺寸的中间图
+        source = min(
+            (candidate for candidate in intermediates
+             if candidate.width >= target[0] and candidate.height >= target[1]),
+            key=lambda candidate: candidate.width * candidate.height,
+            default=img,
+        )
+        resized = source.resize(target, Image.Resampling.LANCZOS) if source.size != target else source
+        intermediates.append(resized)
+        results[(width, height)] = _crop_center(resized, width, height)
+    return results
+
+
+def save_variant(img, path, method=WEBP_METHOD):
+    """
+    原子写入WebP变体
+
+    Returns:
+        int: 文件字节数
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    img.save(tmp_path, 'WEBP', quality=WEBP_QUALITY, optimize=True, method=method)
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, path)
+    return size
+
+
+def _acquire_file_lock(path):
+    """进程间互斥：创建锁文件，已存在且未过期时返回 False"""
+    lock_path = f'{path}.lock'
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) < LOCK_STALE_SECONDS:
+                    return False
+                # 持有锁的进程可能已退出，清理后重试
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def _release_file_lock(path):
+    try:
+        os.remove(f'{path}.lock')
+    except FileNotFoundError:
+        pass
+
+
+def _generate(original_path, path, width, height):
+    """在线程池中执行：生成单个变体，其他进程正在生成时返回 None"""
+    if not _acquire_file_lock(path):
+        return None
+    try:
+        if os.path.exists(path):
+            return path
+        img = open_original(original_path)
+        save_variant(render_variants(img, [(width, height)])[(width, height)], path)
+        logger.info(f"Created resized image: {path}")
+        return path
+    finally:
+        _release_file_lock(path)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                    thread_name_prefix='thumbnail',
+                )
+    return _executor
+
+
+def _forget(path, future):
+    with _inflight_lock:
+        if _inflight.get(path) is future:
+            del _inflight[path]
+
+
+def get_variant(image_path, width, height, wait=WAIT_SECONDS):
+    """
+    获取缩略图变体，必要时在后台生成
+
+    Args:
+        image_path (str): MEDIA_ROOT 下的相对路径
+        width (int): 宽度
+        height (int): 高度
+        wait (float): 变体不存在时最多等待的秒数
+
+    Returns:
+        str: 变体文件路径；仍在生成中返回 None
+
+    Raises:
+        FileNotFoundError: 原图不存在
+        ValueError: 路径非法
+    """
+    original_path = resolve_original(image_path)
+    stat_result = os.stat(original_path)
+    path = variant_path(variant_digest(image_path, stat_result), width, height)
+    if os.path.exists(path):
+        return path
+
+    with _inflight_lock:
+        future = _inflight.get(path)
+        if future is None:
+            if len(_inflight) >= MAX_PENDING:
+                # 队列已满，不再排队，先返回占位图
+                logger.warning(f"Thumbnail queue full, serving placeholder for {image_path}")
+                return None
+            future = _get_executor().submit(_generate, original_path, path, width, height)
+            _inflight[path] = future
+            future.add_done_callback(lambda done, path=path: _forget(path, done))
+
+    try:
+        return future.result(timeout=wait)
+    except FutureTimeoutError:
+        return None
+
+
+def pregenerate_image(image_path, sizes, media_root, method=6):
+    """
+    为一张原图生成所有缺少的尺寸（批量预生成，可在进程池中执行）
+    原图只解码一次，各尺寸逐级缩小
+
+    Args:
+        image_path (str): MEDIA_ROOT 下的相对路径
+        sizes (list): [(width, height), ...]
+        media_root (str): MEDIA_ROOT（子进程中不依赖 Django 设置）
+        method (int): WebP 压缩级别，离线生成默认使用最佳压缩
+
+    Returns:
+        dict: {'generated', 'skipped', 'original_bytes', 'variant_bytes', 'error'}
+    """
+    result = {'generated': 0, 'skipped': 0, 'original_bytes': 0, 'variant_bytes': 0, 'error': None}
+    try:
+        original_path = resolve_original(image_path, media_root)
+        stat_result = os.stat(original_path)
+        digest = variant_digest(image_path, stat_result)
+
+        missing = {}
+        for width, height in sizes:
+            path = variant_path(digest, width, height, media_root)
+            if os.path.exists(path):
+                result['skipped'] += 1
+            else:
+                missing[(width, height)] = path
+        if not missing:
+            return result
+
+        img = open_original(original_path)
+        for size, variant in render_variants(img, missing.keys()).items():
+            result['variant_bytes'] += save_variant(variant, missing[size], method=method)
+            result['original_bytes'] += stat_result.st_size
+            result['generated'] += 1
+    except Exception as e:
+        result['error'] = f'{image_path}: {e}'
+    return result
+
+
+@lru_cache(maxsize=64)
+def placeholder_bytes(width, height):
+    """生成中的占位图（纯色WebP）"""
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), PLACEHOLDER_COLOR).save(buffer, 'WEBP', quality=10)
+    return buffer.getvalue()
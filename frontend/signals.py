@@ -0,0 +1,80 @@
+"""
+Frontend 信号处理
+在本项目内创建/删除数据时同步维护派生索引和缓存
+（nasmaha 中的改动收不到这些信号，各服务另有增量补齐或过期机制）
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models_proxy import (
+    Address, BusinessHours, Category, CustomerAddress, InventoryItem, ItemState, LoadManifest, Location,
+    ShoppingCart, StateTransition
+)
+from .services import cache_versions, cart, distances, item_index, item_states
+
+
+@receiver(post_save, sender=InventoryItem)
+def index_created_item(sender, instance, created, **kwargs):
+    """新建商品时加入哈希索引"""
+    if created:
+        item_index.index_items([instance.id])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def unindex_deleted_item(sender, instance, **kwargs):
+    """删除商品时从哈希索引移除"""
+    item_index.remove_item(instance.id)
+
+
+@receiver([post_save, post_delete], sender=InventoryItem)
+def invalidate_inventory_caches(sender, **kwargs):
+    """库存变化时使库存相关缓存（数量统计等）失效"""
+    cache_versions.bump_version(cache_versions.INVENTORY)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_caches(sender, **kwargs):
+    """分类变化时使分类树失效"""
+    cache_versions.bump_version(cache_versions.CATEGORY)
+
+
+@receiver([post_save, post_delete], sender=LoadManifest)
+def invalidate_load_manifest_caches(sender, **kwargs):
+    """批次变化时使"有即将到货的库存"标志失效"""
+    cache_versions.bump_version(cache_versions.LOAD_MANIFEST)
+
+
+@receiver([post_save, post_delete], sender=ItemState)
+@receiver([post_save, post_delete], sender=StateTransition)
+def invalidate_state_tables(sender, **kwargs):
+    """商品状态或转换规则变化时使查找表失效"""
+    item_states.invalidate_item_states()
+
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=BusinessHours)
+def invalidate_location_caches(sender, **kwargs):
+    """门店或营业时间变化时使导航中的门店列表失效"""
+    cache_versions.bump_version(cache_versions.LOCATION)
+
+
+@receiver(post_save, sender=Address)
+def invalidate_location_address(sender, instance, **kwargs):
+    """门店地址变化时使导航中的门店列表失效"""
+    if Location.objects.filter(address_id=instance.id).exists():
+        cache_versions.bump_version(cache_versions.LOCATION)
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    """购物车变化时清除该客户的购物车汇总（事务提交后清除，避免其他请求缓存提交前的数据）"""
+    customer_id = instance.customer_id
+    transaction.on_commit(lambda: cart.invalidate_cart_summary(customer_id))
+
+
+@receiver([post_save, post_delete], sender=CustomerAddress)
+def invalidate_address_distances(sender, instance, **kwargs):
+    """客户地址变化或删除时清除该地址到各门店的距离缓存"""
+    distances.invalidate_address_distances(instance.id)
@@ -7,7 +7,8 @@ from django.urls import reverse
 from django.utils import timezone
 from .models_proxy import Location, Category, InventoryItem
 from .config.seo_keywords import CITIES
-from .config.product_seo_pages import get_active_seo_pages, build_product_filters
+from .config.product_seo_pages import get_active_seo_pages
+from .services.seo_snapshot import get_pages_stats
 from django.conf import settings
 import logging
 
@@ -334,26 +335,27 @@ class ProductSEOPageSitemap(Sitemap):
         seo_pages = []
         active_pages = get_active_seo_pages()
 
+        # 库存数量和最近变化时间读取快照，不在请求中逐页 COUNT；快照缺失时按页面分批聚合计算
+        try:
+            page_stats = get_pages_stats(list(active_pages))
+        except Exception as e:
+            logger.error(f"Failed to load SEO inventory snapshot: {e}")
+            return seo_pages
+
         for page_key, page_config in active_pages.items():
-            try:
-                # 检查库存数量是否满足要求
-                filters = build_product_filters(page_config)
-                item_count = InventoryItem.objects.filter(filters).count()
-                min_inventory = page_config.get('min_inventory', 1)
-
-                # 只有满足最小库存要求的页面才加入sitemap
-                if item_count >= min_inventory:
-                    seo_pages.append({
-                        'page_key': page_key,
-                        'config': page_config,
-                        'item_count': item_count,
-                        'lastmod': timezone.now()  # 使用当前时间，实际项目中可考虑基于库存更新时间
-                    })
-
-            except Exception as e:
-                # 如果查询失败，记录错误但不影响其他页面
-                logger.error(f"Failed to check inventory for SEO page {page_key}: {e}")
+            stats = page_stats.get(page_key)
+            if stats is None:
                 continue
+            min_inventory = page_config.get('min_inventory', 1)
+
+            # 只有满足最小库存要求的页面才加入sitemap
+            if stats['count'] >= min_inventory:
+                seo_pages.append({
+                    'page_key': page_key,
+                    'config': page_config,
+                    'item_count': stats['count'],
+                    'lastmod': stats['lastmod'],
+                })
 
         # 按优先级排序（首页显示的页面优先级更高）
         seo_pages.sort(key=lambda x: x['config'].get('homepage_priority', 999))
@@ -151,6 +151,50 @@ const components = {
             // 产品展示组件已简化，不再需要滚动按钮功能
             // 因为home页面每行正好显示6个产品，无需滚动
         }
+    },
+
+    // 商品列表分页组件：点击按钮或滚动到底部时按游标加载下一页
+    listingPager: {
+        init(pager) {
+            const target = document.getElementById(pager.dataset.target);
+            const button = pager.querySelector('button');
+            let loading = false;
+
+            async function loadNextPage() {
+                if (loading || !pager.dataset.cursor) return;
+                loading = true;
+                button.disabled = true;
+                try {
+                    const url = `${pager.dataset.url}&cursor=${encodeURIComponent(pager.dataset.cursor)}`;
+                    const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+                    const data = await response.json();
+                    if (data.status !== 'success') throw new Error(data.message);
+
+                    target.insertAdjacentHTML('beforeend', data.html);
+                    if (data.next_cursor) {
+                        pager.dataset.cursor = data.next_cursor;
+                    } else {
+                        pager.remove();
+                        if (observer) observer.disconnect();
+                    }
+                } catch (error) {
+                    console.error('Failed to load more items:', error);
+                } finally {
+                    loading = false;
+                    button.disabled = false;
+                }
+            }
+
+            button.addEventListener('click', loadNextPage);
+
+            // 无限滚动：按钮进入视口前提前加载
+            const observer = 'IntersectionObserver' in window
+                ? new IntersectionObserver(entries => {
+                    if (entries.some(entry => entry.isIntersecting)) loadNextPage();
+                }, { rootMargin: '400px' })
+                : null;
+            if (observer) observer.observe(pager);
+        }
     }
 };
 
@@ -340,6 +384,11 @@ document.addEventListener('DOMContentLoaded', () => {
         pages.store.init();
     }
 
+    // 初始化商品列表分页
+    document.querySelectorAll('[data-listing-pager]').forEach(pager => {
+        components.listingPager.init(pager);
+    });
+
     // 初始化通用事件
     events.initUserMenu();
     events.initLogoutModal();
@@ -5,6 +5,8 @@
 """
 from django.templatetags.static import static
 
+from .services import item_states
+
 
 def get_structured_data_title(item):
     """
@@ -119,17 +121,12 @@ def get_structured_data_availability(item):
     Returns:
         str: Schema.org availability URL
     """
-    # 状态ID说明:
-    # 4: Ready for sale (可售)
-    # 5: In storage (在库存中)
-    # 8: Online display (在线展示)
-
     # 已被订单关联，不可售
-    if item.order:
+    if item.order_id:
         return 'https://schema.org/OutOfStock'
 
-    # 可售状态
-    if item.current_state_id in [4, 5, 8]:
+    # 可售状态（见 item_states.STATE_GROUPS）
+    if item.current_state_id in item_states.state_ids(item_states.SELLABLE):
         return 'https://schema.org/InStock'
 
     return 'https://schema.org/OutOfStock'
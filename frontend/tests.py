@@ -1,3 +1,561 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import count
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import NotSupportedError, OperationalError
+from django.db.models import Sum
+from django.db.models.signals import pre_save
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from scripts.address_validator import AddressValidator, TokenBucket, ValidationAborted
+
+from .models_proxy import (
+    Address, Brand, Category, Company, Customer, InventoryItem, InventoryStateHistory, ItemState, Location,
+    Order, ProductModel, ShoppingCart, Staff, StateTransition, TransactionRecord,
+)
+from .services import item_index, item_states, order_financials, product_listing, seo_snapshot
+from .services.file_locks import cache_lock_dir, file_lock
+from .services.seo_registry import get_registry
+from .utils import decode_item_id, get_item_hash_for_id
+
+CACHE_DIR = tempfile.mkdtemp(prefix='frontend_test_cache_')
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    # 进程间文件锁放在 LOCATION 目录下（见 services.file_locks）
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'shared'),
+    },
+    'item_index': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'item_index'),
+    },
+}
+
+STATE_NAMES = ['IN TRANSIT', 'ARRIVED', 'UNLOADED', 'WAITING FOR TESTING', 'TEST', 'HOLD', 'SOLD', 'FOR SALE']
+
+_order_numbers = count(1)
+
+
+def _fill_order_number(sender, instance, **kwargs):
+    """订单号由 nasmaha 生成，测试中补一个唯一值"""
+    if not instance.order_number:
+        instance.order_number = f'TEST-{next(_order_numbers)}'
+
+
+def create_inventory(item_count=3):
+    """
+    创建门店、状态、转换规则和商品
+
+    Returns:
+        dict: {'company', 'staff', 'location', 'states', 'model', 'items'}
+    """
+    staff_user = get_user_model().objects.create_user(username='staff', password='pw')
+    company = Company.objects.create(id=settings.COMPANY_ID, company_name='A4L America')
+    staff = Staff.objects.create(user=staff_user, company_id=company.id)
+    address = Address.objects.create(
+        street_number='1', street_name='Main St', city='Doraville', state='GA', zip_code='30340',
+        latitude=Decimal('33.9'), longitude=Decimal('-84.27'),
+    )
+    location = Location.objects.create(
+        company=company, name='Doraville', location_type='STORE', address=address,
+        is_active=True, slug='doraville', sales_tax_rate=Decimal('0.08'),
+    )
+    states = {
+        name: ItemState.objects.create(id=state_id, name=name)
+        for state_id, name in enumerate(STATE_NAMES, start=1)
+    }
+    StateTransition.objects.create(from_state=states['FOR SALE'], to_state=states['HOLD'])
+    category = Category.objects.create(name='Refrigerator', slug='refrigerator')
+    product_model = ProductModel.objects.create(
+        brand=Brand.objects.create(name='LG'), category=category,
+        model_number='LRMVS3006S', description='French door refrigerator', msrp=Decimal('2000'),
+    )
+    items = [
+        InventoryItem.objects.create(
+            model_number=product_model, company=company, location=location, current_state=states['FOR SALE'],
+            created_by=staff, published=True, retail_price=Decimal(1000 + i),
+            control_number=f'C{i}', serial_number=f'S{i}',
+        )
+        for i in range(item_count)
+    ]
+    return {
+        'company': company, 'staff': staff, 'location': location, 'states': states,
+        'model': product_model, 'items': items,
+    }
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FrontendTestCase(TestCase):
+    """清空缓存和进程内的状态查找表，避免测试之间互相影响"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        item_states._local['tables'] = None
+
+
+class CreateOrderTest(FrontendTestCase):
+    """购物车下单：并发锁冲突、已 HOLD 商品、状态历史"""
+
+    def setUp(self):
+        super().setUp()
+        pre_save.connect(_fill_order_number, sender=Order)
+        self.addCleanup(pre_save.disconnect, _fill_order_number, sender=Order)
+        self.data = create_inventory()
+        user = get_user_model().objects.create_user(username='customer', email='customer@example.com', password='pw')
+        self.customer = Customer.objects.create(user=user, phone='5555555555')
+        self.client = Client()
+        self.client.force_login(user)
+        self.url = reverse('frontend:create_order')
+
+    def post_order(self, items):
+        for item in items:
+            ShoppingCart.objects.create(customer=self.customer, item=item, price_at_add=item.retail_price)
+        payload = {
+            'location_id': self.data['location'].id,
+            'inventory_items': [{'inventory_item_id': item.id, 'unit_price': str(item.retail_price)} for item in items],
+        }
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_order_puts_items_on_hold_and_writes_history(self):
+        """下单成功：商品置为 HOLD，每个商品一条状态历史，购物车记录删除"""
+        items = self.data['items'][:2]
+        response = self.post_order(items)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['success'])
+
+        order = Order.objects.get(id=response.json()['order_id'])
+        hold = self.data['states']['HOLD']
+        for item in items:
+            item.refresh_from_db()
+            self.assertEqual(item.current_state_id, hold.id)
+            self.assertEqual(item.order_id, order.id)
+        history = InventoryStateHistory.objects.filter(inventory_item__in=items)
+        self.assertEqual(history.count(), 2)
+        self.assertTrue(all(h.state_transition.to_state_id == hold.id for h in history))
+        self.assertFalse(ShoppingCart.objects.filter(customer=self.customer).exists())
+
+    def test_lock_conflict_returns_409(self):
+        """商品被其他事务锁定（NOWAIT 取锁失败）时返回 409，不创建订单"""
+        lock_error = OperationalError(
+            3572, 'Statement aborted because lock(s) could not be acquired immediately and NOWAIT is set.'
+        )
+        with mock.patch('django.db.models.query.QuerySet.select_for_update', side_effect=lock_error):
+            response = self.post_order(self.data['items'][:1])
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['conflict'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_other_database_errors_are_not_conflicts(self):
+        """不支持 NOWAIT、死锁等数据库错误不报告为冲突，按服务器错误抛出"""
+        errors = (
+            NotSupportedError('NOWAIT is not supported on this database backend.'),
+            OperationalError(1213, 'Deadlock found when trying to get lock; try restarting transaction'),
+        )
+        for error, item in zip(errors, self.data['items']):
+            with self.subTest(error=error):
+                with mock.patch('django.db.models.query.QuerySet.select_for_update', side_effect=error):
+                    with self.assertRaises(type(error)):
+                        self.post_order([item])
+                self.assertFalse(Order.objects.exists())
+
+    def test_item_already_on_hold_is_rejected(self):
+        """已经 HOLD 的商品不能再次下单，其他商品保持原状态"""
+        held, available = self.data['items'][:2]
+        held.current_state = self.data['states']['HOLD']
+        held.save()
+
+        response = self.post_order([held, available])
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['conflict'])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(InventoryStateHistory.objects.exists())
+        available.refresh_from_db()
+        self.assertEqual(available.current_state_id, self.data['states']['FOR SALE'].id)
+
+
+class ListingPaginationTest(FrontendTestCase):
+    """商品列表游标分页"""
+
+    def setUp(self):
+        super().setUp()
+        self.data = create_inventory(item_count=11)
+        # 制造相同的价格，检验排序值相同时按 ID 分页
+        InventoryItem.objects.filter(id__in=[item.id for item in self.data['items'][:6]]).update(
+            retail_price=Decimal('999.00')
+        )
+        self.queryset = InventoryItem.objects.filter(published=True)
+
+    def collect_pages(self, sort, page_size=4):
+        ids, cursor, pages = [], None, 0
+        while True:
+            page = product_listing.paginate_listing(self.queryset, sort=sort, cursor=cursor, page_size=page_size)
+            ids.extend(item.id for item in page['items'])
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_every_item_once(self):
+        """逐页翻完所有商品，不重复也不遗漏，顺序与不分页时一致"""
+        for sort, ordering in product_listing.SORT_ORDERINGS.items():
+            with self.subTest(sort=sort):
+                ids, pages = self.collect_pages(sort)
+                expected = list(self.queryset.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(ids, expected)
+                self.assertEqual(pages, 3)
+
+    def test_cursor_round_trip(self):
+        """游标编码后能解析回相同的排序值和商品ID"""
+        item = self.data['items'][0]
+        item.refresh_from_db()
+        cursor = product_listing.encode_cursor('price_asc', item.retail_price, item.id)
+        self.assertEqual(product_listing.decode_cursor(cursor, 'price_asc'), (item.retail_price, item.id))
+
+        cursor = product_listing.encode_cursor('newest', item.created_at, item.id)
+        self.assertEqual(product_listing.decode_cursor(cursor, 'newest'), (item.created_at, item.id))
+
+    def test_tampered_cursor_is_rejected(self):
+        """篡改、无法解析或排序方式不匹配的游标抛出 InvalidCursor"""
+        cursor = product_listing.paginate_listing(self.queryset, sort='price_asc', page_size=4)['next_cursor']
+        tampered = cursor[:-1] + ('A' if cursor[-1] != 'A' else 'B')
+        for bad_cursor, sort in ((tampered, 'price_asc'), ('not-a-cursor', 'price_asc'), (cursor, 'newest')):
+            with self.subTest(cursor=bad_cursor, sort=sort):
+                with self.assertRaises(product_listing.InvalidCursor):
+                    product_listing.paginate_listing(self.queryset, sort=sort, cursor=bad_cursor, page_size=4)
+
+
+class OrderFinancialsTest(FrontendTestCase):
+    """订单金额合计与原先逐类型求和的结果一致"""
+
+    TRANSACTIONS = {
+        'mixed': [
+            ('DEPOSIT', '500.00'), ('DEPOSIT', '120.50'), ('VIRTUAL_DEPOSIT', '80.00'),
+            ('WITHDRAWAL', '-50.25'), ('VIRTUAL_WITHDRAWAL', '-30.00'),
+            ('CONSUMPTION', '-600.00'), ('CANCELLATION', '100.00'),
+        ],
+        'consumption_only': [('CONSUMPTION', '-999.99')],
+        'empty': [],
+    }
+
+    def setUp(self):
+        super().setUp()
+        pre_save.connect(_fill_order_number, sender=Order)
+        self.addCleanup(pre_save.disconnect, _fill_order_number, sender=Order)
+        data = create_inventory(item_count=0)
+        user = get_user_model().objects.create_user(username='customer', password='pw')
+        customer = Customer.objects.create(user=user, phone='5555555555')
+        self.orders = {}
+        for name, transactions in self.TRANSACTIONS.items():
+            order = Order.objects.create(
+                company=data['company'], customer=customer, location=data['location'], created_by=user,
+                total_amount=0, receiver_name='Test Customer', receiver_phone='5555555555',
+            )
+            for transaction_type, amount in transactions:
+                TransactionRecord.objects.create(
+                    customer=customer, company=data['company'], location=data['location'], order=order,
+                    transaction_type=transaction_type, amount=Decimal(amount), created_by=data['staff'],
+                )
+            self.orders[name] = order
+
+    @staticmethod
+    def per_type_sums(order):
+        """原先 calculate_paid_amount / calculate_order_balance 的算法：每种类型单独求和"""
+        def total(transaction_type=None):
+            records = TransactionRecord.objects.filter(order=order)
+            if transaction_type:
+                records = records.filter(transaction_type=transaction_type)
+            return records.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+
+        return {
+            'paid_amount': sum(total(t) for t in order_financials.PAID_TRANSACTION_TYPES),
+            'balance': sum((t.amount for t in TransactionRecord.objects.filter(order=order)), Decimal('0.00')),
+            'virtual_deposit_amount': total('VIRTUAL_DEPOSIT'),
+            'virtual_withdrawal_amount': total('VIRTUAL_WITHDRAWAL'),
+        }
+
+    def test_annotated_list_matches_per_type_sums(self):
+        """订单列表注解（一条查询）与逐类型求和一致"""
+        with self.assertNumQueries(1):
+            orders = list(order_financials.annotate_financials(Order.objects.order_by('id')))
+        self.assertEqual(len(orders), len(self.orders))
+        for order in orders:
+            with self.subTest(order=order.id):
+                expected = self.per_type_sums(order)
+                with self.assertNumQueries(0):
+                    self.assertEqual(order_financials.get_order_financials(order), expected)
+
+    def test_single_order_matches_per_type_sums(self):
+        """单个订单的条件聚合与逐类型求和一致"""
+        for name, order in self.orders.items():
+            with self.subTest(order=name):
+                with self.assertNumQueries(1):
+                    financials = order_financials.get_order_financials(order)
+                self.assertEqual(financials, self.per_type_sums(order))
+                self.assertEqual(order.calculate_paid_amount(), financials['paid_amount'])
+                self.assertEqual(order.calculate_order_balance(), financials['balance'])
+
+
+class ItemIndexTest(FrontendTestCase):
+    """商品哈希索引：桶丢失或商品由 nasmaha 创建（没有信号）时仍能找到商品"""
+
+    def setUp(self):
+        super().setUp()
+        self.data = create_inventory(item_count=5)
+        # 已有商品创建于一天前，完整范围推进到最大的商品ID
+        InventoryItem.objects.update(created_at=timezone.now() - timedelta(days=1))
+        item_index.catch_up(0)
+        self.watermark = max(item.id for item in self.data['items'])
+
+    def create_item(self, control_number, **kwargs):
+        """bulk_create 不触发信号，与 nasmaha 创建商品相同"""
+        template = self.data['items'][0]
+        InventoryItem.objects.bulk_create([
+            InventoryItem(
+                model_number=template.model_number, company=template.company, location=template.location,
+                current_state=template.current_state, created_by=template.created_by, published=True,
+                retail_price=Decimal('1500'), control_number=control_number, serial_number=control_number,
+                **kwargs
+            )
+        ])
+        return InventoryItem.objects.get(control_number=control_number)
+
+    def test_lookup_after_bucket_evicted(self):
+        """桶被淘汰后，查找时重新补齐该桶"""
+        item = self.data['items'][2]
+        item_hash = get_item_hash_for_id(item.id)
+        caches[item_index.INDEX_CACHE_ALIAS].delete(item_index._bucket_key(item_hash))
+
+        self.assertEqual(item_index.lookup_item_id(item_hash), item.id)
+        self.assertEqual(item_index.get_bucket(item_hash)['entries'].get(item_hash), item.id)
+        self.assertEqual(decode_item_id(item_hash), item)
+
+    def test_lookup_after_index_cleared(self):
+        """整个索引缓存被清空后所有商品仍能找到"""
+        caches[item_index.INDEX_CACHE_ALIAS].clear()
+        for item in self.data['items']:
+            self.assertEqual(item_index.lookup_item_id(get_item_hash_for_id(item.id)), item.id)
+
+    def test_lookup_item_created_without_signal(self):
+        """没有信号的新商品，未命中时补齐"""
+        new_item = self.create_item('NEW')
+        self.assertEqual(item_index.lookup_item_id(get_item_hash_for_id(new_item.id)), new_item.id)
+
+    def test_lookup_item_committed_out_of_order(self):
+        """ID 较小的商品晚于较大的商品提交：补齐看到较大的ID后，较小的ID仍能找到"""
+        self.assertTrue(all(
+            bucket['complete_to'] == self.watermark
+            for bucket in caches[item_index.INDEX_CACHE_ALIAS].get_many(item_index.BUCKET_KEYS).values()
+        ))
+        later = self.create_item('LATER', id=self.watermark + 2)
+        self.assertEqual(item_index.lookup_item_id(get_item_hash_for_id(later.id)), later.id)
+
+        # 最近创建的商品不推进完整范围
+        buckets = caches[item_index.INDEX_CACHE_ALIAS].get_many(item_index.BUCKET_KEYS).values()
+        self.assertTrue(all(bucket['complete_to'] == self.watermark for bucket in buckets))
+
+        earlier = self.create_item('EARLIER', id=self.watermark + 1)
+        self.assertEqual(item_index.lookup_item_id(get_item_hash_for_id(earlier.id)), earlier.id)
+
+    def test_unknown_hash_returns_none(self):
+        """不存在的商品返回 None"""
+        self.assertIsNone(item_index.lookup_item_id(get_item_hash_for_id(10 ** 9)))
+
+
+class SeoSnapshotTest(FrontendTestCase):
+    """SEO 库存快照：请求不等待、不在前台刷新"""
+
+    def setUp(self):
+        super().setUp()
+        create_inventory(item_count=3)
+        seo_snapshot._refresh_state.update(thread=None, started_at=None)
+        self.page_keys = list(get_registry().active_pages)[:3]
+
+    def test_cold_cache_does_not_block(self):
+        """快照缺失：立即返回 None 并启动后台刷新，页面数据按页面单独计算"""
+        with mock.patch.object(seo_snapshot, '_start_background_refresh') as start:
+            started = time.monotonic()
+            self.assertIsNone(seo_snapshot.get_snapshot())
+            stats = seo_snapshot.get_pages_stats(self.page_keys)
+            self.assertLess(time.monotonic() - started, 1.0)
+        self.assertTrue(start.called)
+        self.assertEqual(set(stats), set(self.page_keys))
+        self.assertIsNone(caches['shared'].get(seo_snapshot.SNAPSHOT_KEY))
+
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        """快照过期：返回旧快照，刷新在后台进行"""
+        stale = {'generated_at': timezone.now() - timedelta(days=1), 'pages': {}}
+        caches['shared'].set(seo_snapshot.SNAPSHOT_KEY, stale)
+        with mock.patch.object(seo_snapshot, '_start_background_refresh') as start, \
+                mock.patch.object(seo_snapshot, 'refresh_snapshot') as refresh:
+            self.assertEqual(seo_snapshot.get_snapshot(), stale)
+        start.assert_called_once_with()
+        refresh.assert_not_called()
+
+    def test_fresh_snapshot_starts_no_refresh(self):
+        seo_snapshot.refresh_snapshot()
+        with mock.patch.object(seo_snapshot, '_start_background_refresh') as start:
+            self.assertIsNotNone(seo_snapshot.get_snapshot())
+        start.assert_not_called()
+
+    def test_one_background_refresh_per_process(self):
+        """同一进程同时只有一个后台刷新线程"""
+        release = threading.Event()
+        with mock.patch.object(seo_snapshot, '_background_refresh', side_effect=lambda: release.wait(5)) as run:
+            seo_snapshot._start_background_refresh()
+            seo_snapshot._start_background_refresh()
+            release.set()
+            seo_snapshot._refresh_state['thread'].join(5)
+        self.assertEqual(run.call_count, 1)
+
+    def test_refresh_skipped_when_another_process_holds_lock(self):
+        """其他进程持有刷新锁时，后台线程不重复刷新"""
+        lock_dir = cache_lock_dir(seo_snapshot.SNAPSHOT_CACHE_ALIAS)
+        with mock.patch.object(seo_snapshot, 'refresh_snapshot') as refresh, \
+                mock.patch.object(seo_snapshot, 'connection'):
+            with file_lock(lock_dir, seo_snapshot.REFRESH_LOCK_NAME) as acquired:
+                self.assertTrue(acquired)
+                # flock 按打开的文件互斥，在另一个线程中模拟另一个进程
+                worker = threading.Thread(target=seo_snapshot._background_refresh)
+                worker.start()
+                worker.join(5)
+            refresh.assert_not_called()
+
+            seo_snapshot._background_refresh()
+            refresh.assert_called_once_with()
+
+
+class TokenBucketTest(SimpleTestCase):
+    """地址校验的令牌桶限速"""
+
+    def test_paces_requests_at_rate(self):
+        """桶空后按 rate 放行：容量 1、每秒 20 个，6 次请求至少需要 5 个间隔"""
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 5 / 20 - 0.01)
+        self.assertLess(elapsed, 1.0)
+
+    def test_allows_burst_up_to_capacity(self):
+        """桶满时容量内的请求不等待"""
+        bucket = TokenBucket(rate=1, capacity=5)
+        started = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_default_capacity_allows_no_burst(self):
+        """默认容量为 1：第一秒内的请求数不超过 rate"""
+        bucket = TokenBucket(rate=20)
+        started = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 2 / 20 - 0.01)
+
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class AddressFileValidationTest(SimpleTestCase):
+    """批量地址校验的断点续跑：输出文件即检查点"""
+
+    ADDRESSES = [
+        '1 Main St, Doraville, GA 30340',
+        '2 Main St, Doraville, GA 30340',
+        '3 Main St, Doraville, GA 30340',
+        '4 Main St, Doraville, GA 30340',
+        '5 Main St, Doraville, GA 30340',
+    ]
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='address_validator_test_')
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        self.input_path = os.path.join(self.tmp_dir, 'addresses.jsonl')
+        with open(self.input_path, 'w', encoding='utf-8') as f:
+            for address in self.ADDRESSES:
+                f.write(json.dumps({'address': address}) + '\n')
+        self.validator = AddressValidator('test-key', session=mock.Mock())
+        self.calls = []
+
+    def fake_validate(self, failing=(), error='Network error: timed out'):
+        def validate_address(address):
+            self.calls.append(address)
+            if address in failing:
+                return {'valid': False, 'error': error, 'address': address}
+            return {
+                'valid': True, 'address': address, 'formatted_address': address.upper(),
+                'location': {'lat': 33.9, 'lng': -84.27}, 'confidence': 'high', 'place_id': address,
+            }
+        return validate_address
+
+    def written_rows(self, output_path):
+        with open(output_path, newline='', encoding='utf-8') as f:
+            if output_path.endswith('.csv'):
+                return [int(row['row']) for row in csv.DictReader(f)]
+            return [json.loads(line)['row'] for line in f if line.strip()]
+
+    def test_resume_retries_only_unfinished_rows(self):
+        """暂时性失败的行不写入，重新运行时只校验这些行"""
+        for extension in ('jsonl', 'csv'):
+            with self.subTest(output=extension):
+                output_path = os.path.join(self.tmp_dir, f'results.{extension}')
+                self.calls = []
+                self.validator.validate_address = self.fake_validate(failing={self.ADDRESSES[2]})
+                stats = self.validator.validate_file(self.input_path, output_path, rate=1000, chunk_size=2)
+                self.assertEqual((stats['written'], stats['retry'], stats['skipped']), (4, 1, 0))
+                self.assertEqual(sorted(self.written_rows(output_path)), [1, 2, 4, 5])
+
+                self.calls = []
+                self.validator.validate_address = self.fake_validate()
+                stats = self.validator.validate_file(self.input_path, output_path, rate=1000, chunk_size=2)
+                self.assertEqual((stats['written'], stats['retry'], stats['skipped']), (1, 0, 4))
+                self.assertEqual(self.calls, [self.ADDRESSES[2]])
+                self.assertEqual(sorted(self.written_rows(output_path)), [1, 2, 3, 4, 5])
+
+    def test_rate_limit_spans_chunks(self):
+        """整个文件共用一个限速器，每块不会重新获得一批令牌"""
+        output_path = os.path.join(self.tmp_dir, 'results.jsonl')
+        self.validator.validate_address = self.fake_validate()
+        started = time.monotonic()
+        stats = self.validator.validate_file(self.input_path, output_path, rate=20, chunk_size=2)
+        self.assertEqual(stats['api_calls'], 5)
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 20 - 0.01)
+
+    def test_request_denied_aborts_without_checkpointing(self):
+        """密钥被拒绝时停止运行，失败的行不写入，修复后重新运行全部写入"""
+        output_path = os.path.join(self.tmp_dir, 'results.jsonl')
+        self.validator.validate_address = self.fake_validate(
+            failing=set(self.ADDRESSES), error='API request denied - check API key'
+        )
+        with self.assertRaises(ValidationAborted):
+            self.validator.validate_file(self.input_path, output_path, rate=1000, chunk_size=2)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.written_rows(output_path), [])
+
+        self.validator.validate_address = self.fake_validate()
+        stats = self.validator.validate_file(self.input_path, output_path, rate=1000, chunk_size=2)
+        self.assertEqual(stats['written'], 5)
+        self.assertEqual(sorted(self.written_rows(output_path)), [1, 2, 3, 4, 5])
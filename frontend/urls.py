@@ -23,6 +23,7 @@ urlpatterns = [
     # 搜索相关URL
     path('search/', views.SearchResultsView.as_view(), name='search_results'),
     path('api/search-suggestions/', views.search_suggestions, name='search_suggestions'),
+    path('api/listing/', views.listing_page, name='listing_page'),
     
     # 购物车相关URL
     path('cart/', views.ShoppingCartView.as_view(), name='shopping_cart'),
@@ -51,6 +52,7 @@ urlpatterns = [
     # 网站地图URL（必须在通配符路由之前）
     path('sitemap.xml', views.sitemap_view, name='sitemap'),
     path('sitemap-<str:section>.xml', views.sitemap_view, name='sitemap_section'),
+    path('sitemap-products-<int:shard>.xml.gz', views.sitemap_shard_view, name='sitemap_shard'),
     
     # SEO页面URL
     path('services/', views.SEOServiceListView.as_view(), name='seo_service_list'),
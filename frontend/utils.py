@@ -46,26 +46,39 @@ def sanitize_hash_for_cache_key(encoded_id):
     return ''.join(c.lower() for c in encoded_id if c in '0123456789abcdefABCDEF')[:64]
 
 
-def get_item_hash(item):
+def get_item_hash_for_id(item_id, secret_key=None):
     """
-    生成商品哈希编码
+    根据商品ID生成哈希编码（不需要商品对象，可用于批量预计算）
+
+    Args:
+        item_id (int): 商品ID
+        secret_key (str): 哈希密钥，默认读取 settings.ITEM_HASH_SECRET_KEY
+            （在子进程中批量计算时显式传入，避免依赖 Django 配置）
     """
-    if not item or not hasattr(item, 'id'):
-        return None
-    
-    # 使用商品ID和密钥生成哈希
-    message = f"item_{item.id}"
-    secret_key = getattr(settings, 'ITEM_HASH_SECRET_KEY', 'default-secret-key')
-    
+    message = f"item_{item_id}"
+    if secret_key is None:
+        secret_key = getattr(settings, 'ITEM_HASH_SECRET_KEY', 'default-secret-key')
+
     # 使用HMAC生成哈希
     hash_obj = hmac.new(
         secret_key.encode('utf-8'),
         message.encode('utf-8'),
         hashlib.sha256
     )
-    
+
     return hash_obj.hexdigest()
 
+
+def get_item_hash(item):
+    """
+    生成商品哈希编码
+    """
+    if not item or not hasattr(item, 'id'):
+        return None
+    
+    # 使用商品ID和密钥生成哈希
+    return get_item_hash_for_id(item.id)
+
 def encode_item_id(item):
     """
     编码商品ID为哈希
@@ -75,7 +88,7 @@ def encode_item_id(item):
 def decode_item_id(item_hash):
     """
     解码商品哈希获取商品对象
-    通过遍历所有商品来找到匹配的哈希
+    通过哈希索引找到商品ID，再按主键查询（见 services.item_index）
     """
     # 安全检查1：验证输入格式
     if not is_valid_hash(item_hash):
@@ -85,18 +98,21 @@ def decode_item_id(item_hash):
 
     try:
         from .models_proxy import InventoryItem
+        from .services.item_index import lookup_item_id, remove_item
 
-        # 遍历所有商品，找到匹配的哈希（移除限制以支持已售商品访问）
-        items = InventoryItem.objects.all()
-
-        for item in items:
-            if get_item_hash(item) == item_hash:
-                return item
+        # 包含已售商品（不限制状态），以支持已售商品访问
+        item_id = lookup_item_id(item_hash)
+        if item_id is None:
+            return None
 
-        # 如果找不到匹配的商品，返回None
-        return None
+        item = InventoryItem.objects.filter(pk=item_id).first()
+        if item is None:
+            # 商品已被删除，清理过期的索引项
+            remove_item(item_id)
+        return item
 
-    except Exception:
+    except Exception as e:
+        logger.error(f"Error decoding item hash: {e}")
         return None
 
 
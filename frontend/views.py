@@ -1,28 +1,26 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from .models_proxy import (
     Location, Address, LocationWarrantyPolicy, LocationTermsAndConditions,
-    InventoryItem, ItemImage, ItemState, Category, ProductModel, ProductImage,
+    InventoryItem, ItemImage, Category, ProductModel, ProductImage,
     CustomerFavorite, ShoppingCart, CustomerWarrantyPolicy, CustomerTermsAgreement,
-    Order, OrderStatusHistory, TransactionRecord, CustomerAddress, StateTransition,
-    InventoryStateHistory, LoadManifest,
+    Order, TransactionRecord, CustomerAddress,
     Company
 )
 from django.db import models
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.views.generic import TemplateView, DetailView, View
-from django.http import Http404, JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, FileResponse
 from django.contrib.sitemaps import Sitemap
 from django.contrib.sitemaps.views import sitemap
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
-from scripts.address_validator import AddressValidator
 from django.conf import settings
 from googlemaps import Client
-from django.views.decorators.http import require_POST, require_http_methods
-from geopy.distance import geodesic
+from django.views.decorators.http import require_POST, require_http_methods, condition
 from decimal import Decimal
-from django.db import transaction
+from django.db import DatabaseError, transaction
 import json
 from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -36,18 +34,46 @@ import re
 from .utils import decode_item_id, get_item_hash, get_seo_data
 from .config.seo_keywords import CITIES, SERVICE_TYPES
 from .config.product_seo_pages import (
-    PRODUCT_SEO_PAGES, get_seo_page_config, build_product_filters, get_homepage_seo_pages
+    PRODUCT_SEO_PAGES, get_seo_page_config, get_homepage_seo_pages
 )
 from .services.google_reviews import GoogleReviewsService
+from .services.inventory_counts import get_homepage_counts
+from .services.seo_registry import get_page_filters
+from .services.seo_snapshot import get_page_count
+from .services.search_index import search_item_ids
+from .services.navigation import get_navigation_context
+from .services.cart import build_cart, get_cart_summary
+from .services.distances import get_cart_distances, get_distance
+from .services.checkout import CheckoutConflict, CheckoutError, place_order
+from .services.order_financials import annotate_financials
+from .services.geocoding import CachedAddressValidator, geocode_customer_address
+from .services.product_listing import (
+    InvalidCursor, card_image_url, get_grouped_listing, get_listing, get_listing_by_ids, normalize_sort,
+    paginate_groups, paginate_ids, paginate_listing
+)
+from .services import http_client, incoming_inventory, item_states, sitemap_builder, thumbnails
 from django.views.decorators.csrf import csrf_exempt
 import logging
 
-# 在文件开头添加 Google Maps 客户端初始化
-# 只有在有 API 密钥时才初始化客户端
-if hasattr(settings, 'GOOGLE_MAPS_API_KEY') and settings.GOOGLE_MAPS_API_KEY:
-    gmaps = Client(key=settings.GOOGLE_MAPS_API_KEY)  # 使用服务器端 API 密钥
-else:
-    gmaps = None
+_gmaps_client = None
+
+
+def get_gmaps_client():
+    """
+    Google Maps 客户端（首次使用时创建，共用 http_client 的连接池、超时和熔断）
+    只有在有 API 密钥时才创建，否则返回 None
+    """
+    global _gmaps_client
+    if _gmaps_client is None and getattr(settings, 'GOOGLE_MAPS_API_KEY', None):
+        config = http_client.SERVICE_CONFIGS['google_maps']
+        _gmaps_client = Client(
+            key=settings.GOOGLE_MAPS_API_KEY,  # 使用服务器端 API 密钥
+            connect_timeout=config.connect_timeout,
+            read_timeout=config.read_timeout,
+            retry_timeout=10,  # googlemaps 默认重试60秒，会长时间占用 web worker
+            requests_session=http_client.get_session('google_maps')
+        )
+    return _gmaps_client
 
 
 class BaseCompanyMixin:
@@ -83,9 +109,8 @@ class BaseCompanyMixin:
 class BaseFrontendMixin(BaseCompanyMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.filter(parent_category_id__isnull=True)
-        # 为所有页面提供stores数据，用于优化图片预加载
-        context['stores'] = self.get_company_filtered_locations().filter(location_type='STORE')
+        # 导航分类和stores数据（stores用于优化图片预加载），按版本缓存，不查询数据库
+        context.update(get_navigation_context())
         return context
 
 
@@ -93,9 +118,8 @@ class DetailViewMixin(BaseCompanyMixin):
     """专门用于DetailView的Mixin，提供分类数据"""
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.filter(parent_category_id__isnull=True)
-        # 为所有页面提供stores数据，用于优化图片预加载
-        context['stores'] = self.get_company_filtered_locations().filter(location_type='STORE')
+        # 导航分类和stores数据（stores用于优化图片预加载），按版本缓存，不查询数据库
+        context.update(get_navigation_context())
         return context
 
 
@@ -112,40 +136,34 @@ class AboutUsView(BaseFrontendMixin, TemplateView):
     template_name = 'frontend/about_us.html'
 
 class ContactUsView(BaseFrontendMixin, TemplateView):
+    """联系我们页面（店铺信息来自导航数据中的stores）"""
     template_name = 'frontend/contact_us.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # 获取所有店铺的location信息
-        context['stores'] = self.get_company_filtered_locations().filter(location_type='STORE')
-        return context
-
 class ReturnPolicyView(BaseFrontendMixin, TemplateView):
+    """退货政策页面（stores用于展示warranty policy链接）"""
     template_name = 'frontend/return_policy.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        # 获取所有店铺的location信息，用于展示warranty policy链接
-        context['stores'] = self.get_company_filtered_locations().filter(location_type='STORE')
-        return context
-
 
 class HomeView(BaseFrontendMixin, TemplateView):
     template_name = 'frontend/home.html'
 
+    # 特色分类配置 - 用于新的首页分类展示
+    FEATURED_CATEGORIES = [
+        {'slug': 'refrigerator', 'name': 'Refrigerator', 'image': 'refrigerator.webp'},
+        {'slug': 'range', 'name': 'Range', 'image': 'range.webp'},
+        {'slug': 'dishwasher', 'name': 'Dishwasher', 'image': 'dishwasher.webp'},
+        {'slug': 'microwave', 'name': 'Microwave', 'image': 'microwave.webp'},
+        {'slug': 'wall-oven', 'name': 'Wall Oven', 'image': 'wall_oven.webp'},
+        {'slug': 'wine-cooler', 'name': 'Wine Cooler', 'image': 'wine_cooler.webp'},
+        {'slug': 'washer', 'name': 'Washer', 'image': 'washer.webp'},
+        {'slug': 'dryer', 'name': 'Dryer', 'image': 'dryer.webp'},
+        {'slug': 'wash-tower', 'name': 'Wash Tower', 'image': 'wash_tower.webp'},
+        {'slug': 'washerdryer-combo', 'name': 'Washer/Dryer Combo', 'image': 'washerdryer_combo.webp'},
+    ]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # 获取配置公司的所有活跃店铺，预加载营业时间数据
-        stores = self.get_company_filtered_locations().filter(
-            location_type='STORE'
-        ).select_related('company', 'address').prefetch_related('business_hours').only(
-            'name', 'address__street_number', 'address__street_name', 'address__city', 
-            'address__state', 'address__zip_code', 'address__latitude', 'address__longitude',
-            'image', 'company__company_name', 'timezone'
-        )
-        
-        
         # 为首页创建简化的城市数据，只包含必要的字段
         minimal_cities = {}
         for city_key, city_info in CITIES.items():
@@ -158,80 +176,60 @@ class HomeView(BaseFrontendMixin, TemplateView):
         # 获取首页显示的SEO页面
         homepage_seo_pages = get_homepage_seo_pages()
 
+        # 一次聚合查询获取所有SEO页面和特色分类的库存数量（带缓存）
+        try:
+            homepage_counts = get_homepage_counts(
+                self.get_company_filtered_inventory_items(),
+                homepage_seo_pages,
+                [cat_config['slug'] for cat_config in self.FEATURED_CATEGORIES]
+            )
+        except Exception as e:
+            # 如果查询失败，记录错误但不影响页面加载
+            logging.error(f"Failed to get homepage inventory counts: {e}")
+            homepage_counts = {'seo_pages': {}, 'categories': {}}
+
         # 为每个SEO页面添加库存数量
         seo_pages_with_counts = []
         for seo_page in homepage_seo_pages:
             page_config = seo_page['config']
-            try:
-                # 构建筛选条件并查询库存数量
-                filters = build_product_filters(page_config)
-                item_count = self.get_company_filtered_inventory_items().filter(filters).count()
-
-                # 只有满足最小库存要求的页面才显示
-                min_inventory = page_config.get('min_inventory', 1)
-                if item_count >= min_inventory:
-                    seo_pages_with_counts.append({
-                        'key': seo_page['key'],
-                        'config': page_config,
-                        'item_count': item_count
-                    })
-            except Exception as e:
-                # 如果查询失败，记录错误但不影响页面加载
-                logging.error(f"Failed to get item count for SEO page {seo_page['key']}: {e}")
+            item_count = homepage_counts['seo_pages'].get(seo_page['key'])
+            if item_count is None:
+                # 筛选条件构建失败的页面已在计数服务中记录错误
                 continue
 
+            # 只有满足最小库存要求的页面才显示
+            min_inventory = page_config.get('min_inventory', 1)
+            if item_count >= min_inventory:
+                seo_pages_with_counts.append({
+                    'key': seo_page['key'],
+                    'config': page_config,
+                    'item_count': item_count
+                })
+
         # 获取Google评论 (英语评论，只显示5星好评，7天缓存)
         google_service = GoogleReviewsService()
         google_reviews = google_service.get_reviews(max_reviews=6, min_rating=5, show_multilingual=False)
 
-        # 检查是否有即将到货的库存
-        has_incoming_inventory = self._check_incoming_inventory()
-
-        # 特色分类配置 - 用于新的首页分类展示
-        FEATURED_CATEGORIES = [
-            {'slug': 'refrigerator', 'name': 'Refrigerator', 'image': 'refrigerator.webp'},
-            {'slug': 'range', 'name': 'Range', 'image': 'range.webp'},
-            {'slug': 'dishwasher', 'name': 'Dishwasher', 'image': 'dishwasher.webp'},
-            {'slug': 'microwave', 'name': 'Microwave', 'image': 'microwave.webp'},
-            {'slug': 'wall-oven', 'name': 'Wall Oven', 'image': 'wall_oven.webp'},
-            {'slug': 'wine-cooler', 'name': 'Wine Cooler', 'image': 'wine_cooler.webp'},
-            {'slug': 'washer', 'name': 'Washer', 'image': 'washer.webp'},
-            {'slug': 'dryer', 'name': 'Dryer', 'image': 'dryer.webp'},
-            {'slug': 'wash-tower', 'name': 'Wash Tower', 'image': 'wash_tower.webp'},
-            {'slug': 'washerdryer-combo', 'name': 'Washer/Dryer Combo', 'image': 'washerdryer_combo.webp'},
-        ]
+        # 检查是否有即将到货的库存（缓存的EXISTS查询）
+        has_incoming_inventory = incoming_inventory.has_incoming_inventory()
 
-        # 为特色分类计算商品数量
+        # 为特色分类添加商品数量（不存在的分类已在计数服务中记录并跳过）
         featured_categories = []
-        for cat_config in FEATURED_CATEGORIES:
-            try:
-                category = Category.objects.get(slug=cat_config['slug'])
-
-                # 使用与现有category_items相同的逻辑计算商品数量
-                base_items = self.get_company_filtered_inventory_items().filter(
-                    models.Q(model_number__category=category) |
-                    models.Q(model_number__category__parent_category_id=category.id),
-                    published=True,
-                    current_state_id__in=[4, 5, 8]
-                )
-
-                total_count = base_items.count()
-
-                featured_categories.append({
-                    'slug': cat_config['slug'],
-                    'name': cat_config['name'],
-                    'image': cat_config['image'],
-                    'count': total_count,
-                    'category_obj': category
-                })
-
-            except Category.DoesNotExist:
-                # 如果分类不存在，记录但继续处理其他分类
-                logging.warning(f"Featured category not found: {cat_config['slug']}")
+        for cat_config in self.FEATURED_CATEGORIES:
+            category_count = homepage_counts['categories'].get(cat_config['slug'])
+            if category_count is None:
                 continue
 
+            featured_categories.append({
+                'slug': cat_config['slug'],
+                'name': cat_config['name'],
+                'image': cat_config['image'],
+                'count': category_count['count'],
+                'category_obj': category_count['category']
+            })
+
+        # 店铺（含地址和营业时间）已由导航数据提供
         context.update({
-            'stores': stores,
             'cities': minimal_cities,
             'homepage_seo_pages': seo_pages_with_counts,
             'google_reviews': google_reviews,
@@ -240,31 +238,6 @@ class HomeView(BaseFrontendMixin, TemplateView):
         })
         return context
 
-    def _check_incoming_inventory(self):
-        """
-        检查是否有即将到货的库存
-        使用与IncomingInventoryView相同的逻辑
-        """
-        # 使用与IncomingInventoryView相同的过滤逻辑
-        tracking_states = [1, 2, 3]  # 追踪的状态ID
-
-        # 获取状态为CONVERTING的LoadManifest，使用配置中的公司ID
-        load_manifests = LoadManifest.objects.filter(
-            status=LoadManifest.Status.CONVERTING,
-            company_id=settings.COMPANY_ID
-        )
-
-        # 检查是否有任何批次包含即将到货的商品
-        for manifest in load_manifests:
-            inventory_items = InventoryItem.objects.filter(
-                load_number=manifest,
-                current_state_id__in=tracking_states
-            )
-            if inventory_items.exists():
-                return True
-        
-        return False
-
 
 class StoreView(BaseFrontendMixin, TemplateView):
     """商店页面 - 显示特定商店的所有产品"""
@@ -290,76 +263,35 @@ class StoreView(BaseFrontendMixin, TemplateView):
             slug=location_slug
         )
 
-        # 获取当前商店的所有商品（按分类分组）
-        category_items = {}
-        for category in context['categories']:
-            
-            # 获取当前类别及其所有子类别的商品，但只显示当前商店的商品
-            # 只显示状态为 WAITING FOR TESTING (4), TEST (5), FOR SALE (8) 的商品
-            base_items = self.get_company_filtered_inventory_items().filter(
-                models.Q(model_number__category=category) |  # 当前类别的商品
-                models.Q(model_number__category__parent_category_id=category.id),  # 子类别的商品
-                published=True,
+        # 获取当前商店的所有商品（按分类分组），子类别的商品归入其顶级类别
+        # 只显示状态为 WAITING FOR TESTING (4), TEST (5), FOR SALE (8) 的商品
+        categories = list(context['categories'])
+        category_ids = [category.id for category in categories]
+        top_category = models.Case(
+            models.When(
+                model_number__category__parent_category_id__in=category_ids,
+                then=models.F('model_number__category__parent_category_id')
+            ),
+            default=models.F('model_number__category_id'),
+            output_field=models.IntegerField()
+        )
+        grouped_items, total_counts = get_grouped_listing(
+            self.get_company_filtered_inventory_items().filter(
                 location=location,  # 只显示当前商店的商品
-                current_state_id__in=[4, 5, 8]  # 只显示这三种状态的商品
-            ).select_related(
-                'model_number',
-                'model_number__brand',
-                'model_number__category',
-                'location'
-            ).annotate(
-                favorite_count=Count('favorited_by', distinct=True)
-            ).only(
-                'id',
-                'retail_price',
-                'model_number__model_number',
-                'model_number__msrp',
-                'model_number__brand__name',
-                'model_number__category__name',
-                'location__name'
-            )
-            
-            
-            # 分别处理有商品图片和没有商品图片的商品
-            items_with_images = base_items.filter(images__isnull=False).prefetch_related(
-                models.Prefetch(
-                    'images',
-                    queryset=ItemImage.objects.only('image').order_by('display_order')[:1],
-                    to_attr='item_images'
-                )
-            )
-            
-            items_without_images = base_items.filter(images__isnull=True).prefetch_related(
-                models.Prefetch(
-                    'model_number__images',
-                    queryset=ProductImage.objects.only('image').order_by('id')[:1],
-                    to_attr='model_images'
-                )
-            )
-            
-            # 合并两个查询集
-            items = list(items_with_images) + list(items_without_images)
-            
+                current_state_id__in=item_states.state_ids(item_states.SELLABLE)  # 只显示可售状态的商品
+            ),
+            top_category,
+            category_ids,
+            per_group=6  # 限制每个分类只显示6个产品
+        )
+
+        category_items = {}
+        for category in categories:
+            items = grouped_items.get(category.id)
             if items:
-                # 计算真实的产品总数
-                total_count = len(items)
-                
-                # 限制每个分类只显示6个产品
-                items = items[:6]
-                
-                # 为每个商品计算节省金额
-                for item in items:
-                    if item.model_number.msrp:
-                        item.savings = item.model_number.msrp - item.retail_price
-                        item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-                    else:
-                        item.savings = 0
-                        item.savings_percentage = 0
-                
                 # 将真实总数添加到每个商品对象中，供模板使用
                 for item in items:
-                    item.total_category_count = total_count
-                
+                    item.total_category_count = total_counts[category.id]
                 category_items[category] = items
         
         context.update({
@@ -462,24 +394,26 @@ class ItemDetailView(DetailViewMixin, DetailView):
         # 检查商品状态
         is_available = (
             item.published and
-            item.current_state_id in [4, 5, 8] and
+            item.current_state_id in item_states.state_ids(item_states.SELLABLE) and
             item.order is None
         )
 
         # 区分已售出和其他不可用状态
         is_sold = item.order is not None  # 有订单就是已售出
-        is_coming_soon = item.current_state_id in [1, 2, 3] and item.order is None  # 运输途中
+        is_coming_soon = item.current_state_id in item_states.state_ids(item_states.INCOMING) and item.order is None  # 运输途中
         is_not_available = (
             not item.published and item.order is None  # 主动下架或其他原因
         ) or (
-            item.published and item.current_state_id not in [1, 2, 3, 4, 5, 8]  # 状态不可售
+            item.published and item.current_state_id not in (
+                item_states.state_ids(item_states.INCOMING) + item_states.state_ids(item_states.SELLABLE)
+            )  # 状态不可售
         )
 
         # 获取相似商品（所有商品都显示，不管是否已售）
         similar_items = self.get_company_filtered_inventory_items().filter(
             model_number__category=item.model_number.category,
             published=True,
-            current_state_id__in=[4, 5, 8]  # 只推荐可售的商品
+            current_state_id__in=item_states.state_ids(item_states.SELLABLE)  # 只推荐可售的商品
         ).exclude(id=item.id).select_related(
             'model_number',
             'model_number__brand'
@@ -550,6 +484,29 @@ class ItemDetailView(DetailViewMixin, DetailView):
 
         return context
 
+def _listing_pager_url(**params):
+    """下一页API的地址，游标由前端追加"""
+    query = urlencode({key: value for key, value in params.items() if value})
+    return f"{reverse('frontend:listing_page')}?{query}"
+
+
+def _listing_section(category, page, count, store, sort):
+    """分类页面中一个分类区块的模板数据"""
+    return {
+        'category': category,
+        'items': page['items'],
+        'next_cursor': page['next_cursor'],
+        'count': count,
+        'grid_id': f'category-grid-{category.id}',
+        'pager_url': _listing_pager_url(
+            source='category',
+            category=category.slug,
+            store=store.slug if store else None,
+            sort=sort
+        ),
+    }
+
+
 class CategoryView(BaseFrontendMixin, TemplateView):
     template_name = 'frontend/category.html'
 
@@ -572,118 +529,35 @@ class CategoryView(BaseFrontendMixin, TemplateView):
         # 检查是否有子类别
         has_subcategories = Category.objects.filter(parent_category_id=category.id).exists()
         
-        # 获取当前类别的商品（不属于任何子类别的商品），只显示配置公司的商品
-        base_items = self.get_company_filtered_inventory_items().filter(
-            model_number__category=category,
-            published=True
-        ).select_related(
-            'model_number',
-            'model_number__brand'
-        ).annotate(
-            favorite_count=Count('favorited_by', distinct=True)
-        ).only(
-            'id',
-            'retail_price',
-            'model_number__model_number',
-            'model_number__msrp',
-            'model_number__brand__name'
-        )
+        # 排序方式：newest（默认）、price_asc、price_desc
+        sort = normalize_sort(self.request.GET.get('sort'))
         
-        # 如果有store参数，只显示该store的商品
+        # 只显示配置公司的商品，如果有store参数，只显示该store的商品
+        base_items = self.get_company_filtered_inventory_items()
         if store:
             base_items = base_items.filter(location=store)
         
-        # 分别处理有商品图片和没有商品图片的商品
-        items_with_images = base_items.filter(images__isnull=False).prefetch_related(
-            models.Prefetch(
-                'images',
-                queryset=ItemImage.objects.only('image').order_by('display_order')[:1],  # 只加载第一张图片
-                to_attr='item_images'
-            )
-        )
-        
-        # 对于没有商品图片的商品，预加载产品型号图片
-        items_without_images = base_items.filter(images__isnull=True).prefetch_related(
-            models.Prefetch(
-                'model_number__images',
-                queryset=ProductImage.objects.only('image').order_by('id')[:1],  # 预加载产品型号的第一张图片
-                to_attr='model_images'
-            )
-        )
-        
-        # 合并两个查询集
-        current_category_items = list(items_with_images) + list(items_without_images)
-        
-        # 为当前类别的商品计算节省金额
-        for item in current_category_items:
-            if item.model_number.msrp:
-                item.savings = item.model_number.msrp - item.retail_price
-                item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-            else:
-                item.savings = 0
-                item.savings_percentage = 0
+        # 获取当前类别的商品（不属于任何子类别的商品）的第一页，后续页面由 listing_page API 加载
+        current_items = base_items.filter(model_number__category=category)
+        current_page = paginate_listing(current_items, sort)
+        current_count = current_items.count() if current_page['next_cursor'] else len(current_page['items'])
+        current_section = _listing_section(category, current_page, current_count, store, sort)
         
+        subcategory_sections = []
         if has_subcategories:
-            # 如果有子类别，获取所有子类别
-            subcategories = Category.objects.filter(parent_category_id=category.id)
-            category_items = {}
-            
-            # 获取每个子类别的商品，只显示配置公司的商品
+            # 如果有子类别，一条窗口查询获取所有子类别的第一页，按子类别分组
+            subcategories = list(Category.objects.filter(parent_category_id=category.id))
+            pages, counts = paginate_groups(
+                base_items,
+                models.F('model_number__category_id'),
+                [subcategory.id for subcategory in subcategories],
+                sort
+            )
             for subcategory in subcategories:
-                base_items = self.get_company_filtered_inventory_items().filter(
-                    model_number__category=subcategory,
-                    published=True
-                ).select_related(
-                    'model_number',
-                    'model_number__brand'
-                ).annotate(
-                    favorite_count=Count('favorited_by', distinct=True)
-                ).only(
-                    'id',
-                    'retail_price',
-                    'model_number__model_number',
-                    'model_number__msrp',
-                    'model_number__brand__name'
-                )
-                
-                # 如果有store参数，只显示该store的商品
-                if store:
-                    base_items = base_items.filter(location=store)
-                
-                # 分别处理有商品图片和没有商品图片的商品
-                items_with_images = base_items.filter(images__isnull=False).prefetch_related(
-                    models.Prefetch(
-                        'images',
-                        queryset=ItemImage.objects.only('image').order_by('display_order')[:1],  # 只加载第一张图片
-                        to_attr='item_images'
+                if subcategory.id in pages:
+                    subcategory_sections.append(
+                        _listing_section(subcategory, pages[subcategory.id], counts[subcategory.id], store, sort)
                     )
-                )
-                
-                # 对于没有商品图片的商品，预加载产品型号图片
-                items_without_images = base_items.filter(images__isnull=True).prefetch_related(
-                    models.Prefetch(
-                        'model_number__images',
-                        queryset=ProductImage.objects.only('image').order_by('id')[:1],  # 预加载产品型号的第一张图片
-                        to_attr='model_images'
-                    )
-                )
-                
-                # 合并两个查询集
-                items = list(items_with_images) + list(items_without_images)
-                
-                # 计算每个商品的节省金额
-                for item in items:
-                    if item.model_number.msrp:
-                        item.savings = item.model_number.msrp - item.retail_price
-                        item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-                    else:
-                        item.savings = 0
-                        item.savings_percentage = 0
-                
-                if items:
-                    category_items[subcategory] = items
-        else:
-            category_items = {}
         
         # 构建面包屑导航
         breadcrumbs = [
@@ -720,8 +594,10 @@ class CategoryView(BaseFrontendMixin, TemplateView):
         context.update({
             'category': category,
             'has_subcategories': has_subcategories,
-            'category_items': category_items,
-            'current_category_items': current_category_items,
+            'subcategory_sections': subcategory_sections,
+            'current_category_items': current_page['items'],
+            'current_section': current_section,
+            'sort': sort,
             'breadcrumbs': breadcrumbs,
             'store': store,
             'is_store_mode': store is not None
@@ -736,16 +612,17 @@ class CustomerDashboardView(LoginRequiredMixin, BaseFrontendMixin, TemplateView)
         customer = self.request.user.customer
         
         # 获取客户的所有订单，按创建时间倒序排列，只显示配置公司的订单
-        orders = customer.order_set.filter(
-            company_id=self.get_company_id()
-        ).select_related(
-            'company', 'location', 'location__address'
+        # paid_amount和balance在同一条查询中注解
+        orders = annotate_financials(
+            customer.order_set.filter(
+                company_id=self.get_company_id()
+            ).select_related(
+                'company', 'location', 'location__address'
+            )
         ).order_by('-created_at')
         
-        # 为每个订单添加paid_amount和balance属性，以及时区信息
+        # 为每个订单添加时区信息
         for order in orders:
-            order.paid_amount = order.calculate_paid_amount()
-            order.balance = order.calculate_order_balance()
             # 添加时区信息
             order.location_timezone = order.location.timezone
         
@@ -769,7 +646,7 @@ class CustomerProfileView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
     def post(self, request, *args, **kwargs):
         action = request.POST.get('action')
         customer = request.user.customer
-        address_validator = AddressValidator(settings.GOOGLE_MAPS_API_KEY)
+        address_validator = CachedAddressValidator(settings.GOOGLE_MAPS_API_KEY)
 
         if action == 'update_profile':
             try:
@@ -956,7 +833,7 @@ class CustomerProfileView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
                     })
 
                 # 使用 Google Places API 获取地址建议
-                autocomplete_result = gmaps.places_autocomplete(
+                autocomplete_result = get_gmaps_client().places_autocomplete(
                     partial_address,
                     components={'country': 'us'},
                     types=['address']
@@ -988,7 +865,7 @@ class CustomerProfileView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
                     })
 
                 # 使用 Google Places API 获取地址详情（只请求必要字段以避免 Atmosphere Data 等额外费用）
-                place_details = gmaps.place(place_id, fields=['address_component', 'formatted_address', 'geometry'])
+                place_details = get_gmaps_client().place(place_id, fields=['address_component', 'formatted_address', 'geometry'])
                 
                 if place_details['status'] == 'OK':
                     result = place_details['result']
@@ -1071,60 +948,14 @@ class CustomerFavoriteView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
         ).values_list('item_id', flat=True)
         
         # 然后查询这些商品的信息，只显示配置公司的商品
-        base_items = self.get_company_filtered_inventory_items().filter(
-            id__in=favorite_item_ids
-        ).select_related(
-            'model_number',
-            'model_number__brand',
-            'model_number__category'
-        ).annotate(
-            # 获取每个商品被所有用户收藏的总数
-            favorite_count=Count('favorited_by', distinct=True)
-        ).only(
-            'id',
-            'retail_price',
-            'model_number__model_number',
-            'model_number__msrp',
-            'model_number__brand__name',
-            'model_number__category__name'
-        )
-        
-        # 分别处理有商品图片和没有商品图片的商品
-        items_with_images = base_items.filter(images__isnull=False).prefetch_related(
-            models.Prefetch(
-                'images',
-                queryset=ItemImage.objects.only('image').order_by('display_order')[:1],  # 只加载第一张图片
-                to_attr='item_images'
-            )
+        favorite_items = get_listing(
+            self.get_company_filtered_inventory_items().filter(id__in=favorite_item_ids)
         )
         
-        # 对于没有商品图片的商品，预加载产品型号图片
-        items_without_images = base_items.filter(images__isnull=True).prefetch_related(
-            models.Prefetch(
-                'model_number__images',
-                queryset=ProductImage.objects.only('image').order_by('id')[:1],  # 预加载产品型号的第一张图片
-                to_attr='model_images'
-            )
-        )
-        
-        # 合并两个查询集
-        favorite_items = list(items_with_images) + list(items_without_images)
-        
         # 按类别分组商品
         category_items = {}
         for item in favorite_items:
-            category = item.model_number.category
-            if category not in category_items:
-                category_items[category] = []
-            category_items[category].append(item)
-            
-            # 计算节省金额
-            if item.model_number.msrp:
-                item.savings = item.model_number.msrp - item.retail_price
-                item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-            else:
-                item.savings = 0
-                item.savings_percentage = 0
+            category_items.setdefault(item.model_number.category, []).append(item)
         
         # 构建面包屑导航
         breadcrumbs = [
@@ -1207,73 +1038,16 @@ class ShoppingCartView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # 获取当前用户的购物车商品
-        base_cart_items = ShoppingCart.objects.filter(
-            customer=self.request.user.customer
-        ).select_related(
-            'item',
-            'item__model_number',
-            'item__model_number__brand',
-            'item__location',
-            'item__location__address'
-        )
-        
-        # 分别处理有商品图片和没有商品图片的商品
-        cart_items_with_images = base_cart_items.filter(item__images__isnull=False).prefetch_related(
-            'item__images'
-        )
+        customer = self.request.user.customer
         
-        # 对于没有商品图片的商品，预加载产品型号图片
-        cart_items_without_images = base_cart_items.filter(item__images__isnull=True).prefetch_related(
-            'item__model_number__images'
-        )
+        # 按 location 分组的购物车商品、小计和销售税，查询数量不随商品数量增长
+        location_items = build_cart(customer.id)
         
-        # 合并两个查询集
-        cart_items = list(cart_items_with_images) + list(cart_items_without_images)
-        
-        # 获取每个商品的受欢迎程度（被多少个不同客户添加到购物车）
-        item_popularity_counts = {}
-        # 查询每个商品被多少个不同客户添加到购物车
-        for cart_item in base_cart_items:
-            item_id = cart_item.item.id
-            if item_id not in item_popularity_counts:
-                # 查询该商品被多少个不同客户添加到购物车
-                popularity_count = ShoppingCart.objects.filter(
-                    item_id=item_id
-                ).values('customer').distinct().count()
-                item_popularity_counts[item_id] = popularity_count
-        
-        # 获取用户地址
-        addresses = CustomerAddress.objects.filter(customer=self.request.user.customer)
-        default_address = addresses.filter(is_default=True).first()
-        if not default_address and addresses.exists():
-            default_address = addresses.first()
-        
-        # 按 location 分组并计算每个 location 的总价
-        location_items = {}
-        for cart_item in base_cart_items:
-            location = cart_item.item.location
-            if location:
-                if location not in location_items:
-                    location_items[location] = {
-                        'items': [],
-                        'total_price': 0,
-                        'sales_tax': 0
-                    }
-                
-                # 为购物车项目设置图片
-                if cart_item.item.images.exists():
-                    cart_item.item.item_images = [cart_item.item.images.first()]
-                else:
-                    cart_item.item.model_number.model_images = [cart_item.item.model_number.images.first()] if cart_item.item.model_number.images.exists() else []
-                
-                # 添加购物车计数到商品信息中
-                cart_item.popularity_count = item_popularity_counts[cart_item.item.id]
-                
-                location_items[location]['items'].append(cart_item)
-                location_items[location]['total_price'] += cart_item.price_at_add
-                # 计算销售税
-                location_items[location]['sales_tax'] = location_items[location]['total_price'] * location.sales_tax_rate
+        # 获取用户地址（默认地址优先）
+        addresses = list(CustomerAddress.objects.filter(customer=customer))
+        default_address = next((address for address in addresses if address.is_default), None)
+        if not default_address and addresses:
+            default_address = addresses[0]
         
         # 构建面包屑导航
         breadcrumbs = [
@@ -1305,22 +1079,8 @@ def calculate_distances(request):
         # 获取选择的地址
         address = CustomerAddress.objects.get(id=address_id, customer=request.user.customer)
         
-        # 获取购物车商品
-        cart_items = ShoppingCart.objects.filter(
-            customer=request.user.customer
-        ).select_related(
-            'item__location__address'
-        )
-        
-        # 计算每个商品的距离
-        distances = {}
-        for item in cart_items:
-            if item.item.location and item.item.location.address:
-                distance = round(geodesic(
-                    (item.item.location.address.latitude, item.item.location.address.longitude),
-                    (address.latitude, address.longitude)
-                ).miles, 1)
-                distances[item.id] = distance
+        # 一次算出地址到所有门店的距离（带缓存），再按购物车商品所在门店取值
+        distances = get_cart_distances(request.user.customer.id, address)
         
         return JsonResponse({
             'success': True,
@@ -1353,7 +1113,7 @@ def add_to_cart(request, item_hash):
         customer = request.user.customer
 
         # 检查商品是否可购买（状态检查和是否已售出）
-        if item.current_state_id not in [4, 5, 8] or item.order is not None:
+        if item.current_state_id not in item_states.state_ids(item_states.SELLABLE) or item.order is not None:
             return JsonResponse({
                 'success': False,
                 'error': 'This item is no longer available for purchase'
@@ -1424,32 +1184,20 @@ def remove_from_cart(request, cart_item_id):
             # 保存位置ID，因为删除后无法再获取
             location_id = cart_item.item.location.id
             
-            # 删除购物车项
+            # 删除购物车项（信号会清除该客户的购物车汇总缓存）
             cart_item.delete()
-            
-            # 获取更新后的购物车信息
-            cart_items = ShoppingCart.objects.filter(
-                customer=request.user.customer
-            )
-            
-            # 计算该位置的总价
-            location_items = cart_items.filter(item__location_id=location_id)
-            location_total = sum(item.price_at_add for item in location_items)
-            
-            # 获取该位置的销售税率
-            try:
-                location = Location.objects.get(id=location_id)
-                sales_tax = location_total * location.sales_tax_rate
-            except Location.DoesNotExist:
-                sales_tax = 0
-            
-            return JsonResponse({
-                'success': True,
-                'message': 'Item removed from cart successfully',
-                'cart_count': cart_items.count(),
-                'location_total': float(location_total),
-                'sales_tax': float(sales_tax)
-            })
+        
+        # 从重新计算的汇总中获取该位置的总价和销售税
+        summary = get_cart_summary(request.user.customer.id)
+        location_summary = summary['locations'].get(location_id, {'total_price': 0, 'sales_tax': 0})
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Item removed from cart successfully',
+            'cart_count': summary['count'],
+            'location_total': float(location_summary['total_price']),
+            'sales_tax': float(location_summary['sales_tax'])
+        })
             
     except Exception as e:
         # 记录详细的错误信息
@@ -1487,16 +1235,10 @@ def geocode_address(request):
         
         # 获取地址
         address = CustomerAddress.objects.get(id=address_id, customer=request.user.customer)
-        address_str = f"{address.street_address}, {address.city}, {address.state} {address.zip_code}"
+        # 已保存的坐标 → 持久缓存 → Geocoding API（新结果写回地址）
+        location = geocode_customer_address(address)
         
-        # 使用服务器端 API 进行地理编码
-        if gmaps:
-            geocode_result = gmaps.geocode(address_str)
-        else:
-            geocode_result = []
-        
-        if geocode_result and len(geocode_result) > 0:
-            location = geocode_result[0]['geometry']['location']
+        if location:
             return JsonResponse({
                 'success': True,
                 'location': location
@@ -1534,8 +1276,8 @@ class ShowMapView(LoginRequiredMixin, BaseFrontendMixin, TemplateView):
     
 @login_required
 @require_http_methods(["POST"])
-@transaction.atomic  # 确保整个操作在事务中进行
 def create_order(request):
+    # 地址的地理编码（外部 API 调用）在事务之外进行，事务只包含锁定商品和创建订单
     try:
         data = json.loads(request.body)
         location_id = data.get('location_id')
@@ -1543,46 +1285,12 @@ def create_order(request):
         inventory_items_data = data.get('inventory_items', [])
         
         if not location_id or not inventory_items_data:
-            raise Exception('Missing required parameters')
+            raise CheckoutError('Missing required parameters')
 
         # 创建BaseCompanyMixin实例来获取过滤后的查询集
         company_mixin = BaseCompanyMixin()
         location = company_mixin.get_company_filtered_locations().get(id=location_id)
-        company_id = location.company_id
-            
-        # 获取所有商品
-        inventory_item_ids = [item['inventory_item_id'] for item in inventory_items_data]
-        
-        inventory_items = company_mixin.get_company_filtered_inventory_items().filter(
-            id__in=inventory_item_ids
-        ).select_related('current_state')
-        
-        if len(inventory_items) != len(inventory_item_ids):
-            raise Exception('Some inventory items not found')
-            
-        # 步骤0：校验所有商品的状态
-        try:
-            hold_state = ItemState.objects.get(name='HOLD')
-        except ItemState.DoesNotExist:
-            raise Exception('HOLD state not found in system')
-            
-        for item in inventory_items:
-            if item.current_state == hold_state:
-                raise Exception(f'Item {item.control_number} is already on hold')
-                
-            # 检查状态转换是否合法
-            try:
-                state_transition = StateTransition.objects.get(
-                    from_state=item.current_state,
-                    to_state=hold_state
-                )
-            except StateTransition.DoesNotExist:
-                raise Exception(f'Item {item.control_number} cannot be put on hold')
         
-        # 步骤1：创建订单
-        # 使用order app中的订单编号生成函数
-        # order_number = generate_order_number(location)
-        order_number = None
         # 获取配送地址
         shipping_address = None
         shipping_miles = 0
@@ -1590,90 +1298,30 @@ def create_order(request):
         if shipping_address_id:
             try:
                 shipping_address = CustomerAddress.objects.get(id=shipping_address_id)
-                # 计算配送距离
-                shipping_miles = round(geodesic(
-                    (shipping_address.latitude, shipping_address.longitude),
-                    (location.address.latitude, location.address.longitude)
-                ).miles, 1)
             except CustomerAddress.DoesNotExist:
                 pass
-        
-        order = Order.objects.create(
-            order_number=order_number if order_number else None,
-            company_id=company_id,
-            customer=request.user.customer,
-            location_id=location_id,
-            created_by=request.user,
-            order_status='PENDING',
-            payment_status='NOT_PAID',
-            total_amount=0,
-            tax_amount=0,
-            shipping_amount=0,
-            taxable_amount=0,
-            non_taxable_amount=0,
-            shipping_address=shipping_address.get_full_address() if shipping_address else None,
-            shipping_miles=shipping_miles,
-            receiver_name=request.user.get_full_name(),
-            receiver_phone=request.user.customer.phone,
-            receiver_email=request.user.email,
-            notes=None
-        )
-        
-        # 创建订单状态历史记录
-        OrderStatusHistory.objects.create(
-            order=order,
-            from_status=None,
-            to_status='PENDING',
-            changed_by=request.user.staff if hasattr(request.user, 'staff') else None,
-            notes='Customer create order from shopping cart' if not hasattr(request.user, 'staff') else 'Staff create order from dashboard'
-        )
-        
-        # 步骤2：创建订单项目并更新库存状态
-        for item_data in inventory_items_data:
-            try:
-                item = next(i for i in inventory_items if i.id == item_data['inventory_item_id'])
-                
-                # 更新库存项目，将其关联到订单
-                item.order = order
-                item.unit_price = Decimal(str(item_data['unit_price']))  # 确保转换为Decimal
-                item.save()
-            
-            except Exception as e:
-                raise Exception(f"处理商品时出错: {str(e)}")
-            
-            # 先获取状态转换规则
-            try:
-                state_transition = StateTransition.objects.get(
-                    from_state=item.current_state,
-                    to_state=hold_state
+        if shipping_address:
+            # 没有坐标的地址先地理编码（结果写回地址），距离与购物车页面共用缓存
+            if shipping_address.latitude is None or shipping_address.longitude is None:
+                geocode_customer_address(shipping_address)
+            shipping_miles = get_distance(shipping_address, location.id)
+            if shipping_miles is None:
+                # 无法计算时记为空，不记录虚假的 0 英里
+                logging.warning(
+                    f"Shipping distance unavailable for address {shipping_address.id} to location {location.id}"
                 )
-            except StateTransition.DoesNotExist:
-                raise Exception(f'Invalid state transition for item {item.control_number}')
-            
-            # 创建状态历史记录
-            InventoryStateHistory.objects.create(
-                inventory_item=item,
-                state_transition=state_transition,
-                changed_by=request.user.staff if hasattr(request.user, 'staff') else None,
-                notes='Customer created Order'
-            )
-            
-            # 最后更新库存状态为HOLD
-            item.current_state = hold_state
-            item.save()
-            
-            # 验证订单项目创建是否成功
-            if not InventoryItem.objects.filter(
-                order=order,
-                unit_price=Decimal(str(item_data['unit_price']))
-            ).exists():
-                raise Exception(f"Failed to create order item for {item.control_number}")
         
-        # 删除这些商品的购物车记录
-        ShoppingCart.objects.filter(
-            customer=request.user.customer,
-            item__in=inventory_items
-        ).delete()
+        # 锁定商品、校验状态转换、创建订单并置为HOLD（出错时整个事务回滚）
+        with transaction.atomic():
+            order = place_order(
+                user=request.user,
+                customer=request.user.customer,
+                location=location,
+                item_queryset=company_mixin.get_company_filtered_inventory_items(),
+                items_data=inventory_items_data,
+                shipping_address=shipping_address,
+                shipping_miles=shipping_miles
+            )
         
         return JsonResponse({
             'success': True,
@@ -1681,9 +1329,16 @@ def create_order(request):
             'redirect_url': reverse('frontend:customer_dashboard')
         })
         
+    except CheckoutConflict as e:
+        return JsonResponse({
+            'success': False,
+            'conflict': True,
+            'error': str(e)
+        }, status=409)
+    except DatabaseError:
+        # 数据库错误不是客户能处理的问题，按 500 处理
+        raise
     except Exception as e:
-        # 确保事务回滚
-        transaction.set_rollback(True)
         return JsonResponse({
             'success': False,
             'error': str(e)
@@ -1698,9 +1353,19 @@ class CustomerOrderDetailView(LoginRequiredMixin, BaseFrontendMixin, TemplateVie
         order_number = self.kwargs.get('order_number')
         
         # 先通过订单号找到订单，获取订单ID，只显示配置公司的订单
+        # 保修政策和条款条件的同意状态作为EXISTS子查询随订单一起取出
         order = get_object_or_404(
             self.get_company_filtered_orders().select_related(
                 'customer', 'customer__user', 'location', 'location__address', 'company'
+            ).annotate(
+                warranty_agreed=models.Exists(CustomerWarrantyPolicy.objects.filter(
+                    customer_id=models.OuterRef('customer_id'),
+                    location_id=models.OuterRef('location_id')
+                )),
+                terms_agreed=models.Exists(CustomerTermsAgreement.objects.filter(
+                    customer_id=models.OuterRef('customer_id'),
+                    location_id=models.OuterRef('location_id')
+                ))
             ),
             order_number=order_number,
             customer=self.request.user.customer  # 确保订单属于当前用户
@@ -1709,39 +1374,38 @@ class CustomerOrderDetailView(LoginRequiredMixin, BaseFrontendMixin, TemplateVie
         # 使用订单ID进行所有后续的数据库查询
         order_id = order.id
         
-        # 获取订单项目 - 使用订单ID
-        order_items = order.inventory_items.all().select_related(
-            'model_number',
-            'model_number__brand',
-            'model_number__category',
-            'current_state'
+        # 获取订单项目 - 使用订单ID，第一张商品图片和型号图片通过子查询注解
+        first_item_image = ItemImage.objects.filter(
+            item_id=models.OuterRef('pk')
+        ).order_by('display_order', 'created_at').values('image')[:1]
+        first_model_image = ProductImage.objects.filter(
+            product_model_id=models.OuterRef('model_number_id')
+        ).order_by('id').values('image')[:1]
+        order_items = list(
+            order.inventory_items.all().select_related(
+                'model_number',
+                'model_number__brand',
+                'model_number__category',
+                'current_state'
+            ).annotate(
+                item_image=models.Subquery(first_item_image),
+                model_image=models.Subquery(first_model_image)
+            )
         )
         
-        # 为每个订单项目加载图片数据
+        # 商品图片优先，没有则使用产品型号图片
         for item in order_items:
-            # 按需加载图片：如果商品有图片则加载商品图片，否则加载产品型号图片
-            if item.images.exists():
-                # 商品有图片，加载第一张商品图片
-                item_images = ItemImage.objects.filter(
-                    item=item
-                ).only('image').order_by('display_order')[:1]
-                item.item_images = list(item_images)
-            else:
-                # 商品没有图片，加载第一张产品型号图片
-                model_images = ProductImage.objects.filter(
-                    product_model=item.model_number
-                ).only('image').order_by('id')[:1]
-                item.item_images = list(model_images)
-        
-        # 获取交易记录 - 使用订单ID
-        transaction_records = TransactionRecord.objects.filter(
-            customer=order.customer,
-            company=order.company,
-            order_id=order_id  # 使用订单ID而不是订单对象
-        ).order_by('created_at')
-        
-        # 计算当前余额
-        current_balance = order.calculate_order_balance()
+            item.card_image_url = card_image_url(item.item_image, item.model_image)
+        
+        # 获取交易记录 - 使用订单ID，一次取出，当前余额由同一批记录累加
+        order_transactions = list(
+            TransactionRecord.objects.filter(order_id=order_id).order_by('created_at', 'id')
+        )
+        current_balance = sum((record.amount for record in order_transactions), Decimal('0.00'))
+        transaction_records = [
+            record for record in order_transactions
+            if record.customer_id == order.customer_id and record.company_id == order.company_id
+        ]
         
         # 计算时间差
         now = timezone.now()
@@ -1769,25 +1433,6 @@ class CustomerOrderDetailView(LoginRequiredMixin, BaseFrontendMixin, TemplateVie
         # 计算税前总价
         pre_tax_amount = order.calculate_pre_tax_total()
         
-        # 检查保修政策和条款条件同意状态
-        warranty_agreed = False
-        terms_agreed = False
-        
-        if self.request.user.is_authenticated:
-            try:
-                customer = self.request.user.customer
-                location = order.location
-                
-                # 检查保修政策同意状态
-                warranty_agreed = CustomerWarrantyPolicy.has_agreed(customer, location)
-                
-                # 检查条款和条件同意状态
-                terms_agreed = CustomerTermsAgreement.has_agreed(customer, location)
-                
-            except Exception:
-                # 如果获取用户信息失败，保持默认值False
-                pass
-        
         context.update({
             'order': order,
             'order_items': order_items,
@@ -1800,8 +1445,8 @@ class CustomerOrderDetailView(LoginRequiredMixin, BaseFrontendMixin, TemplateVie
             'time_since_creation': time_since_creation_str,
             'shipping_distance': f"{order.shipping_miles:.1f} miles" if order.shipping_miles else None,
             'pre_tax_amount': pre_tax_amount,
-            'warranty_agreed': warranty_agreed,
-            'terms_agreed': terms_agreed,
+            'warranty_agreed': order.warranty_agreed,
+            'terms_agreed': order.terms_agreed,
             'location': order.location,  # 添加location对象用于URL生成
             'GOOGLE_MAPS_CLIENT_API_KEY': settings.GOOGLE_MAPS_CLIENT_API_KEY
         })
@@ -1811,7 +1456,7 @@ class CustomerOrderDetailView(LoginRequiredMixin, BaseFrontendMixin, TemplateVie
         """处理替代联系人和地址信息的更新"""
         try:
             order_number = self.kwargs.get('order_number')
-            address_validator = AddressValidator(settings.GOOGLE_MAPS_API_KEY)  # 使用服务器端API密钥
+            address_validator = CachedAddressValidator(settings.GOOGLE_MAPS_API_KEY)  # 使用服务器端API密钥
             # 获取订单，只显示配置公司的订单
             # 创建BaseCompanyMixin实例来获取过滤后的查询集
             company_mixin = BaseCompanyMixin()
@@ -1935,21 +1580,14 @@ def search_suggestions(request):
         if len(query) < 2:
             return JsonResponse({'status': 'success', 'suggestions': []})
         
-        # 搜索已发布的库存商品，只显示配置公司的商品
+        # 通过搜索索引查找已发布的库存商品（按相关度排序），只显示配置公司的商品
+        item_ids = search_item_ids(query, limit=10)  # 限制返回10个结果
+        if not item_ids:
+            return JsonResponse({'status': 'success', 'suggestions': []})
+
         # 创建BaseCompanyMixin实例来获取过滤后的查询集
         company_mixin = BaseCompanyMixin()
-        items = company_mixin.get_company_filtered_inventory_items().select_related(
-            'model_number',
-            'model_number__brand',
-            'model_number__category'
-        ).filter(
-            models.Q(model_number__brand__name__icontains=query) |
-            models.Q(model_number__category__name__icontains=query) |
-            models.Q(model_number__model_number__icontains=query) |
-            models.Q(model_number__description__icontains=query)
-        ).annotate(
-            favorite_count=Count('favorited_by', distinct=True)
-        ).distinct()[:10]  # 限制返回10个结果
+        items = get_listing_by_ids(company_mixin.get_company_filtered_inventory_items(), item_ids)
         
         suggestions = []
         for item in items:
@@ -1960,14 +1598,6 @@ def search_suggestions(request):
             if not item_hash:
                 continue
             
-            # 获取商品图片
-            if item.images.exists():
-                image = item.images.first().image
-            elif item.model_number.images.exists():
-                image = item.model_number.images.first().image
-            else:
-                image = None
-            
             suggestion = {
                 'id': item.id,
                 'item_hash': item_hash,
@@ -1977,7 +1607,7 @@ def search_suggestions(request):
                 'description': item.model_number.description[:100] + '...' if len(item.model_number.description) > 100 else item.model_number.description,
                 'retail_price': float(item.retail_price),
                 'msrp': float(item.model_number.msrp) if item.model_number.msrp else None,
-                'image_url': image.url if image else None,
+                'image_url': item.card_image_url,
                 'favorite_count': item.favorite_count,
                 'url': reverse('frontend:item_detail', kwargs={'item_hash': item_hash})
             }
@@ -2011,68 +1641,85 @@ class SearchResultsView(BaseFrontendMixin, TemplateView):
             })
             return context
         
-        # 搜索已发布的库存商品，且状态为可销售状态，只显示配置公司的商品
-        items = self.get_company_filtered_inventory_items().filter(
-            published=True,
-            current_state_id__in=[4, 5, 8]  # 只显示这三种状态的商品
-        ).select_related(
-            'model_number',
-            'model_number__brand',
-            'model_number__category'
-        ).filter(
-            models.Q(model_number__brand__name__icontains=query) |
-            models.Q(model_number__category__name__icontains=query) |
-            models.Q(model_number__model_number__icontains=query) |
-            models.Q(model_number__description__icontains=query)
-        ).annotate(
-            favorite_count=Count('favorited_by', distinct=True)
-        ).distinct()
-        
-        # 预加载图片
-        items_with_images = items.filter(images__isnull=False).prefetch_related(
-            models.Prefetch(
-                'images',
-                queryset=ItemImage.objects.only('image').order_by('display_order')[:1],
-                to_attr='item_images'
-            )
-        )
-        
-        items_without_images = items.filter(images__isnull=True).prefetch_related(
-            models.Prefetch(
-                'model_number__images',
-                queryset=ProductImage.objects.only('image').order_by('id')[:1],
-                to_attr='model_images'
-            )
+        # 通过搜索索引查找已发布且为可销售状态的商品（按相关度排序），只显示配置公司的商品
+        # 只加载第一页，后续页面由 listing_page API 加载
+        sellable_state_ids = item_states.state_ids(item_states.SELLABLE)
+        item_ids = search_item_ids(query, state_ids=sellable_state_ids)  # 只显示可售状态的商品
+        page = paginate_ids(
+            self.get_company_filtered_inventory_items().filter(current_state_id__in=sellable_state_ids),
+            item_ids
         )
         
-        # 合并查询集
-        all_items = list(items_with_images) + list(items_without_images)
-        
-        # 为每个商品计算节省金额和生成哈希
-        valid_items = []
-        for item in all_items:
-            if item.model_number.msrp:
-                item.savings = item.model_number.msrp - item.retail_price
-                item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-            else:
-                item.savings = 0
-                item.savings_percentage = 0
-            
-            item.item_hash = get_item_hash(item)
-            
-            # 只添加能成功生成哈希的商品
-            if item.item_hash:
-                valid_items.append(item)
-        
         context.update({
             'query': query,
-            'items': valid_items,
-            'total_count': len(valid_items)
+            'items': page['items'],
+            'total_count': len(item_ids),
+            'next_cursor': page['next_cursor'],
+            'pager_url': _listing_pager_url(source='search', q=query),
         })
         
         return context
 
 
+@require_http_methods(["GET"])
+def listing_page(request):
+    """
+    商品列表下一页API - 分类、搜索结果和SEO页面的无限滚动
+    
+    参数：source（category / search / seo）、cursor（上一页返回的游标）、sort，
+    以及对应来源的 category + store、q 或 page
+    
+    Returns:
+        JsonResponse: {'status', 'html': 商品卡片HTML, 'next_cursor', 'count'}
+    """
+    source = request.GET.get('source')
+    cursor = request.GET.get('cursor')
+    sort = normalize_sort(request.GET.get('sort'))
+    company_mixin = BaseCompanyMixin()
+    items = company_mixin.get_company_filtered_inventory_items()
+    template_name = 'frontend/partials/product_cards.html'
+    
+    try:
+        if source == 'category':
+            category = Category.objects.filter(slug=request.GET.get('category')).first()
+            if not category:
+                return JsonResponse({'status': 'error', 'message': 'Category not found'}, status=404)
+            store_slug = request.GET.get('store')
+            if store_slug:
+                store = company_mixin.get_company_filtered_locations().filter(slug=store_slug).first()
+                if not store:
+                    return JsonResponse({'status': 'error', 'message': 'Store not found'}, status=404)
+                items = items.filter(location=store)
+            page = paginate_listing(items.filter(model_number__category=category), sort, cursor)
+        
+        elif source == 'search':
+            query = request.GET.get('q', '').strip()
+            sellable_state_ids = item_states.state_ids(item_states.SELLABLE)
+            item_ids = search_item_ids(query, state_ids=sellable_state_ids) if query else []
+            page = paginate_ids(items.filter(current_state_id__in=sellable_state_ids), item_ids, cursor)
+        
+        elif source == 'seo':
+            seo_page_key = request.GET.get('page')
+            filters = get_page_filters(seo_page_key) if get_seo_page_config(seo_page_key) else None
+            if filters is None:
+                return JsonResponse({'status': 'error', 'message': 'SEO page not found'}, status=404)
+            page = paginate_listing(items.filter(filters), sort, cursor)
+            template_name = 'frontend/partials/seo_product_cards.html'
+        
+        else:
+            return JsonResponse({'status': 'error', 'message': 'Invalid source'}, status=400)
+    
+    except InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    return JsonResponse({
+        'status': 'success',
+        'html': render_to_string(template_name, {'items': page['items']}, request=request),
+        'next_cursor': page['next_cursor'],
+        'count': len(page['items'])
+    })
+
+
 class WarrantyPolicyView(BaseFrontendMixin, TemplateView):
     """保修政策展示页面（未登录可访问）"""
     template_name = 'frontend/warranty_policy.html'
@@ -2534,22 +2181,67 @@ sitemaps = {
 }
 
 # 网站地图视图
+def _sitemap_filename(section=None, shard=None):
+    """请求对应的预生成文件名"""
+    if shard is not None:
+        return sitemap_builder.shard_filename(shard)
+    if section:
+        return sitemap_builder.section_filename(section)
+    return sitemap_builder.INDEX_NAME
+
+
+def _sitemap_etag(request, section=None, shard=None):
+    info = sitemap_builder.get_file_info(_sitemap_filename(section, shard))
+    return info['etag'] if info else None
+
+
+def _sitemap_last_modified(request, section=None, shard=None):
+    info = sitemap_builder.get_file_info(_sitemap_filename(section, shard))
+    return info['last_modified'] if info else None
+
+
+def _serve_sitemap_file(info, content_type):
+    response = FileResponse(open(info['path'], 'rb'), content_type=content_type)
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
+@condition(etag_func=_sitemap_etag, last_modified_func=_sitemap_last_modified)
 def sitemap_view(request, section=None):
     """
     网站地图视图
     支持单个sitemap和sitemap索引
+    优先返回 generate_sitemap 预生成的静态文件，未生成时动态生成
     """
+    if section and section not in sitemaps:
+        raise Http404("Sitemap section not found")
+
+    info = sitemap_builder.get_file_info(_sitemap_filename(section))
+    if info:
+        return _serve_sitemap_file(info, 'application/xml')
+
+    # 商品已拆分为分片，由索引列出
+    if section == 'products' and sitemap_builder.get_file_info(sitemap_builder.INDEX_NAME):
+        return redirect('frontend:sitemap')
+
+    logging.warning(f"Prebuilt sitemap not found, rendering dynamically: {section or 'index'}")
     if section:
         # 单个sitemap
-        if section in sitemaps:
-            return sitemap(request, {section: sitemaps[section]})
-        else:
-            raise Http404("Sitemap section not found")
+        return sitemap(request, {section: sitemaps[section]})
     else:
         # sitemap索引
         return sitemap(request, sitemaps)
 
 
+@condition(etag_func=_sitemap_etag, last_modified_func=_sitemap_last_modified)
+def sitemap_shard_view(request, shard):
+    """商品网站地图分片（gzip）"""
+    info = sitemap_builder.get_file_info(_sitemap_filename(shard=shard))
+    if not info:
+        raise Http404("Sitemap shard not found")
+    return _serve_sitemap_file(info, 'application/gzip')
+
+
 # === SEO页面视图 ===
 
 
@@ -2619,36 +2311,27 @@ class DynamicProductSEOView(BaseFrontendMixin, TemplateView):
         if not page_config:
             raise Http404("SEO page not found or disabled")
 
-        # 构建产品筛选条件
-        try:
-            filters = build_product_filters(page_config)
-        except Exception as e:
-            logging.error(f"Failed to build product filters: {e}")
+        # 预编译的产品筛选条件
+        filters = get_page_filters(seo_page_key)
+        if filters is None:
             raise Http404("Page configuration error")
 
-        # 查询符合条件的库存商品
-        inventory_items = self.get_company_filtered_inventory_items().filter(filters).select_related(
-            'model_number',
-            'model_number__category',
-            'model_number__brand',
-            'current_state'
-        ).prefetch_related('images')
-
-        # 为每个商品计算节省金额
-        for item in inventory_items:
-            if item.model_number.msrp:
-                item.savings = item.model_number.msrp - item.retail_price
-                item.savings_percentage = (item.savings / item.model_number.msrp) * 100
-            else:
-                item.savings = 0
-                item.savings_percentage = 0
-
-        # 检查库存数量是否满足要求
-        item_count = inventory_items.count()
+        # 按库存快照检查数量是否满足要求，库存不足时无需查询商品
         min_inventory = page_config.get('min_inventory', 1)
+        if get_page_count(seo_page_key) < min_inventory:
+            raise Http404("Insufficient inventory available")
+
+        # 查询符合条件的库存商品的第一页，后续页面由 listing_page API 加载
+        sort = normalize_sort(request.GET.get('sort'))
+        page = paginate_listing(self.get_company_filtered_inventory_items().filter(filters), sort)
+        inventory_items = page['items']
 
+        # 只有一页时用实际数量再确认一次（快照可能稍旧），有多页时以快照数量为准
+        if page['next_cursor']:
+            item_count = max(get_page_count(seo_page_key), len(inventory_items) + 1)
+        else:
+            item_count = len(inventory_items)
         if item_count < min_inventory:
-            # 库存不足，返回404或者友好的无库存页面
             raise Http404("Insufficient inventory available")
 
         # 准备上下文数据
@@ -2658,6 +2341,8 @@ class DynamicProductSEOView(BaseFrontendMixin, TemplateView):
             'page_config': page_config,
             'inventory_items': inventory_items,
             'item_count': item_count,
+            'next_cursor': page['next_cursor'],
+            'pager_url': _listing_pager_url(source='seo', page=seo_page_key, sort=sort),
             'city_info': self._get_city_info(page_config.get('city_key')),
             'seo_data': self._build_seo_data(page_config, item_count),
         })
@@ -2746,19 +2431,13 @@ class DynamicProductSEOView(BaseFrontendMixin, TemplateView):
 
 
 # 图片处理和缩放视图
-import os
-from PIL import Image
-from django.http import FileResponse, Http404
-from django.core.cache import cache
-import hashlib
-import logging
-
 logger = logging.getLogger(__name__)
 
 class ImageResizeView(View):
     """
     动态图片缩放视图
     URL格式：/media/resize/{width}x{height}/{image_path}
+    缩略图由 services.thumbnails 在后台线程池中生成，生成中先返回占位图
     """
 
     def get(self, request, width, height, image_path):
@@ -2769,113 +2448,27 @@ class ImageResizeView(View):
             height = int(height)
 
             # 限制缩略图最大尺寸防止滥用（原图可以任意大小）
-            if width > 1200 or height > 1200:
-                return Http404("Requested thumbnail size too large")
-
-            # 构建原图路径
-            original_path = os.path.join(settings.MEDIA_ROOT, image_path)
-
-            # 检查原图是否存在
-            if not os.path.exists(original_path):
-                raise Http404("Original image not found")
-
-            # 构建缓存路径
-            cache_dir = os.path.join(settings.MEDIA_ROOT, 'cache', f'{width}x{height}')
-            os.makedirs(cache_dir, exist_ok=True)
-
-            # 生成缓存文件名（WebP格式）
-            cache_filename = self._get_cache_filename(image_path, width, height)
-            cache_path = os.path.join(cache_dir, cache_filename)
+            if width > thumbnails.MAX_THUMBNAIL_SIZE or height > thumbnails.MAX_THUMBNAIL_SIZE:
+                raise Http404("Requested thumbnail size too large")
 
-            # 如果缓存存在且比原图新，直接返回
-            if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(original_path):
-                return self._serve_image(cache_path)
-
-            # 缓存不存在或过期，生成新的缩略图
-            resized_path = self._create_resized_image(original_path, cache_path, width, height)
-
-            return self._serve_image(resized_path)
+            resized_path = thumbnails.get_variant(image_path, width, height)
 
+        except FileNotFoundError:
+            raise Http404("Original image not found")
         except (ValueError, OSError) as e:
             logger.error(f"Error processing image resize request: {e}")
             raise Http404("Invalid request")
 
-    def _get_cache_filename(self, image_path, width, height):
-        """生成缓存文件名"""
-        # 使用原文件名和尺寸生成唯一的缓存文件名
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        return f"{base_name}_{width}x{height}.webp"
+        if resized_path is None:
+            return self._serve_placeholder(width, height)
 
-    def _create_resized_image(self, original_path, cache_path, width, height):
-        """创建缩放后的图片"""
-        try:
-            # 打开原图
-            with Image.open(original_path) as img:
-                # 处理EXIF方向信息（修正手机拍照旋转问题）
-                try:
-                    from PIL import ImageOps
-                    # 使用ImageOps.exif_transpose自动修正方向
-                    img = ImageOps.exif_transpose(img)
-                except (AttributeError, ImportError):
-                    # 如果不支持exif_transpose，使用手动方法
-                    try:
-                        exif = img._getexif()
-                        if exif is not None:
-                            # EXIF方向标签的值是274
-                            orientation = exif.get(274)
-                            if orientation == 3:
-                                img = img.rotate(180, expand=True)
-                            elif orientation == 6:
-                                img = img.rotate(270, expand=True)
-                            elif orientation == 8:
-                                img = img.rotate(90, expand=True)
-                    except (AttributeError, KeyError, TypeError):
-                        # 没有EXIF信息或处理失败，继续正常流程
-                        pass
-
-                # 转换为RGB模式（WebP需要）
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    img = img.convert('RGB')
-
-                # 计算缩放比例，保持宽高比
-                img_ratio = img.width / img.height
-                target_ratio = width / height
-
-                if img_ratio > target_ratio:
-                    # 图片更宽，按高度缩放
-                    new_height = height
-                    new_width = int(height * img_ratio)
-                else:
-                    # 图片更高，按宽度缩放
-                    new_width = width
-                    new_height = int(width / img_ratio)
-
-                # 缩放图片
-                img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                # 如果尺寸不完全匹配，进行居中裁剪
-                if new_width != width or new_height != height:
-                    left = (new_width - width) // 2
-                    top = (new_height - height) // 2
-                    right = left + width
-                    bottom = top + height
-                    img_resized = img_resized.crop((left, top, right, bottom))
-
-                # 保存为WebP格式，优化压缩
-                img_resized.save(
-                    cache_path,
-                    'WEBP',
-                    quality=85,
-                    optimize=True,
-                    method=6  # 最佳压缩
-                )
+        return self._serve_image(resized_path)
 
-                logger.info(f"Created resized image: {cache_path}")
-                return cache_path
-
-        except Exception as e:
-            logger.error(f"Error creating resized image: {e}")
-            raise
+    def _serve_placeholder(self, width, height):
+        """缩略图生成中：返回不缓存的占位图，下次请求即可拿到真实缩略图"""
+        response = HttpResponse(thumbnails.placeholder_bytes(width, height), content_type='image/webp')
+        response['Cache-Control'] = 'no-store'
+        return response
 
     def _serve_image(self, image_path):
         """提供图片文件响应"""
@@ -2903,60 +2496,8 @@ class IncomingInventoryView(BaseFrontendMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # 使用与nasmaha相同的过滤逻辑
-        tracking_states = [1, 2, 3]  # 追踪的状态ID
-
-        # 获取状态为CONVERTING的LoadManifest，使用配置中的公司ID
-        load_manifests = LoadManifest.objects.select_related(
-            'location',
-        ).filter(
-            status=LoadManifest.Status.CONVERTING,
-            company_id=settings.COMPANY_ID  # 使用配置中的公司ID
-        ).order_by('-purchase_date', '-created_at')
-
-        # 获取状态为CONVERTING的LoadManifest及其商品
-        load_manifests = LoadManifest.objects.select_related(
-            'location',
-            'location__address'
-        ).filter(
-            status=LoadManifest.Status.CONVERTING,
-            company_id=settings.COMPANY_ID
-        ).order_by('location__name', '-purchase_date', '-created_at')
-
-        loads_with_items = []
-        for manifest in load_manifests:
-            # 获取该批次中的库存商品
-            inventory_items = InventoryItem.objects.select_related(
-                'model_number__brand',
-                'model_number__category',
-                'location'
-            ).prefetch_related(
-                models.Prefetch(
-                    'model_number__images',
-                    queryset=ProductImage.objects.only('image').order_by('id')[:1],
-                    to_attr='model_images'
-                )
-            ).filter(
-                load_number=manifest,
-                current_state_id__in=tracking_states
-            )
-
-            if inventory_items.exists():
-                # 按类别分组该批次的商品
-                from collections import defaultdict
-                category_items = defaultdict(list)
-
-                for item in inventory_items:
-                    category = item.model_number.category
-                    category_items[category].append(item)
-
-                load_info = {
-                    'manifest': manifest,
-                    'location': manifest.location,
-                    'category_items': dict(category_items),
-                    'total_items': inventory_items.count()
-                }
-                loads_with_items.append(load_info)
+        # 所有CONVERTING批次中运输途中的商品一次取出，按批次和类别分组
+        loads_with_items = incoming_inventory.get_incoming_loads()
 
         context.update({
             'loads_with_items': loads_with_items,
@@ -4,22 +4,118 @@ Address Validator using Google Maps API
 This script validates addresses using Google Maps Geocoding API
 """
 
-import requests
+import argparse
+import csv
 import json
-import time
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+try:
+    # Inside the Django project: share the pooled client (timeouts, retries, circuit breaker, metrics)
+    from frontend.services.http_client import get_session
+except ImportError:
+    # Running standalone from scripts/
+    get_session = None
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+DEFAULT_RATE = 40.0  # requests per second, below the Geocoding API's 50 QPS quota
+DEFAULT_WORKERS = 8
+CHUNK_SIZE = 500  # rows read from the input file per batch
+
+# Errors that may succeed on retry: not cached and not checkpointed.
+# Key/configuration errors (REQUEST_DENIED, unrecognized statuses) are included so that rows
+# processed with a bad or disabled key are retried once the key is fixed.
+TRANSIENT_ERRORS = ('Network error', 'API quota exceeded', 'Unknown error occurred', 'Unexpected error',
+                    'API request denied', 'API error:')
+# Errors that affect every request: validate_file stops instead of working through the file
+FATAL_ERRORS = ('API request denied',)
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s#-]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalize an address for de-duplication and cache keys
+
+    Args:
+        address (str): Address string
+
+    Returns:
+        str: Lower-cased address with punctuation (except # and -) removed and whitespace collapsed
+    """
+    address = _PUNCTUATION_RE.sub(' ', (address or '').lower())
+    return _WHITESPACE_RE.sub(' ', address).strip()
+
+
+def is_transient(result: Dict) -> bool:
+    """
+    Whether a failed validation result may succeed on retry (network, quota or unknown errors)
+
+    Args:
+        result (Dict): Result from AddressValidator.validate_address
+
+    Returns:
+        bool: True for transient failures
+    """
+    return not result.get('valid') and str(result.get('error', '')).startswith(TRANSIENT_ERRORS)
+
+
+class ValidationAborted(Exception):
+    """Raised by validate_file when the API rejects the key or configuration"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Tokens refill continuously at `rate` per second up to `capacity`; acquire() blocks until a token is available.
+    The default capacity of 1 allows no burst, so the request rate never exceeds `rate` in any second.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
 
 class AddressValidator:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: Optional[requests.Session] = None):
         """
         Initialize the address validator with Google Maps API key
         
         Args:
             api_key (str): Google Maps API key
+            session (requests.Session): HTTP session to use; defaults to the shared
+                'google_geocoding' session when available, otherwise a private keep-alive session
         """
         self.api_key = api_key
         self.base_url = "https://maps.googleapis.com/maps/api/geocode/json"
+        if session is None:
+            session = get_session('google_geocoding') if get_session else requests.Session()
+        self.session = session
         
     def validate_address(self, address: str) -> Dict:
         """
@@ -39,7 +135,7 @@ class AddressValidator:
             }
             
             # Make API request
-            response = requests.get(self.base_url, params=params)
+            response = self.session.get(self.base_url, params=params, timeout=DEFAULT_TIMEOUT)
             response.raise_for_status()
             
             data = response.json()
@@ -205,31 +301,138 @@ class AddressValidator:
         else:
             return 'low'
     
-    def batch_validate(self, addresses: List[str], delay: float = 0.1) -> List[Dict]:
+    def batch_validate(self, addresses: List[str], delay: float = 0.1, rate: Optional[float] = None,
+                       max_workers: int = DEFAULT_WORKERS, cache: Optional[Dict] = None,
+                       progress: Optional[Callable[[int, int], None]] = None,
+                       limiter: Optional[TokenBucket] = None) -> List[Dict]:
         """
-        Validate multiple addresses with rate limiting
-        
+        Validate multiple addresses concurrently with rate limiting
+
+        Identical addresses (after normalization) are validated once; requests run on a thread pool
+        and are paced by a token bucket, so throughput is bounded by the API quota rather than by
+        serial round-trips.
+
         Args:
             addresses (List[str]): List of addresses to validate
-            delay (float): Delay between requests in seconds
-            
+            delay (float): Minimum average interval between requests in seconds (used when rate is not given)
+            rate (float): Maximum requests per second; overrides delay
+            max_workers (int): Number of concurrent requests
+            cache (Dict): Optional result cache keyed by normalized address, shared across calls;
+                only valid results and definitive failures are stored
+            progress (Callable): Optional callback progress(done, total) called as unique addresses finish
+            limiter (TokenBucket): Rate limiter shared across calls (e.g. every chunk of a file);
+                overrides rate and delay
+
         Returns:
-            List[Dict]: List of validation results
+            List[Dict]: Validation results in input order
         """
+        if limiter is None:
+            if rate is None:
+                rate = 1 / delay if delay and delay > 0 else DEFAULT_RATE
+            limiter = TokenBucket(rate)
+        cache = {} if cache is None else cache
+
+        keys = [normalize_address(address) for address in addresses]
+        pending = {}
+        for key, address in zip(keys, addresses):
+            if key not in cache and key not in pending:
+                pending[key] = address
+
+        def validate(address):
+            limiter.acquire()
+            return self.validate_address(address)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+                futures = {executor.submit(validate, address): key for key, address in pending.items()}
+                for done, future in enumerate(as_completed(futures), 1):
+                    key = futures[future]
+                    result = future.result()
+                    if is_transient(result):
+                        pending[key] = result
+                    else:
+                        cache[key] = result
+                        del pending[key]
+                    if progress:
+                        progress(done, len(futures))
+
         results = []
-        
-        for i, address in enumerate(addresses):
-            print(f"Validating address {i+1}/{len(addresses)}: {address}")
-            
-            result = self.validate_address(address)
-            results.append(result)
-            
-            # Add delay to avoid hitting rate limits
-            if i < len(addresses) - 1:  # Don't delay after last request
-                time.sleep(delay)
-        
+        for key, address in zip(keys, addresses):
+            result = cache[key] if key in cache else pending[key]
+            # Duplicates share one lookup; each result keeps its own input address
+            results.append(dict(result, address=address))
         return results
 
+    def validate_file(self, input_path: str, output_path: str, address_column: str = 'address',
+                      rate: float = DEFAULT_RATE, max_workers: int = DEFAULT_WORKERS,
+                      chunk_size: int = CHUNK_SIZE,
+                      progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Stream addresses from a CSV/JSONL file and append results to a CSV/JSONL file
+
+        The output file is the checkpoint: every row written carries its input row number, and
+        rows already present in the output are skipped when the command is run again. Rows that
+        failed with a transient error are not written, so a re-run retries them. A key or
+        configuration error (REQUEST_DENIED) stops the run with ValidationAborted after the
+        current chunk.
+
+        Input rows use `address_column`, or street_address/city/state/zip_code fields when that is missing.
+        The format of each file is chosen by its extension (.csv, otherwise JSONL).
+
+        Args:
+            input_path (str): Input file path
+            output_path (str): Output file path (appended to when it exists)
+            address_column (str): Column/key holding the full address
+            rate (float): Maximum requests per second
+            max_workers (int): Number of concurrent requests
+            chunk_size (int): Rows read and validated per batch
+            progress (Callable): Optional callback progress(stats) called after each chunk
+
+        Returns:
+            Dict: Counts of 'written', 'skipped' (already in output), 'retry' (transient failures) and 'api_calls'
+        """
+        done_rows = set(_read_checkpoint(output_path))
+        stats = {'written': 0, 'skipped': 0, 'retry': 0, 'api_calls': 0}
+        cache = {}
+        # One limiter for the whole file: chunks do not each start with a fresh allowance
+        limiter = TokenBucket(rate)
+
+        with _ResultWriter(output_path) as writer:
+            chunk = []
+            for row_number, row in enumerate(_read_rows(input_path), 1):
+                if row_number in done_rows:
+                    stats['skipped'] += 1
+                    continue
+                chunk.append((row_number, _row_address(row, address_column)))
+                if len(chunk) >= chunk_size:
+                    self._validate_chunk(chunk, writer, cache, stats, limiter, max_workers, progress)
+                    chunk = []
+            if chunk:
+                self._validate_chunk(chunk, writer, cache, stats, limiter, max_workers, progress)
+
+        return stats
+
+    def _validate_chunk(self, chunk: List[Tuple[int, str]], writer, cache: Dict, stats: Dict,
+                        limiter: TokenBucket, max_workers: int, progress: Optional[Callable[[Dict], None]]) -> None:
+        unique_uncached = {normalize_address(address) for _, address in chunk} - set(cache)
+        results = self.batch_validate([address for _, address in chunk], max_workers=max_workers,
+                                      cache=cache, limiter=limiter)
+        stats['api_calls'] += len(unique_uncached)
+
+        fatal_error = None
+        for (row_number, _), result in zip(chunk, results):
+            if is_transient(result):
+                stats['retry'] += 1
+                if str(result.get('error', '')).startswith(FATAL_ERRORS):
+                    fatal_error = result['error']
+                continue
+            writer.write(row_number, result)
+            stats['written'] += 1
+        if progress:
+            progress(stats)
+        if fatal_error:
+            raise ValidationAborted(fatal_error)
+
     def validate_address_legacy(self, address_data: Dict) -> Tuple[bool, Dict, str]:
         """
         Legacy method for compatibility with existing code
@@ -277,10 +480,89 @@ class AddressValidator:
         return True, standardized_address, ""
 
 
+OUTPUT_FIELDS = ['row', 'address', 'valid', 'formatted_address', 'lat', 'lng', 'confidence', 'place_id', 'error']
+
+
+def _is_csv(path: str) -> bool:
+    return path.lower().endswith('.csv')
+
+
+def _read_rows(path: str) -> Iterator[Dict]:
+    """Yield input rows as dicts (CSV with header, or one JSON object/string per line)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if _is_csv(path):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                row = json.loads(line)
+                yield row if isinstance(row, dict) else {'address': row}
+
+
+def _row_address(row: Dict, address_column: str) -> str:
+    if row.get(address_column):
+        return row[address_column]
+    parts = [row.get(field) for field in ('street_address', 'city', 'state', 'zip_code')]
+    return ', '.join(str(part) for part in parts if part)
+
+
+def _read_checkpoint(path: str) -> Iterable[int]:
+    """Row numbers already present in an existing output file"""
+    if not os.path.exists(path):
+        return
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = csv.DictReader(f) if _is_csv(path) else (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            try:
+                yield int(row['row'])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+
+class _ResultWriter:
+    """Append-only CSV/JSONL result writer, flushed after every row so an interrupted run can resume"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.csv = _is_csv(path)
+
+    def __enter__(self):
+        write_header = self.csv and (not os.path.exists(self.path) or os.path.getsize(self.path) == 0)
+        self.file = open(self.path, 'a', newline='', encoding='utf-8')
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+            if write_header:
+                self.writer.writeheader()
+        return self
+
+    def write(self, row_number: int, result: Dict) -> None:
+        if self.csv:
+            location = result.get('location') or {}
+            self.writer.writerow(dict(result, row=row_number, lat=location.get('lat'), lng=location.get('lng')))
+        else:
+            self.file.write(json.dumps(dict(result, row=row_number)) + '\n')
+        self.file.flush()
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+
 def main():
     """
     Main function for testing the address validator
+
+    With an input file, validates it in batch mode instead:
+        python address_validator.py addresses.csv -o results.jsonl --rate 40 --workers 8
     """
+    parser = argparse.ArgumentParser(description='Validate addresses with the Google Maps Geocoding API')
+    parser.add_argument('input', nargs='?', help='CSV or JSONL file of addresses to validate')
+    parser.add_argument('-o', '--output', help='CSV or JSONL results file (also the resume checkpoint)')
+    parser.add_argument('--column', default='address', help='Input column holding the full address')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Maximum requests per second')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent requests')
+    args = parser.parse_args()
+
     # Get API key from environment variable or use hardcoded one
     # Set environment variable: export GOOGLE_MAPS_API_KEY="your_api_key_here"
     API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
@@ -296,6 +578,26 @@ def main():
         print("3. Enable Geocoding API")
         print("4. Create credentials (API key)")
         return
+
+    if args.input:
+        output = args.output or os.path.splitext(args.input)[0] + '.results.jsonl'
+        started = time.monotonic()
+
+        def report(stats):
+            print(f"Processed {stats['written'] + stats['retry'] + stats['skipped']} rows "
+                  f"({stats['api_calls']} API calls)")
+
+        try:
+            stats = AddressValidator(API_KEY).validate_file(
+                args.input, output, address_column=args.column, rate=args.rate, max_workers=args.workers,
+                progress=report
+            )
+        except ValidationAborted as e:
+            print(f"Stopped: {e}. Rows written so far are kept in {output}; fix the key and re-run to resume.")
+            return
+        print(f"Done in {time.monotonic() - started:.1f}s: {stats['written']} written to {output}, "
+              f"{stats['skipped']} already done, {stats['retry']} to retry, {stats['api_calls']} API calls")
+        return
     
     # Test addresses
     test_addresses = [